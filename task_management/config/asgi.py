@@ -13,15 +13,21 @@ from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.security.websocket import AllowedHostsOriginValidator
 from django.core.asgi import get_asgi_application
 
-from tasks.routing import websocket_urlpatterns
-
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = ProtocolTypeRouter(
-    {
-        'http': get_asgi_application(),
-        'websocket': AllowedHostsOriginValidator(
-            URLRouter(websocket_urlpatterns)
-        ),
-    }
+django_asgi_app = get_asgi_application()
+
+from tasks.cache import AsyncCacheMiddleware  # noqa: E402
+from tasks.routing import websocket_urlpatterns  # noqa: E402
+from users.authentication import TokenAuthMiddleware  # noqa: E402
+
+application = AsyncCacheMiddleware(
+    ProtocolTypeRouter(
+        {
+            'http': django_asgi_app,
+            'websocket': AllowedHostsOriginValidator(
+                TokenAuthMiddleware(URLRouter(websocket_urlpatterns))
+            ),
+        }
+    )
 )
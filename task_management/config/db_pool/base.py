@@ -0,0 +1,42 @@
+from django.db.backends.postgresql import base, creation
+
+from .pool import close_idle_connections, get_pool
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Свободные соединения пула не дают удалить тестовую базу.
+        close_idle_connections()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    Бэкенд PostgreSQL, берущий соединения из пула процесса.
+    Закрытие соединения Django (в конце запроса при CONN_MAX_AGE = 0)
+    возвращает его в пул, а не разрывает.
+    Настройки пула задаются ключом POOL базы данных:
+    max_size, timeout и health_check_interval.
+    """
+
+    creation_class = DatabaseCreation
+
+    def get_pool(self, conn_params):
+        return get_pool(
+            self.alias, conn_params, self.settings_dict.get('POOL', {})
+        )
+
+    def get_new_connection(self, conn_params):
+        self._pool = self.get_pool(conn_params)
+        return self._pool.getconn(
+            lambda: super(DatabaseWrapper, self).get_new_connection(
+                conn_params
+            )
+        )
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self._pool.putconn(
+                    self.connection, discard=self.errors_occurred
+                )
@@ -0,0 +1,47 @@
+from .pool import get_pools
+
+
+def get_pool_metrics():
+    """Метрики пулов соединений процесса для страницы метрик."""
+
+    pools = [
+        ((('alias', alias), ('database', database)), pool)
+        for alias, database, pool in get_pools()
+    ]
+    stats = [(labels, pool.get_stats()) for labels, pool in pools]
+    return [
+        (
+            'db_pool_connections',
+            'Соединения пула по состоянию.',
+            'gauge',
+            [
+                ((*labels, ('state', state)), pool_stats[state])
+                for labels, pool_stats in stats
+                for state in ('idle', 'in_use')
+            ],
+        ),
+        (
+            'db_pool_max_size',
+            'Максимальный размер пула.',
+            'gauge',
+            [(labels, pool_stats['max_size']) for labels, pool_stats in stats],
+        ),
+        (
+            'db_pool_waiting',
+            'Потоки, ожидающие соединение.',
+            'gauge',
+            [(labels, pool_stats['waiting']) for labels, pool_stats in stats],
+        ),
+        (
+            'db_pool_timeouts_total',
+            'Запросы соединения, не дождавшиеся свободного соединения.',
+            'counter',
+            [(labels, pool_stats['timeouts']) for labels, pool_stats in stats],
+        ),
+        (
+            'db_pool_wait_seconds',
+            'Время получения соединения из пула.',
+            'histogram',
+            [(labels, pool.wait_histogram) for labels, pool in pools],
+        ),
+    ]
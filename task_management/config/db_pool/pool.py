@@ -0,0 +1,181 @@
+import threading
+import time
+from collections import deque
+
+from django.db import OperationalError
+
+from tasks.metrics import DURATION_BUCKETS, Histogram
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    """
+    Потокобезопасный пул соединений psycopg с ограничением размера.
+    Соединения создаются фабрикой по мере необходимости. Если все
+    соединения заняты, поток ждёт освобождения не дольше timeout.
+    Соединение, пролежавшее без дела дольше health_check_interval,
+    перед выдачей проверяется запросом SELECT 1.
+    """
+
+    def __init__(self, max_size, timeout, health_check_interval):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._idle = deque()
+        self._size = 0
+        self._waiting = 0
+        self._condition = threading.Condition()
+        self.wait_histogram = Histogram(DURATION_BUCKETS)
+        self.timeouts = 0
+
+    def getconn(self, factory):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        while True:
+            connection, check = self._acquire(deadline)
+            if connection is None:
+                try:
+                    connection = factory()
+                except Exception:
+                    self._release_slot()
+                    raise
+                break
+            # Проверка и закрытие идут без блокировки пула, чтобы
+            # медленная сеть не задерживала другие потоки.
+            if not check or self._is_usable(connection):
+                break
+            connection.close()
+            self._release_slot()
+        with self._condition:
+            self.wait_histogram.observe(time.monotonic() - started)
+        return connection
+
+    def _acquire(self, deadline):
+        """
+        Под блокировкой берёт простаивающее соединение или занимает
+        место под новое, при необходимости ждёт до deadline.
+        Возвращает (соединение или None для нового, нужна ли проверка).
+        """
+
+        with self._condition:
+            while True:
+                while self._idle:
+                    connection, released = self._idle.pop()
+                    if connection.closed:
+                        self._size -= 1
+                        continue
+                    idle_time = time.monotonic() - released
+                    return connection, idle_time > self.health_check_interval
+                if self._size < self.max_size:
+                    self._size += 1
+                    return None, False
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise OperationalError(
+                        f'Нет свободных соединений в пуле за {self.timeout} с.'
+                    )
+                self._waiting += 1
+                try:
+                    self._condition.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+    @staticmethod
+    def _is_usable(connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if not connection.autocommit:
+                connection.rollback()
+        except Exception:
+            return False
+        return True
+
+    def putconn(self, connection, discard=False):
+        """
+        Возвращает соединение в пул, откатывая незавершённую транзакцию.
+        Сломанные соединения и соединения с discard=True закрываются.
+        """
+
+        if not discard and not connection.closed:
+            try:
+                # Незавершённая транзакция не должна достаться другому
+                # запросу.
+                if connection.info.transaction_status:
+                    connection.rollback()
+            except Exception:
+                discard = True
+        if discard or connection.closed:
+            connection.close()
+            self._release_slot()
+            return
+        with self._condition:
+            self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+
+    def _release_slot(self):
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    def close_idle(self):
+        with self._condition:
+            idle = [connection for connection, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+        for connection in idle:
+            connection.close()
+
+    def get_stats(self):
+        with self._condition:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'waiting': self._waiting,
+                'max_size': self.max_size,
+                'timeouts': self.timeouts,
+            }
+
+
+def get_pool(alias, conn_params, options):
+    """
+    Возвращает пул процесса для базы alias и параметров подключения.
+    Разные параметры (например, тестовая база) получают разные пулы.
+    """
+
+    key = (alias, tuple(sorted((k, str(v)) for k, v in conn_params.items())))
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = ConnectionPool(
+                    max_size=options.get('max_size', 20),
+                    timeout=options.get('timeout', 10),
+                    health_check_interval=options.get(
+                        'health_check_interval', 30
+                    ),
+                )
+                _pools[key] = pool
+    return pool
+
+
+def get_pools():
+    """Возвращает пулы процесса по псевдонимам баз и именам баз данных."""
+
+    with _pools_lock:
+        return [
+            (alias, dict(params).get('dbname', ''), pool)
+            for (alias, params), pool in _pools.items()
+        ]
+
+
+def close_idle_connections():
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_idle()
@@ -0,0 +1,199 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+RECENT_WRITE_KEY = 'db:recent_write:{user_id}'
+REPLICA_LAG_SQL = (
+    'SELECT CASE WHEN NOT pg_is_in_recovery() '
+    'OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+    'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'
+)
+
+current_routing = ContextVar('current_routing', default=None)
+
+
+class ReadRouting:
+    """
+    Маршрут чтения одного запроса: алиас реплики или None
+    для чтения с основной базы.
+    Объект общий для потоков sync_to_async запроса, поэтому выбор
+    реплики в представлении действует на все чтения запроса.
+    """
+
+    __slots__ = ('alias',)
+
+    def __init__(self):
+        self.alias = None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Создаёт маршрут чтения для каждого запроса. По умолчанию
+    запрос читает с основной базы, пока представление не выберет
+    реплику через use_replica.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = current_routing.set(ReadRouting())
+        try:
+            return self.get_response(request)
+        finally:
+            current_routing.reset(token)
+
+    async def __acall__(self, request):
+        token = current_routing.set(ReadRouting())
+        try:
+            return await self.get_response(request)
+        finally:
+            current_routing.reset(token)
+
+
+class ReplicaLagMonitor:
+    """
+    Кэширует в процессе отставание реплик на DB_REPLICA_CHECK_INTERVAL
+    секунд, чтобы не проверять его на каждом запросе.
+    Недоступная реплика считается бесконечно отстающей.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._lags = {}
+
+    @staticmethod
+    def measure(alias):
+        connection = connections[alias]
+        if connection.vendor != 'postgresql':
+            return 0.0
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(REPLICA_LAG_SQL)
+                (lag,) = cursor.fetchone()
+        except DatabaseError:
+            return float('inf')
+        return float(lag or 0)
+
+    def get_lag(self, alias):
+        now = time.monotonic()
+        with self._lock:
+            checked = self._lags.get(alias)
+        if checked is not None and checked[0] > now:
+            return checked[1]
+        lag = self.measure(alias)
+        with self._lock:
+            self._lags[alias] = (now + settings.DB_REPLICA_CHECK_INTERVAL, lag)
+        return lag
+
+    def reset(self):
+        with self._lock:
+            self._lags.clear()
+
+
+lag_monitor = ReplicaLagMonitor()
+
+
+def get_replica():
+    """
+    Возвращает случайную реплику с допустимым отставанием
+    или None, если таких нет.
+    """
+
+    replicas = [
+        alias
+        for alias in settings.DB_READ_REPLICAS
+        if lag_monitor.get_lag(alias) <= settings.DB_REPLICA_MAX_LAG
+    ]
+    return random.choice(replicas) if replicas else None
+
+
+def get_read_alias():
+    """Алиас реплики, с которой читает текущий запрос, или None."""
+
+    routing = current_routing.get()
+    return routing.alias if routing is not None else None
+
+
+def mark_recent_write(user_id):
+    """
+    Отмечает запись пользователя: следующие DB_REPLICA_STICKY_TIMEOUT
+    секунд его запросы читают с основной базы и видят свои изменения.
+    """
+
+    if settings.DB_READ_REPLICAS and user_id is not None:
+        cache.set(
+            RECENT_WRITE_KEY.format(user_id=user_id),
+            1,
+            settings.DB_REPLICA_STICKY_TIMEOUT,
+        )
+
+
+def use_replica(user_id=None):
+    """
+    Направляет чтения текущего запроса на реплику, если реплики
+    настроены, пользователь недавно ничего не записывал и есть
+    реплика без большого отставания. Возвращает выбранный алиас.
+    """
+
+    routing = current_routing.get()
+    if routing is None or not settings.DB_READ_REPLICAS:
+        return None
+    if user_id is not None and cache.get(
+        RECENT_WRITE_KEY.format(user_id=user_id)
+    ):
+        return None
+    routing.alias = get_replica()
+    return routing.alias
+
+
+@contextmanager
+def replica_reads(user_id=None):
+    """Направляет на реплику чтения только внутри блока."""
+
+    routing = current_routing.get()
+    previous = routing.alias if routing is not None else None
+    try:
+        yield use_replica(user_id)
+    finally:
+        if routing is not None:
+            routing.alias = previous
+
+
+class ReplicaRouter:
+    """
+    Читает с реплики, выбранной для текущего запроса,
+    все записи и миграции выполняет на основной базе.
+    """
+
+    def db_for_read(self, model, **hints):
+        routing = current_routing.get()
+        if routing is not None:
+            return routing.alias
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DB_REPLICAS:
+            return False
+        return None
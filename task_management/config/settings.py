@@ -17,6 +17,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'django_filters',
@@ -30,6 +31,8 @@ AUTH_USER_MODEL = 'users.CustomUser'
 
 
 MIDDLEWARE = [
+    'tasks.middleware.MetricsMiddleware',
+    'config.db_router.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -61,17 +64,69 @@ TEMPLATES = [
 
 ASGI_APPLICATION = 'config.asgi.application'
 
+TEST_RUNNER = 'config.test_runner.TestRunner'
+
+# Размер пула соединений процесса, 0 - без пула.
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 20))
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': (
+            'config.db_pool'
+            if DB_POOL_MAX_SIZE
+            else 'django.db.backends.postgresql'
+        ),
         'NAME': os.getenv('POSTGRES_DB', 'task_management'),
         'USER': os.getenv('POSTGRES_USER', 'postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'QWEasd135'),
         'HOST': os.getenv('DB_HOST', 'localhost'),
         'PORT': os.getenv('DB_PORT', 5432),
+        # С пулом соединение возвращается в пул в конце запроса,
+        # без пула CONN_MAX_AGE > 0 включает постоянные соединения.
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 0)),
+        'CONN_HEALTH_CHECKS': True,
+        'POOL': {
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+            'health_check_interval': float(
+                os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', 30)
+            ),
+        },
     }
 }
 
+if os.getenv('DB_ENGINE') == 'sqlite3':
+    # Локальный запуск без PostgreSQL, например для нагрузочных замеров.
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+
+# Реплики только для чтения, хосты через пробел.
+DB_REPLICA_HOSTS = os.getenv('DB_REPLICA_HOSTS', '').split()
+# Без DB_REPLICA_HOSTS объявляется одна реплика на основной базе
+# с выключенным чтением, на ней тесты проверяют маршрутизацию.
+DB_READ_REPLICAS = []
+for index, host in enumerate(DB_REPLICA_HOSTS or [None], start=1):
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    if host is not None:
+        DATABASES[alias]['HOST'] = host
+        DB_READ_REPLICAS.append(alias)
+DB_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+# Сколько секунд после записи пользователь читает с основной базы.
+DB_REPLICA_STICKY_TIMEOUT = int(os.getenv('DB_REPLICA_STICKY_TIMEOUT', 5))
+# Реплика с большим отставанием в секундах не используется.
+DB_REPLICA_MAX_LAG = float(os.getenv('DB_REPLICA_MAX_LAG', 2))
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv('DB_REPLICA_CHECK_INTERVAL', 5))
+
+DATABASE_ROUTERS = ['config.db_router.ReplicaRouter']
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -80,7 +135,7 @@ AUTH_PASSWORD_VALIDATORS = [
         'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
     },
     {
-        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+        'NAME': 'users.validators.CommonPasswordValidator',
     },
     {
         'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
@@ -102,7 +157,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
@@ -119,6 +174,74 @@ CACHES = {
     }
 }
 
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', 10000))
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.getenv('AUTH_TOKEN_CACHE_TIMEOUT', 5 * 60))
+AUTH_TOKEN_LOCAL_CACHE_TIMEOUT = float(
+    os.getenv('AUTH_TOKEN_LOCAL_CACHE_TIMEOUT', 5)
+)
+
+# Потоки проверки и хеширования паролей при регистрации и сколько
+# регистраций может ждать свободный поток до ответа 503.
+# 0 потоков - без пула, хеширование в событийном цикле.
+AUTH_PASSWORD_HASHING_WORKERS = int(
+    os.getenv('AUTH_PASSWORD_HASHING_WORKERS', os.cpu_count() or 1)
+)
+AUTH_PASSWORD_HASHING_QUEUE_SIZE = int(
+    os.getenv('AUTH_PASSWORD_HASHING_QUEUE_SIZE', 100)
+)
+
+# Страница метрик выключена по умолчанию и доступна сотрудникам
+# или с токеном METRICS_TOKEN (Authorization: Bearer <токен>).
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'False').lower() == 'true'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_SERVER_TIMING = (
+    os.getenv('METRICS_SERVER_TIMING', 'False').lower() == 'true'
+)
+
+TASKS_CACHE_TIMEOUT = int(os.getenv('TASKS_CACHE_TIMEOUT', 60 * 60))
+
+TASKS_PAGE_SIZE = int(os.getenv('TASKS_PAGE_SIZE', 50))
+TASKS_MAX_PAGE_SIZE = int(os.getenv('TASKS_MAX_PAGE_SIZE', 500))
+TASKS_BULK_MAX_SIZE = int(os.getenv('TASKS_BULK_MAX_SIZE', 1000))
+TASKS_EXPORT_CHUNK_SIZE = int(os.getenv('TASKS_EXPORT_CHUNK_SIZE', 2000))
+TASKS_SYNC_BATCH_SIZE = int(os.getenv('TASKS_SYNC_BATCH_SIZE', 500))
+# Отметки об удалённых задачах старше TASKS_SYNC_TOMBSTONE_RETENTION_DAYS
+# дней удаляет команда prune_task_tombstones, клиенты с более старым
+# курсором получают {"resync": true}.
+TASKS_SYNC_TOMBSTONE_RETENTION_DAYS = int(
+    os.getenv('TASKS_SYNC_TOMBSTONE_RETENTION_DAYS', 30)
+)
+TASKS_SYNC_PRUNE_BATCH_SIZE = int(
+    os.getenv('TASKS_SYNC_PRUNE_BATCH_SIZE', 1000)
+)
+# Общие счётчики статусов разбиты на TASKS_COUNTER_SHARDS строк
+# на статус, чтобы параллельные записи не ждали одну строку.
+TASKS_COUNTER_SHARDS = int(os.getenv('TASKS_COUNTER_SHARDS', 16))
+# Выполненные задачи старше TASKS_ARCHIVE_AFTER_DAYS дней команда
+# archive_tasks переносит в архив пачками с паузой в секундах.
+TASKS_ARCHIVE_AFTER_DAYS = int(os.getenv('TASKS_ARCHIVE_AFTER_DAYS', 90))
+TASKS_ARCHIVE_BATCH_SIZE = int(os.getenv('TASKS_ARCHIVE_BATCH_SIZE', 1000))
+TASKS_ARCHIVE_PAUSE = float(os.getenv('TASKS_ARCHIVE_PAUSE', 0.5))
+# Списки задач читают имя и email автора из снимка в задаче без
+# соединения с пользователями. После изменения пользователя снимок
+# обновляется в фоне пачками по TASKS_OWNER_SYNC_BATCH_SIZE задач.
+TASKS_OWNER_SNAPSHOT = (
+    os.getenv('TASKS_OWNER_SNAPSHOT', 'True').lower() == 'true'
+)
+TASKS_OWNER_SYNC_BATCH_SIZE = int(
+    os.getenv('TASKS_OWNER_SYNC_BATCH_SIZE', 1000)
+)
+# Без фонового потока снимок обновляется сразу после фиксации,
+# так работают тесты (config.test_runner).
+TASKS_OWNER_SYNC_BACKGROUND = (
+    os.getenv('TASKS_OWNER_SYNC_BACKGROUND', 'True').lower() == 'true'
+)
+# Поиск похожих слов в названиях, требует расширения pg_trgm:
+# миграция 0005 без него продолжается, поэтому поиск включается явно.
+TASKS_SEARCH_TRIGRAM = (
+    os.getenv('TASKS_SEARCH_TRIGRAM', 'False').lower() == 'true'
+)
+
 CHANNEL_LAYERS = {
     'default': {
         'BACKEND': 'channels_redis.core.RedisChannelLayer',
@@ -127,3 +250,37 @@ CHANNEL_LAYERS = {
         },
     }
 }
+
+NOTIFICATIONS_QUEUE_SIZE = int(os.getenv('NOTIFICATIONS_QUEUE_SIZE', 10000))
+NOTIFICATIONS_BATCH_SIZE = int(os.getenv('NOTIFICATIONS_BATCH_SIZE', 100))
+NOTIFICATIONS_MAX_RETRIES = int(os.getenv('NOTIFICATIONS_MAX_RETRIES', 3))
+NOTIFICATIONS_RETRY_DELAY = float(
+    os.getenv('NOTIFICATIONS_RETRY_DELAY', 0.5)
+)
+NOTIFICATIONS_MAX_TASK_SUBSCRIPTIONS = int(
+    os.getenv('NOTIFICATIONS_MAX_TASK_SUBSCRIPTIONS', 100)
+)
+# Исходящая очередь веб-сокет соединения: как часто она отправляется,
+# сколько задач в ней помещается, сколько байт может ждать в буфере
+# соединения непрочитанными и что делать при переполнении:
+# drop - отбрасывать новые уведомления, disconnect - отключать клиента.
+NOTIFICATIONS_FLUSH_INTERVAL = float(
+    os.getenv('NOTIFICATIONS_FLUSH_INTERVAL', 0.05)
+)
+NOTIFICATIONS_CONNECTION_QUEUE_SIZE = int(
+    os.getenv('NOTIFICATIONS_CONNECTION_QUEUE_SIZE', 1000)
+)
+NOTIFICATIONS_CONNECTION_BUFFER_SIZE = int(
+    os.getenv('NOTIFICATIONS_CONNECTION_BUFFER_SIZE', 256 * 1024)
+)
+NOTIFICATIONS_OVERFLOW = os.getenv('NOTIFICATIONS_OVERFLOW', 'drop')
+# Журнал уведомлений пользователя для переподключения: сколько последних
+# уведомлений хранится и через сколько секунд без уведомлений он удаляется.
+NOTIFICATIONS_LOG_SIZE = int(os.getenv('NOTIFICATIONS_LOG_SIZE', 1000))
+NOTIFICATIONS_LOG_TTL = int(os.getenv('NOTIFICATIONS_LOG_TTL', 24 * 60 * 60))
+# Наибольшее время ожидания долгого опроса и интервал комментариев
+# keepalive в потоке Server-Sent Events, в секундах.
+NOTIFICATIONS_POLL_TIMEOUT = float(os.getenv('NOTIFICATIONS_POLL_TIMEOUT', 25))
+NOTIFICATIONS_KEEPALIVE_INTERVAL = float(
+    os.getenv('NOTIFICATIONS_KEEPALIVE_INTERVAL', 15)
+)
@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Запуск тестов без фоновых потоков, обращающихся к базе:
+    снимок автора в задачах обновляется сразу, поэтому поток
+    не работает с базой одного теста во время другого.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.TASKS_OWNER_SYNC_BACKGROUND = False
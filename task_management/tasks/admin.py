@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Task
+from .models import ArchivedTask, Task
 
 
 @admin.register(Task)
@@ -14,3 +14,15 @@ class TaskAdmin(admin.ModelAdmin):
         'created_date',
         'last_updated_date',
     )
+
+
+@admin.register(ArchivedTask)
+class ArchivedTaskAdmin(admin.ModelAdmin):
+    list_display = (
+        'id',
+        'title',
+        'status',
+        'user',
+        'created_date',
+        'archived_date',
+    )
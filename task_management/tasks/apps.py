@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class TasksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tasks'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .metrics import install_query_recorder
+        from .search import install_casefold
+
+        connection_created.connect(install_query_recorder)
+        connection_created.connect(install_casefold)
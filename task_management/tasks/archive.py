@@ -0,0 +1,83 @@
+import time
+
+from django.db import transaction
+from django.db.models import Q
+
+from .cache import invalidate_task_caches
+from .models import ArchivedTask, Task
+
+ARCHIVED_FIELDS = (
+    'id',
+    'title',
+    'description',
+    'status',
+    'created_date',
+    'last_updated_date',
+    'user_id',
+    'owner_first_name',
+    'owner_email',
+    'created_version',
+    'sync_version',
+)
+
+
+def get_archivable_tasks(cutoff):
+    """
+    Выполненные задачи, созданные и последний раз изменённые
+    до cutoff. Условие по дате создания использует индекс
+    task_status_created_idx.
+    """
+
+    return Task.objects.filter(
+        Q(last_updated_date__isnull=True) | Q(last_updated_date__lt=cutoff),
+        status='done',
+        created_date__lt=cutoff,
+    )
+
+
+def archive_batch(cutoff, batch_size):
+    """
+    Переносит в архив не больше batch_size самых старых задач
+    одной транзакцией и возвращает их количество.
+    Задачи, заблокированные параллельными изменениями, пропускаются
+    до следующего запуска. Счётчики по статусам не меняются:
+    архивные задачи в них учитываются.
+    """
+
+    with transaction.atomic():
+        tasks = list(
+            get_archivable_tasks(cutoff)
+            .select_for_update(skip_locked=True)
+            .order_by('created_date', 'id')
+            .only(*ARCHIVED_FIELDS)[:batch_size]
+        )
+        if not tasks:
+            return 0
+        ArchivedTask.objects.bulk_create(
+            ArchivedTask(
+                **{field: getattr(task, field) for field in ARCHIVED_FIELDS}
+            )
+            for task in tasks
+        )
+        Task.objects.filter(pk__in=[task.pk for task in tasks]).delete()
+    invalidate_task_caches(*(task.user_id for task in tasks))
+    return len(tasks)
+
+
+def archive_tasks(cutoff, batch_size, pause=0, max_batches=None):
+    """
+    Переносит задачи в архив пачками, пока они не закончатся
+    или не будет перенесено max_batches пачек.
+    Между пачками ждёт pause секунд, чтобы архивирование
+    не мешало запросам. Возвращает количество задач в каждой пачке.
+    """
+
+    batches = 0
+    while True:
+        archived = archive_batch(cutoff, batch_size)
+        if archived:
+            yield archived
+        batches += 1
+        if archived < batch_size or batches == max_batches:
+            return
+        time.sleep(pause)
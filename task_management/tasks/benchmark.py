@@ -0,0 +1,115 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import cycle
+
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from users.models import CustomUser
+from .counters import rebuild_counters
+from .models import Task
+
+BENCHMARK_PASSWORD = 'benchmark-password'
+
+
+@contextmanager
+def manual_created_date():
+    """
+    Временно отключает auto_now_add у Task.created_date,
+    чтобы при наполнении базы задавать даты создания вручную.
+    """
+
+    field = Task._meta.get_field('created_date')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def seed_users(count, batch_size=1000):
+    """
+    Создаёт пользователей для нагрузочных замеров.
+    Пароль хэшируется один раз и переиспользуется для всех пользователей.
+    """
+
+    template = CustomUser(email='template@example.com')
+    template.set_password(BENCHMARK_PASSWORD)
+    users = [
+        CustomUser(
+            email=f'benchmark-{index}@example.com',
+            first_name=f'User {index}',
+            password=template.password,
+        )
+        for index in range(count)
+    ]
+    return CustomUser.objects.bulk_create(users, batch_size=batch_size)
+
+
+def seed_tasks(count, users, batch_size=10000, days=365, seed=0):
+    """
+    Создаёт задачи пачками, распределяя их по пользователям, статусам
+    и датам создания за последние days дней,
+    после чего пересчитывает счётчики статусов.
+    """
+
+    rng = random.Random(seed)
+    statuses = [choice for choice, _ in Task.STATUS_CHOICES]
+    now = timezone.now()
+    span = int(timedelta(days=days).total_seconds())
+    owners = cycle(users)
+    created = 0
+    with manual_created_date():
+        while created < count:
+            size = min(batch_size, count - created)
+            tasks = [
+                Task(
+                    title=f'Задача {created + index}',
+                    description='Описание задачи для нагрузочного теста',
+                    status=rng.choice(statuses),
+                    created_date=now - timedelta(seconds=rng.randrange(span)),
+                    user=next(owners),
+                )
+                for index in range(size)
+            ]
+            for task in tasks:
+                task.copy_owner()
+            Task.objects.bulk_create(tasks)
+            created += size
+    rebuild_counters()
+    return created
+
+
+def seed_tokens(users, batch_size=1000):
+    """Создаёт токены пользователям и возвращает их ключи в том же порядке."""
+
+    tokens = [Token(key=Token.generate_key(), user=user) for user in users]
+    Token.objects.bulk_create(tokens, batch_size=batch_size)
+    return [token.key for token in tokens]
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга для отсортированного списка."""
+
+    if not values:
+        return None
+    rank = max(1, -(-len(values) * percent // 100))
+    return values[int(rank) - 1]
+
+
+def summarize_latencies(latencies, elapsed):
+    """
+    Сводка замеров: перцентили и среднее в миллисекундах
+    и количество операций в секунду.
+    """
+
+    values = sorted(latency * 1000 for latency in latencies)
+    return {
+        'count': len(values),
+        'p50_ms': percentile(values, 50),
+        'p95_ms': percentile(values, 95),
+        'p99_ms': percentile(values, 99),
+        'mean_ms': sum(values) / len(values) if values else None,
+        'rps': len(values) / elapsed if elapsed else None,
+    }
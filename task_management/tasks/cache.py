@@ -0,0 +1,421 @@
+import asyncio
+import time
+import weakref
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from functools import wraps
+from hashlib import md5
+from urllib.parse import urlencode
+
+from asgiref.sync import iscoroutinefunction
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+from django_redis.cache import RedisCache
+from redis.asyncio import ConnectionPool, Redis
+from rest_framework import status
+
+from config.db_router import get_read_alias
+from .metrics import increment, timer
+
+LIST_GENERATION_KEY = 'tasks:list:generation'
+USER_GENERATION_KEY = 'tasks:user:{user_id}:generation'
+RESPONSE_KEY = 'tasks:response:{digest}'
+
+
+class AsyncCache:
+    """
+    Асинхронный доступ к поколениям и ответам в кэше.
+    С django-redis обращается к Redis через redis.asyncio прямо
+    в событийном цикле, а не передаёт синхронный вызов в поток,
+    как асинхронные методы кэша Django. Ключи и значения кодирует
+    клиент django-redis, поэтому записи общие с синхронным кэшем,
+    а соединение строится по тем же настройкам.
+    Соединения redis.asyncio привязаны к событийному циклу.
+    Цикл ASGI-сервера получает клиента через bind() и закрывает
+    его через aclose() (см. AsyncCacheMiddleware). В остальных
+    циклах, например async_to_sync под WSGI и в тестах, клиент
+    создаётся на сессию и закрывается по её окончании.
+    С другими бэкендами кэша используются методы Django.
+    """
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+        self._clients = weakref.WeakKeyDictionary()
+        self._session = ContextVar(f'async_cache_{alias}', default=None)
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def make_client(self):
+        """
+        Создаёт клиента redis.asyncio по настройкам django-redis:
+        первый сервер из LOCATION (основной), PASSWORD, таймауты
+        сокетов из OPTIONS и CONNECTION_POOL_KWARGS.
+        """
+
+        location = settings.CACHES[self.alias]['LOCATION']
+        if isinstance(location, str):
+            location = location.split(',')
+        factory = self.backend.client.connection_factory
+        params = factory.make_connection_params(location[0])
+        params.pop('parser_class')
+        params.update(factory.pool_cls_kwargs)
+        return Redis.from_pool(ConnectionPool.from_url(**params))
+
+    def bind(self):
+        """
+        Закрепляет клиента за текущим циклом. Вызывается в цикле
+        ASGI-сервера, который живёт до завершения процесса.
+        """
+
+        if not isinstance(self.backend, RedisCache):
+            return
+        loop = asyncio.get_running_loop()
+        if loop not in self._clients:
+            self._clients[loop] = self.make_client()
+
+    async def aclose(self):
+        """Закрывает клиента, закреплённого за текущим циклом."""
+
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    @asynccontextmanager
+    async def session(self):
+        """
+        Открывает клиента на время блока, если за циклом не закреплён
+        клиент и сессия ещё не открыта. Вложенные сессии и обращения
+        внутри сессии используют одного клиента.
+        """
+
+        if (
+            not isinstance(self.backend, RedisCache)
+            or self._session.get() is not None
+            or asyncio.get_running_loop() in self._clients
+        ):
+            yield
+            return
+        client = self.make_client()
+        token = self._session.set(client)
+        try:
+            yield
+        finally:
+            self._session.reset(token)
+            await client.aclose()
+
+    def get_client(self):
+        client = self._session.get()
+        if client is None:
+            client = self._clients[asyncio.get_running_loop()]
+        return client
+
+    async def get(self, key):
+        backend = self.backend
+        if not isinstance(backend, RedisCache):
+            return await backend.aget(key)
+        async with self.session():
+            value = await self.get_client().get(
+                backend.client.make_key(key)
+            )
+        return None if value is None else backend.client.decode(value)
+
+    async def add(self, key, value, timeout):
+        backend = self.backend
+        if not isinstance(backend, RedisCache):
+            return await backend.aadd(key, value, timeout)
+        return bool(await self._set(backend, key, value, timeout, nx=True))
+
+    async def set(self, key, value, timeout):
+        backend = self.backend
+        if not isinstance(backend, RedisCache):
+            await backend.aset(key, value, timeout)
+            return
+        await self._set(backend, key, value, timeout)
+
+    async def _set(self, backend, key, value, timeout, nx=False):
+        async with self.session():
+            return await self.get_client().set(
+                backend.client.make_key(key),
+                backend.client.encode(value),
+                px=None if timeout is None else int(timeout * 1000),
+                nx=nx,
+            )
+
+
+async_cache = AsyncCache()
+
+
+class AsyncCacheMiddleware:
+    """
+    ASGI-обёртка, закрепляющая клиента async_cache за циклом сервера.
+    Обрабатывает lifespan: при запуске закрепляет клиента,
+    при остановке закрывает его. Серверы без lifespan (daphne)
+    закрепляют клиента при первом запросе.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        async_cache.bind()
+        await self.app(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                async_cache.bind()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await async_cache.aclose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+def _get_generation(key):
+    """
+    Возвращает текущее поколение кэша по ключу.
+    Если ключа нет (первое обращение или вытеснение), создаёт его
+    с уникальным значением, чтобы не воскресить старые записи.
+    """
+
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+async def _aget_generation(key):
+    """Асинхронный аналог _get_generation."""
+
+    generation = await async_cache.get(key)
+    if generation is None:
+        await async_cache.add(key, time.time_ns(), timeout=None)
+        generation = await async_cache.get(key)
+    return generation
+
+
+def _bump_generation(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def get_list_generation():
+    """Поколение кэша общего списка задач."""
+
+    return _get_generation(LIST_GENERATION_KEY)
+
+
+def get_user_generation(user_id):
+    """Поколение кэша списка задач конкретного пользователя."""
+
+    return _get_generation(USER_GENERATION_KEY.format(user_id=user_id))
+
+
+def invalidate_task_caches(*user_ids):
+    """
+    Инвалидирует кэш общего списка задач и списков задач
+    переданных пользователей.
+    Старые записи не удаляются, а перестают читаться и истекают по TTL.
+    """
+
+    _bump_generation(LIST_GENERATION_KEY)
+    for user_id in set(user_ids):
+        if user_id is not None:
+            _bump_generation(USER_GENERATION_KEY.format(user_id=user_id))
+
+
+def _get_cache_query(view, request):
+    """
+    Нормализует параметры запроса, влияющие на ответ:
+    оставляет только параметры фильтра и пагинации,
+    отбрасывает пустые и сортирует.
+    """
+
+    names = set(view.filterset_class.base_filters)
+    if getattr(view, 'archived_query_param', None):
+        names.add(view.archived_query_param)
+    for attr in (
+        'cursor_query_param',
+        'page_size_query_param',
+        'envelope_query_param',
+    ):
+        name = getattr(view.paginator, attr, None)
+        if name:
+            names.add(name)
+    items = sorted(
+        (name, value)
+        for name in names
+        for value in request.query_params.getlist(name)
+        if value
+    )
+    return urlencode(items)
+
+
+def _build_response_cache_key(view, request, owner, generation):
+    raw_key = ':'.join(
+        str(part)
+        for part in (
+            view.action,
+            owner,
+            generation,
+            request.accepted_media_type,
+            _get_cache_query(view, request),
+        )
+    )
+    return RESPONSE_KEY.format(digest=md5(raw_key.encode()).hexdigest())
+
+
+def get_response_cache_key(view, request, per_user=False):
+    """
+    Формирует ключ кэша ответа.
+    Учитывает действие вьюсета, поколение кэша, формат ответа,
+    параметры фильтрации и, при per_user=True, пользователя.
+    """
+
+    if per_user:
+        owner = request.user.pk
+        generation = get_user_generation(owner)
+    else:
+        owner = ''
+        generation = get_list_generation()
+    return _build_response_cache_key(view, request, owner, generation)
+
+
+async def aget_response_cache_key(view, request, per_user=False):
+    """Асинхронный аналог get_response_cache_key."""
+
+    if per_user:
+        owner = request.user.pk
+        key = USER_GENERATION_KEY.format(user_id=owner)
+    else:
+        owner = ''
+        key = LIST_GENERATION_KEY
+    generation = await _aget_generation(key)
+    return _build_response_cache_key(view, request, owner, generation)
+
+
+def get_response_timeout():
+    """
+    TTL записи кэша ответа. Ответ, собранный по данным реплики,
+    может не видеть записи, уже сменившие поколение кэша, поэтому
+    хранится не дольше DB_REPLICA_MAX_LAG секунд.
+    """
+
+    if get_read_alias() is None:
+        return settings.TASKS_CACHE_TIMEOUT
+    return min(settings.TASKS_CACHE_TIMEOUT, settings.DB_REPLICA_MAX_LAG)
+
+
+def _etag_matches(etag, if_none_match):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    return any(
+        tag.removeprefix('W/') == etag for tag in parse_etags(if_none_match)
+    )
+
+
+def _render_response(view, request, response, *args, **kwargs):
+    """Рендерит ответ и возвращает его вместе с записью для кэша."""
+
+    response = view.finalize_response(request, response, *args, **kwargs)
+    response.render()
+    etag = f'"{md5(response.content).hexdigest()}"'
+    return response, (response.content, response['Content-Type'], etag)
+
+
+def _finish_response(request, response, cached, per_user):
+    content, content_type, etag = cached
+    if response is None:
+        response = HttpResponse(content, content_type=content_type)
+    if _etag_matches(etag, request.headers.get('If-None-Match')):
+        response = HttpResponseNotModified()
+    response['ETag'] = etag
+    if per_user:
+        patch_cache_control(response, private=True)
+        patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+def cache_response(per_user=False):
+    """
+    Декоратор методов вьюсета, кэширующий уже отрендеренный ответ.
+    Ключ зависит от поколения кэша, параметров фильтрации и,
+    при per_user=True, от пользователя.
+    Поддерживает ETag и ответ 304 на If-None-Match.
+    Ответы, прочитанные с реплики, кэшируются ненадолго.
+    Асинхронные методы обращаются к кэшу через async_cache,
+    без передачи вызовов в поток.
+    """
+
+    def decorator(view_method):
+        if iscoroutinefunction(view_method):
+
+            @wraps(view_method)
+            async def async_wrapper(self, request, *args, **kwargs):
+                async with async_cache.session():
+                    with timer('cache'):
+                        key = await aget_response_cache_key(
+                            self, request, per_user
+                        )
+                        cached = await async_cache.get(key)
+                    response = None
+                    if cached is None:
+                        increment('cache_misses')
+                        response = await view_method(
+                            self, request, *args, **kwargs
+                        )
+                        if response.status_code != status.HTTP_200_OK:
+                            return response
+                        response, cached = _render_response(
+                            self, request, response, *args, **kwargs
+                        )
+                        timeout = get_response_timeout()
+                        if timeout > 0:
+                            with timer('cache'):
+                                await async_cache.set(key, cached, timeout)
+                    else:
+                        increment('cache_hits')
+                return _finish_response(request, response, cached, per_user)
+
+            return async_wrapper
+
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            with timer('cache'):
+                key = get_response_cache_key(self, request, per_user)
+                cached = cache.get(key)
+            response = None
+            if cached is None:
+                increment('cache_misses')
+                response = view_method(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                response, cached = _render_response(
+                    self, request, response, *args, **kwargs
+                )
+                timeout = get_response_timeout()
+                if timeout > 0:
+                    with timer('cache'):
+                        cache.set(key, cached, timeout)
+            else:
+                increment('cache_hits')
+            return _finish_response(request, response, cached, per_user)
+
+        return wrapper
+
+    return decorator
@@ -1,27 +1,317 @@
+import asyncio
 import json
+import threading
+from collections import OrderedDict
+from functools import partial
+from urllib.parse import parse_qs
 
+import orjson
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
 
+from users.authentication import TOKEN_SUBPROTOCOL
+from .notification_log import notification_log, parse_sequence_id
 
-GROUP_NAME = 'notifications'
+# Код закрытия "Try Again Later" для отстающих клиентов.
+CLOSE_CODE_TRY_AGAIN_LATER = 1013
+
+
+def user_group_name(user_id):
+    """Группа уведомлений о задачах пользователя."""
+
+    return f'notifications.user.{user_id}'
+
+
+def task_group_name(task_id):
+    """Группа уведомлений о конкретной задаче."""
+
+    return f'notifications.task.{task_id}'
+
+
+class OutboundStats:
+    """
+    Счётчики исходящих очередей веб-сокет соединений процесса:
+    уведомления в очередях, объединённые, отброшенные уведомления
+    и отключённые из-за переполнения очереди клиенты.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.disconnected = 0
+
+    def add(self, name, value=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + value)
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'queued': self.queued,
+                'coalesced': self.coalesced,
+                'dropped': self.dropped,
+                'disconnected': self.disconnected,
+            }
+
+
+outbound_stats = OutboundStats()
+
+
+def get_write_buffer_size(send):
+    """
+    Байты, записанные в соединение, но ещё не переданные клиенту,
+    или None, если сервер их не сообщает. В ASGI размера буфера нет,
+    поэтому он читается у транспорта Twisted соединения daphne:
+    send в daphne - partial(Server.handle_reply, протокол).
+    """
+
+    if not isinstance(send, partial) or not send.args:
+        return None
+    transport = getattr(send.args[0], 'transport', None)
+    data_buffer = getattr(transport, 'dataBuffer', None)
+    if data_buffer is None:
+        return None
+    return (
+        len(data_buffer)
+        - getattr(transport, 'offset', 0)
+        + getattr(transport, '_tempDataLen', 0)
+    )
 
 
 class NotificationConsumer(AsyncWebsocketConsumer):
     """
     Класс для обработки веб-сокет соединений и отправки уведомлений.
-    Подключается к группе при подключении и отключается при отключении.
-    Отправляет уведомления, полученные от группы, клиенту.
+    Принимает только аутентифицированные соединения и подписывает их
+    на уведомления о задачах пользователя.
+    Дополнительно можно подписаться на конкретные задачи параметром
+    запроса tasks=1,2 или сообщениями
+    {"action": "subscribe" | "unsubscribe", "task_id": 1}.
+    Уведомления копятся в ограниченной исходящей очереди соединения:
+    уведомления об одной задаче объединяются в последнее, очередь
+    отправляется одним кадром раз в NOTIFICATIONS_FLUSH_INTERVAL секунд.
+    Уведомления остаются в очереди, пока кадр не записан, а пока
+    в буфере соединения больше NOTIFICATIONS_CONNECTION_BUFFER_SIZE байт
+    (клиент не читает), новые кадры не отправляются.
+    При переполнении очереди или буфера новые уведомления отбрасываются
+    или клиент отключается, в зависимости от NOTIFICATIONS_OVERFLOW.
+    Уведомления о своих задачах приходят с id. Клиент, переподключаясь
+    с параметром last_seen_id, сначала получает пропущенные уведомления
+    из журнала, а если журнал их уже не хранит - кадр {"resync": true}.
     """
 
+    outbound = None
+    flush_task = None
+    overflowed = False
+    replayed_id = None
+
     async def connect(self):
-        self.group_name = GROUP_NAME
-        await self.channel_layer.group_add(self.group_name, self.channel_name)
-        await self.accept()
+        self.user = self.scope.get('user')
+        if self.user is None or not self.user.is_authenticated:
+            await self.close()
+            return
 
-    async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(
-            self.group_name, self.channel_name
+        self.outbound = OrderedDict()
+        self.subscribed_groups = set()
+        await self.subscribe(user_group_name(self.user.pk))
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        for value in query.get('tasks', ()):
+            for task_id in value.split(','):
+                if task_id.strip().isdigit():
+                    await self.subscribe_task(int(task_id))
+
+        subprotocols = self.scope.get('subprotocols') or []
+        await self.accept(
+            TOKEN_SUBPROTOCOL if TOKEN_SUBPROTOCOL in subprotocols else None
         )
+        last_seen_id = query.get('last_seen_id', [''])[-1]
+        if last_seen_id:
+            await self.replay(last_seen_id)
+
+    async def replay(self, last_seen_id):
+        """
+        Ставит в очередь уведомления из журнала после last_seen_id.
+        Пока выполняется connect, события групп не обрабатываются,
+        поэтому уже прочитанные из журнала уведомления потом
+        пропускаются по id.
+        """
+
+        missed = await sync_to_async(
+            notification_log.read_after, thread_sensitive=False
+        )(self.user.pk, last_seen_id)
+        if missed is None:
+            await self.send(text_data=orjson.dumps({'resync': True}).decode())
+            return
+        for notification in missed:
+            await self.queue_notification(notification)
+        if missed:
+            self.replayed_id = parse_sequence_id(missed[-1]['id'])
+
+    async def disconnect(self, close_code):
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+        if self.outbound:
+            outbound_stats.add('queued', -len(self.outbound))
+            self.outbound.clear()
+        for group_name in getattr(self, 'subscribed_groups', ()):
+            await self.channel_layer.group_discard(
+                group_name, self.channel_name
+            )
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            data = json.loads(text_data or '')
+            action = data['action']
+            task_id = int(data['task_id'])
+        except (KeyError, TypeError, ValueError):
+            await self.send_error('Ожидается {"action": ..., "task_id": ...}.')
+            return
+
+        if action == 'subscribe':
+            if not await self.subscribe_task(task_id):
+                await self.send_error('Превышен лимит подписок на задачи.')
+        elif action == 'unsubscribe':
+            group_name = task_group_name(task_id)
+            if group_name in self.subscribed_groups:
+                self.subscribed_groups.discard(group_name)
+                await self.channel_layer.group_discard(
+                    group_name, self.channel_name
+                )
+        else:
+            await self.send_error(f'Неизвестное действие {action}.')
+
+    async def subscribe(self, group_name):
+        self.subscribed_groups.add(group_name)
+        await self.channel_layer.group_add(group_name, self.channel_name)
+
+    async def subscribe_task(self, task_id):
+        group_name = task_group_name(task_id)
+        if group_name in self.subscribed_groups:
+            return True
+        if (
+            len(self.subscribed_groups) - 1
+            >= settings.NOTIFICATIONS_MAX_TASK_SUBSCRIPTIONS
+        ):
+            return False
+        await self.subscribe(group_name)
+        return True
+
+    async def send_error(self, error):
+        await self.send(text_data=json.dumps({'error': error}))
 
     async def send_notification(self, event):
-        await self.send(text_data=json.dumps({'message': event['message']}))
+        if event.get('scope') == 'task' and event['user_id'] == self.user.pk:
+            # Владелец уже получает уведомление через свою группу.
+            return
+        await self.queue_notification(event)
+
+    async def send_notifications(self, event):
+        for notification in event['notifications']:
+            await self.queue_notification(notification)
+
+    async def queue_notification(self, notification):
+        """
+        Ставит уведомление в исходящую очередь соединения, заменяя
+        ещё не отправленное уведомление о той же задаче.
+        """
+
+        if self.overflowed:
+            return
+        sequence_id = notification.get('id')
+        if (
+            sequence_id is not None
+            and self.replayed_id is not None
+            and parse_sequence_id(sequence_id) <= self.replayed_id
+        ):
+            return
+        task_id = notification['task_id']
+        if task_id in self.outbound:
+            self.outbound.move_to_end(task_id)
+            outbound_stats.add('coalesced')
+        elif (
+            len(self.outbound)
+            >= settings.NOTIFICATIONS_CONNECTION_QUEUE_SIZE
+        ):
+            await self.handle_overflow()
+            return
+        else:
+            outbound_stats.add('queued')
+        self.outbound[task_id] = {
+            'task_id': task_id,
+            'message': notification['message'],
+        }
+        if sequence_id is not None:
+            self.outbound[task_id]['id'] = sequence_id
+        if self.flush_task is None:
+            self.flush_task = asyncio.create_task(self.flush_later())
+
+    async def handle_overflow(self):
+        if settings.NOTIFICATIONS_OVERFLOW != 'disconnect':
+            outbound_stats.add('dropped')
+            return
+        await self.disconnect_lagging(dropped=1)
+
+    async def disconnect_lagging(self, dropped=0):
+        """Отключает отстающего клиента с кодом 1013."""
+
+        self.overflowed = True
+        outbound_stats.add('disconnected')
+        outbound_stats.add('dropped', len(self.outbound) + dropped)
+        outbound_stats.add('queued', -len(self.outbound))
+        self.outbound.clear()
+        await self.close(code=CLOSE_CODE_TRY_AGAIN_LATER)
+
+    def get_write_buffer_size(self):
+        return get_write_buffer_size(self.base_send)
+
+    async def flush_later(self):
+        """
+        Отправляет очередь, пока в ней есть уведомления. Одновременно
+        записывается только один кадр, а уведомления, пришедшие
+        во время записи, ждут следующего кадра.
+        """
+
+        try:
+            while self.outbound and not self.overflowed:
+                await asyncio.sleep(settings.NOTIFICATIONS_FLUSH_INTERVAL)
+                await self.flush()
+        finally:
+            self.flush_task = None
+
+    async def flush(self):
+        """
+        Отправляет накопленные уведомления: одно - отдельным кадром,
+        несколько - кадром со списком notifications.
+        Уведомления удаляются из очереди только после записи кадра,
+        поэтому у клиента, который не читает, очередь растёт
+        и переполняется. Пока буфер соединения переполнен,
+        кадр не отправляется.
+        """
+
+        if not self.outbound:
+            return
+        buffered = self.get_write_buffer_size()
+        if (
+            buffered is not None
+            and buffered > settings.NOTIFICATIONS_CONNECTION_BUFFER_SIZE
+        ):
+            if settings.NOTIFICATIONS_OVERFLOW == 'disconnect':
+                await self.disconnect_lagging()
+            return
+        sent = list(self.outbound.items())
+        notifications = [notification for _, notification in sent]
+        frame = (
+            notifications[0]
+            if len(notifications) == 1
+            else {'notifications': notifications}
+        )
+        await self.send(text_data=orjson.dumps(frame).decode())
+        removed = 0
+        for task_id, notification in sent:
+            # Уведомление, заменённое во время записи, остаётся в очереди.
+            if self.outbound.get(task_id) is notification:
+                del self.outbound[task_id]
+                removed += 1
+        outbound_stats.add('queued', -removed)
@@ -0,0 +1,180 @@
+import random
+from collections import Counter
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Q
+
+from .models import ArchivedTask, Task, TaskStatusCounter
+
+
+def _add(user_id, status, delta, shard=0):
+    counters = TaskStatusCounter.objects.filter(
+        user_id=user_id, status=status, shard=shard
+    )
+    if counters.update(count=F('count') + delta):
+        return
+    try:
+        with transaction.atomic():
+            TaskStatusCounter.objects.create(
+                user_id=user_id, status=status, shard=shard, count=delta
+            )
+    except IntegrityError:
+        # Счётчик успел создать параллельный запрос.
+        counters.update(count=F('count') + delta)
+
+
+def apply_counter_deltas(deltas):
+    """
+    Применяет изменения счётчиков {(id пользователя, статус): дельта}
+    к счётчикам пользователей и к общим счётчикам.
+    Вызывается в транзакции изменения задач. Счётчики обновляются
+    в одном порядке, чтобы параллельные транзакции не взаимоблокировались.
+    Общие счётчики обновляются в случайной из TASKS_COUNTER_SHARDS
+    частей, чтобы транзакции разных пользователей не ждали друг друга.
+    """
+
+    shard = random.randrange(settings.TASKS_COUNTER_SHARDS)
+    totals = Counter()
+    for (user_id, status), delta in deltas.items():
+        totals[(None, status)] += delta
+        if user_id is not None:
+            totals[(user_id, status)] += delta
+    for (user_id, status), delta in sorted(
+        totals.items(),
+        key=lambda item: (item[0][0] is not None, item[0][0] or 0, item[0][1]),
+    ):
+        if delta:
+            _add(user_id, status, delta, shard if user_id is None else 0)
+
+
+def lock_tasks(tasks):
+    """
+    Перечитывает строки задач с блокировкой до конца транзакции
+    и переносит их текущие значения в объекты задач, поэтому прежний
+    статус для счётчиков берётся из строки, которую параллельные
+    запросы уже не изменят. Строки блокируются в порядке id, чтобы
+    параллельные транзакции не взаимоблокировались.
+    Возвращает задачи, строки которых ещё существуют, в исходном порядке.
+    """
+
+    rows = {
+        row['id']: row
+        for row in Task.objects.select_for_update()
+        .filter(pk__in=[task.pk for task in tasks])
+        .order_by('pk')
+        .values(*(field.attname for field in Task._meta.concrete_fields))
+    }
+    locked = []
+    for task in tasks:
+        row = rows.get(task.pk)
+        if row is None:
+            continue
+        for attname, value in row.items():
+            setattr(task, attname, value)
+        locked.append(task)
+    return locked
+
+
+def count_created_tasks(tasks):
+    apply_counter_deltas(
+        Counter((task.user_id, task.status) for task in tasks)
+    )
+
+
+def count_deleted_tasks(tasks):
+    deltas = Counter()
+    for task in tasks:
+        deltas[(task.user_id, task.status)] -= 1
+    apply_counter_deltas(deltas)
+
+
+def count_status_changes(changes):
+    """Учитывает смену статуса по парам (задача, прежний статус)."""
+
+    deltas = Counter()
+    for task, old_status in changes:
+        deltas[(task.user_id, old_status)] -= 1
+        deltas[(task.user_id, task.status)] += 1
+    apply_counter_deltas(deltas)
+
+
+def get_status_summary(user=None):
+    """
+    Возвращает количество задач по статусам: общее и, если передан
+    аутентифицированный пользователь, его собственное.
+    Читает части общего счётчика и строку пользователя на статус.
+    """
+
+    statuses = [status for status, _ in Task.STATUS_CHOICES]
+    scopes = {None: 'global'}
+    if user is not None and user.is_authenticated:
+        scopes[user.pk] = 'user'
+    summary = {scope: dict.fromkeys(statuses, 0) for scope in scopes.values()}
+    condition = Q(user__isnull=True)
+    if len(scopes) > 1:
+        condition |= Q(user_id=user.pk)
+    for user_id, status, count in TaskStatusCounter.objects.filter(
+        condition
+    ).values_list('user_id', 'status', 'count'):
+        summary[scopes[user_id]][status] += count
+    for counts in summary.values():
+        counts['total'] = sum(counts.values())
+    return summary
+
+
+def get_actual_counts():
+    """
+    Считает задачи по пользователям и статусам по таблицам задач
+    и архива: архивные задачи тоже учитываются в счётчиках.
+    """
+
+    counts = Counter()
+    for model in (Task, ArchivedTask):
+        for row in (
+            model.objects.order_by()
+            .values('user_id', 'status')
+            .annotate(count=Count('id'))
+        ):
+            counts[(None, row['status'])] += row['count']
+            if row['user_id'] is not None:
+                counts[(row['user_id'], row['status'])] += row['count']
+    return counts
+
+
+def rebuild_counters(dry_run=False):
+    """
+    Пересчитывает все счётчики по таблицам задач и архива,
+    при dry_run только ищет расхождения.
+    В PostgreSQL на время пересчёта таблицы блокируются
+    от изменений, чтобы не потерять параллельные обновления.
+    Возвращает расхождения {(id пользователя, статус): (было, стало)}.
+    """
+
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'LOCK TABLE {Task._meta.db_table}, '
+                    f'{ArchivedTask._meta.db_table} IN SHARE MODE'
+                )
+        actual = get_actual_counts()
+        counters = TaskStatusCounter.objects.values_list(
+            'user_id', 'status', 'count'
+        )
+        stored = Counter()
+        for user_id, status, count in counters:
+            stored[(user_id, status)] += count
+        mismatches = {
+            key: (stored.get(key, 0), actual.get(key, 0))
+            for key in stored.keys() | actual.keys()
+            if stored.get(key, 0) != actual.get(key, 0)
+        }
+        if dry_run:
+            return mismatches
+        TaskStatusCounter.objects.all().delete()
+        TaskStatusCounter.objects.bulk_create(
+            TaskStatusCounter(user_id=user_id, status=status, count=count)
+            for (user_id, status), count in actual.items()
+        )
+    return mismatches
@@ -0,0 +1,91 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .owners import get_owner_columns
+
+EXPORT_FIELDS = (
+    'id',
+    'title',
+    'description',
+    'status',
+    'created_date',
+    'last_updated_date',
+    'user_id',
+    'user_first_name',
+    'user_email',
+)
+
+
+def get_export_rows(queryset):
+    """
+    Возвращает строки выгрузки в виде словарей без создания моделей.
+    Данные автора берутся из снимка в задаче, см. get_owner_columns.
+    """
+
+    return queryset.values(
+        'id',
+        'title',
+        'description',
+        'status',
+        'created_date',
+        'last_updated_date',
+        'user_id',
+        **get_owner_columns(),
+    )
+
+
+def render_ndjson(rows):
+    return ''.join(
+        json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+        for row in rows
+    )
+
+
+def render_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(
+        [
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in row.values()
+        ]
+        for row in rows
+    )
+    return buffer.getvalue()
+
+
+def render_csv_header():
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(EXPORT_FIELDS)
+    return buffer.getvalue()
+
+
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', render_ndjson, None),
+    'csv': ('text/csv; charset=utf-8', render_csv, render_csv_header),
+}
+
+
+async def stream_export(queryset, render, render_header, chunk_size):
+    """
+    Асинхронно выгружает строки серверным курсором пачками по chunk_size,
+    отдавая каждую пачку одним куском ответа.
+    Память не зависит от количества выгружаемых задач.
+    """
+
+    if render_header is not None:
+        yield render_header()
+    rows = []
+    async for row in get_export_rows(queryset).aiterator(
+        chunk_size=chunk_size
+    ):
+        rows.append(row)
+        if len(rows) >= chunk_size:
+            yield render(rows)
+            rows = []
+    if rows:
+        yield render(rows)
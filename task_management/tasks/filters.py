@@ -1,20 +1,54 @@
+from datetime import datetime, time, timedelta
+
 import django_filters
+from django.utils import timezone
+
 from .models import Task
+from .search import search_tasks
 
 
 class TaskFilter(django_filters.FilterSet):
     """
     Фильтр для модели Task.
-    Позволяет фильтровать задачи по статусу и дате создания.
+    Позволяет фильтровать задачи по статусу и дате создания
+    и искать по тексту названия и описания.
     """
 
     status = django_filters.ChoiceFilter(
         field_name='status', choices=Task.STATUS_CHOICES
     )
-    created_date = django_filters.DateTimeFilter(
-        field_name='created_date', lookup_expr='date'
+    created_date = django_filters.DateFilter(
+        field_name='created_date', method='filter_created_date'
+    )
+    q = django_filters.CharFilter(
+        method='filter_search',
+        max_length=200,
+        label='Поиск по названию и описанию',
     )
 
     class Meta:
         model = Task
-        fields = ['status', 'created_date']
+        fields = ['status', 'created_date', 'q']
+
+    def filter_created_date(self, queryset, name, value):
+        """
+        Фильтрует задачи по дате создания полуинтервалом
+        [начало дня, начало следующего дня) в текущем часовом поясе.
+        В отличие от приведения к дате, такое условие использует индекс.
+        """
+
+        start = timezone.make_aware(datetime.combine(value, time.min))
+        end = timezone.make_aware(
+            datetime.combine(value + timedelta(days=1), time.min)
+        )
+        return queryset.filter(
+            **{f'{name}__gte': start, f'{name}__lt': end}
+        )
+
+    def filter_search(self, queryset, name, value):
+        """
+        Отбирает задачи, содержащие слова запроса, и упорядочивает
+        их по релевантности при пагинации.
+        """
+
+        return search_tasks(queryset, value)
@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tasks.archive import archive_tasks, get_archivable_tasks
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит выполненные задачи, которые не менялись дольше '
+        'TASKS_ARCHIVE_AFTER_DAYS дней, в архив пачками с паузой между '
+        'ними. Команду можно запускать по расписанию и прерывать: '
+        'каждая пачка переносится отдельной транзакцией.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.TASKS_ARCHIVE_AFTER_DAYS,
+            help='Архивировать задачи старше указанного числа дней.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.TASKS_ARCHIVE_BATCH_SIZE,
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=settings.TASKS_ARCHIVE_PAUSE,
+            help='Пауза между пачками в секундах.',
+        )
+        parser.add_argument(
+            '--max-batches',
+            type=int,
+            default=None,
+            help='Остановиться после указанного числа пачек.',
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только посчитать задачи для архивирования.',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        if options['check']:
+            count = get_archivable_tasks(cutoff).count()
+            self.stdout.write(f'Задач для архивирования: {count}.')
+            return
+        total = 0
+        for archived in archive_tasks(
+            cutoff,
+            options['batch_size'],
+            options['pause'],
+            options['max_batches'],
+        ):
+            total += archived
+            self.stdout.write(f'Перенесено в архив: {total}')
+        self.stdout.write(f'Архивирование завершено, перенесено: {total}.')
@@ -0,0 +1,417 @@
+import asyncio
+import json
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import AsyncClient, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from tasks.benchmark import (
+    seed_tasks,
+    seed_tokens,
+    seed_users,
+    summarize_latencies,
+)
+from tasks.consumers import task_group_name
+from tasks.models import Task
+from tasks.notifications import dispatcher
+from tasks.routing import websocket_urlpatterns
+from users.authentication import TokenAuthMiddleware
+from users.hashing import hashing_pool
+
+IN_MEMORY_CHANNEL_LAYERS = {
+    'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}
+}
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+}
+WS_RECEIVE_TIMEOUT = 10
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет временную базу пользователями и задачами, нагружает '
+        'эндпоинты задач и веб-сокет уведомлений и сохраняет перцентили '
+        'задержек, RPS и количество запросов к базе в JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--tasks', type=int, default=100_000)
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Количество запросов к каждому эндпоинту.',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=10,
+            help='Количество одновременных запросов.',
+        )
+        parser.add_argument('--ws-clients', type=int, default=100)
+        parser.add_argument('--ws-messages', type=int, default=20)
+        parser.add_argument(
+            '--cache',
+            choices=('locmem', 'default'),
+            default='locmem',
+            help='locmem - кэш в памяти процесса, default - кэш из '
+            'настроек проекта (Redis).',
+        )
+        parser.add_argument(
+            '--hashing-workers',
+            type=int,
+            default=None,
+            help='Потоки пула хеширования паролей в сценарии register, '
+            '0 - хешировать без пула. По умолчанию из настроек.',
+        )
+        parser.add_argument('--output', default='benchmark_api.json')
+        parser.add_argument(
+            '--noinput',
+            '--no-input',
+            action='store_false',
+            dest='interactive',
+            help='Не спрашивать подтверждение на удаление старой '
+            'тестовой базы.',
+        )
+
+    def handle(self, *args, **options):
+        overrides = {
+            'ALLOWED_HOSTS': ['testserver'],
+            'CHANNEL_LAYERS': IN_MEMORY_CHANNEL_LAYERS,
+        }
+        if options['cache'] == 'locmem':
+            overrides['CACHES'] = LOCMEM_CACHES
+
+        old_name = connection.settings_dict['NAME']
+        with override_settings(**overrides):
+            connection.creation.create_test_db(
+                verbosity=0,
+                autoclobber=not options['interactive'],
+                serialize=False,
+            )
+            try:
+                results = self.run(options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        with open(options['output'], 'w') as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+        self.print_results(results)
+        self.stdout.write(f'Результаты сохранены в {options["output"]}')
+
+    def run(self, options):
+        if options['hashing_workers'] is not None:
+            hashing_pool.workers = options['hashing_workers']
+        self.stdout.write(
+            f'Создание {options["users"]} пользователей и '
+            f'{options["tasks"]} задач...'
+        )
+        users = seed_users(options['users'])
+        keys = seed_tokens(users)
+        seed_tasks(options['tasks'], users, batch_size=options['batch_size'])
+        tokens = dict(zip((user.pk for user in users), keys))
+
+        results = {
+            'meta': {
+                'started_at': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'cache': options['cache'],
+                'users': options['users'],
+                'tasks': options['tasks'],
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+                'hashing_workers': hashing_pool.workers,
+            },
+            'endpoints': {},
+        }
+        for name, scenario in self.get_scenarios(tokens, options).items():
+            self.stdout.write(f'Замер {name}...')
+            cold, warm = self.count_queries(scenario)
+            timing = asyncio.run(
+                self.drive(
+                    scenario, 2, options['requests'], options['concurrency']
+                )
+            )
+            results['endpoints'][name] = {
+                **timing,
+                'queries_cold': cold,
+                'queries_warm': warm,
+            }
+        dispatcher.queue.join()
+
+        if options['ws_clients']:
+            self.stdout.write('Замер веб-сокет уведомлений...')
+            results['websocket'] = asyncio.run(
+                self.drive_websocket(
+                    options['ws_clients'],
+                    options['ws_messages'],
+                    list(tokens.values()),
+                    Task.objects.values_list('id', flat=True).first(),
+                )
+            )
+        return results
+
+    def get_scenarios(self, tokens, options):
+        """
+        Возвращает сценарии нагрузки: функции, которые по номеру запроса
+        возвращают метод, путь, данные и токен пользователя.
+        Для изменения и удаления берутся разные задачи их владельцев.
+        """
+
+        size = options['requests'] + 2
+        owned = [
+            (task_id, tokens[user_id])
+            for task_id, user_id in Task.objects.order_by('id').values_list(
+                'id', 'user_id'
+            )[: size * 3]
+        ]
+        retrieved = owned[:size]
+        updated = owned[size : size * 2]
+        deleted = owned[size * 2 :]
+        keys = list(tokens.values())
+        statuses = [choice for choice, _ in Task.STATUS_CHOICES]
+        days = [
+            (timezone.localdate() - timedelta(days=day)).isoformat()
+            for day in range(365)
+        ]
+        list_url = reverse('task-list')
+
+        def detail_url(task_id):
+            return reverse('task-detail', kwargs={'pk': task_id})
+
+        def token(index):
+            return keys[index % len(keys)]
+
+        return {
+            'list': lambda i: ('get', list_url, {}, token(i)),
+            'list_msgpack': lambda i: (
+                'get',
+                list_url,
+                {'format': 'msgpack'},
+                token(i),
+            ),
+            'list_users_envelope': lambda i: (
+                'get',
+                list_url,
+                {'envelope': 'users'},
+                token(i),
+            ),
+            'list_filter_status': lambda i: (
+                'get',
+                list_url,
+                {'status': statuses[i % len(statuses)]},
+                token(i),
+            ),
+            'list_filter_date': lambda i: (
+                'get',
+                list_url,
+                {'created_date': days[i % len(days)]},
+                token(i),
+            ),
+            'my_tasks': lambda i: (
+                'get',
+                reverse('task-my-tasks'),
+                {},
+                token(i),
+            ),
+            'my_tasks_sync': lambda i: (
+                'get',
+                reverse('task-my-tasks-sync'),
+                {},
+                token(i),
+            ),
+            'summary': lambda i: (
+                'get',
+                reverse('task-summary'),
+                {},
+                token(i),
+            ),
+            'retrieve': lambda i: (
+                'get',
+                detail_url(retrieved[i % len(retrieved)][0]),
+                {},
+                retrieved[i % len(retrieved)][1],
+            ),
+            'create': lambda i: (
+                'post',
+                list_url,
+                {'title': f'Задача {i}', 'description': 'Нагрузочный тест'},
+                token(i),
+            ),
+            'update': lambda i: (
+                'patch',
+                detail_url(updated[i % len(updated)][0]),
+                {'status': statuses[i % len(statuses)]},
+                updated[i % len(updated)][1],
+            ),
+            'delete': lambda i: (
+                'delete',
+                detail_url(deleted[i % len(deleted)][0]),
+                {},
+                deleted[i % len(deleted)][1],
+            ),
+            'register': lambda i: (
+                'post',
+                reverse('register'),
+                {
+                    'first_name': 'Бенчмарк',
+                    'email': f'register-{i}@example.com',
+                    'password': f'Benchmark-{i}',
+                },
+                token(i),
+            ),
+        }
+
+    @staticmethod
+    def send(client, method, path, data, token):
+        headers = {'Authorization': f'Token {token}'}
+        if method == 'get':
+            return client.get(path, data, headers=headers)
+        return getattr(client, method)(
+            path,
+            json.dumps(data),
+            content_type='application/json',
+            headers=headers,
+        )
+
+    def count_queries(self, scenario):
+        """
+        Считает запросы к базе для первого и повторного запроса сценария,
+        то есть без кэша и с прогретым кэшем.
+        """
+
+        client = Client()
+        counts = []
+        for index in range(2):
+            with CaptureQueriesContext(connection) as context:
+                self.send(client, *scenario(index))
+            counts.append(len(context.captured_queries))
+        return counts
+
+    async def drive(self, scenario, start, total, concurrency):
+        """Выполняет total запросов сценария по concurrency одновременно."""
+
+        client = AsyncClient()
+        indexes = iter(range(start, start + total))
+        latencies = []
+        errors = 0
+
+        async def worker():
+            nonlocal errors
+            for index in indexes:
+                started = time.perf_counter()
+                response = await self.send(client, *scenario(index))
+                latencies.append(time.perf_counter() - started)
+                if response.status_code >= 400:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        # Тестовый клиент не закрывает соединения в конце запроса,
+        # соединение потока синхронных вызовов закрывается вручную,
+        # иначе тестовую базу не удастся удалить.
+        await sync_to_async(connections.close_all)()
+        return {**summarize_latencies(latencies, elapsed), 'errors': errors}
+
+    async def drive_websocket(self, clients, messages, tokens, task_id):
+        """
+        Подключает clients веб-сокет клиентов с подпиской на задачу
+        и замеряет время подключения и доставки уведомлений всем клиентам.
+        """
+
+        application = TokenAuthMiddleware(URLRouter(websocket_urlpatterns))
+
+        async def connect(index):
+            communicator = WebsocketCommunicator(
+                application,
+                f'api/ws/notification/?tasks={task_id}',
+                subprotocols=['token', tokens[index % len(tokens)]],
+            )
+            started = time.perf_counter()
+            connected, _ = await communicator.connect(WS_RECEIVE_TIMEOUT)
+            return communicator, connected, time.perf_counter() - started
+
+        started = time.perf_counter()
+        sockets = await asyncio.gather(
+            *(connect(index) for index in range(clients))
+        )
+        connect_elapsed = time.perf_counter() - started
+        communicators = [
+            communicator
+            for communicator, connected, _ in sockets
+            if connected
+        ]
+
+        channel_layer = get_channel_layer()
+        delivery = []
+
+        async def receive(communicator, sent):
+            await communicator.receive_from(WS_RECEIVE_TIMEOUT)
+            return time.perf_counter() - sent
+
+        started = time.perf_counter()
+        for number in range(messages):
+            sent = time.perf_counter()
+            await channel_layer.group_send(
+                task_group_name(task_id),
+                {
+                    'type': 'send_notification',
+                    'scope': 'task',
+                    'task_id': task_id,
+                    'user_id': None,
+                    'message': f'Нагрузочный тест {number}',
+                },
+            )
+            delivery.extend(
+                await asyncio.gather(
+                    *(
+                        receive(communicator, sent)
+                        for communicator in communicators
+                    )
+                )
+            )
+        delivery_elapsed = time.perf_counter() - started
+
+        for communicator in communicators:
+            await communicator.disconnect()
+        return {
+            'clients': clients,
+            'connected': len(communicators),
+            'messages': messages,
+            'connect': summarize_latencies(
+                [latency for _, _, latency in sockets], connect_elapsed
+            ),
+            'delivery': summarize_latencies(delivery, delivery_elapsed),
+        }
+
+    def print_results(self, results):
+        for name, result in results['endpoints'].items():
+            self.stdout.write(
+                f'{name}: p50 {result["p50_ms"]:.1f} мс, '
+                f'p95 {result["p95_ms"]:.1f} мс, '
+                f'p99 {result["p99_ms"]:.1f} мс, '
+                f'{result["rps"]:.0f} rps, '
+                f'запросов к базе {result["queries_cold"]}/'
+                f'{result["queries_warm"]}, ошибок {result["errors"]}'
+            )
+        websocket = results.get('websocket')
+        if websocket:
+            self.stdout.write(
+                f'websocket: подключено {websocket["connected"]} из '
+                f'{websocket["clients"]}, подключение p95 '
+                f'{websocket["connect"]["p95_ms"]:.1f} мс, доставка p95 '
+                f'{websocket["delivery"]["p95_ms"]:.1f} мс, '
+                f'{websocket["delivery"]["rps"]:.0f} сообщений/с'
+            )
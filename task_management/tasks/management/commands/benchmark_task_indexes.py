@@ -0,0 +1,136 @@
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from tasks.benchmark import seed_tasks, seed_users
+from tasks.filters import TaskFilter
+from tasks.models import Task
+from tasks.pagination import TaskCursorPagination
+
+
+def get_scans(plan):
+    """Возвращает список узлов сканирования плана запроса."""
+
+    scans = []
+    node_type = plan['Node Type']
+    if 'Scan' in node_type:
+        index_name = plan.get('Index Name')
+        scans.append(
+            f'{node_type} ({index_name})' if index_name else node_type
+        )
+    for child in plan.get('Plans', ()):
+        scans.extend(get_scans(child))
+    return scans
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет временную базу задачами и сравнивает планы горячих '
+        'запросов списка задач с составными индексами и без них.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=1_000_000)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument(
+            '--noinput',
+            '--no-input',
+            action='store_false',
+            dest='interactive',
+            help='Не спрашивать подтверждение на удаление старой '
+            'тестовой базы.',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError(
+                'Сравнение планов запросов поддерживается только '
+                'для PostgreSQL.'
+            )
+
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=not options['interactive']
+        )
+        try:
+            self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run(self, options):
+        self.stdout.write(
+            f'Создание {options["users"]} пользователей и '
+            f'{options["tasks"]} задач...'
+        )
+        users = seed_users(options['users'])
+        seed_tasks(options['tasks'], users, batch_size=options['batch_size'])
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Task._meta.db_table}')
+
+        queries = self.get_queries(users[0], options['page_size'])
+        with_indexes = self.explain(queries)
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                for index in Task._meta.indexes:
+                    cursor.execute(
+                        f'DROP INDEX {connection.ops.quote_name(index.name)}'
+                    )
+            without_indexes = self.explain(queries)
+            transaction.set_rollback(True)
+
+        for name in queries:
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for label, results in (
+                ('без индексов', without_indexes),
+                ('с индексами', with_indexes),
+            ):
+                scans, duration = results[name]
+                self.stdout.write(
+                    f'  {label}: {", ".join(scans)} — {duration:.2f} мс'
+                )
+
+    def get_queries(self, user, page_size):
+        ordering = TaskCursorPagination.ordering
+        day = timezone.localdate() - timedelta(days=30)
+        middle = (
+            Task.objects.order_by(*ordering)
+            .values_list('created_date', 'id')[Task.objects.count() // 2]
+        )
+        return {
+            'Список задач': Task.objects.order_by(*ordering)[:page_size],
+            'Глубокая страница списка': Task.objects.filter(
+                Q(created_date__lt=middle[0])
+                | Q(created_date=middle[0], id__lt=middle[1]),
+                created_date__lte=middle[0],
+            ).order_by(*ordering)[:page_size],
+            'Задачи пользователя': Task.objects.filter(user=user).order_by(
+                *ordering
+            )[:page_size],
+            'Фильтр по статусу': TaskFilter(
+                {'status': 'done'}, queryset=Task.objects.all()
+            )
+            .qs.order_by(*ordering)[:page_size],
+            'Фильтр по дате (полуинтервал)': TaskFilter(
+                {'created_date': day.isoformat()},
+                queryset=Task.objects.all(),
+            )
+            .qs.order_by(*ordering)[:page_size],
+            'Фильтр по дате (created_date__date)': Task.objects.filter(
+                created_date__date=day
+            ).order_by(*ordering)[:page_size],
+        }
+
+    def explain(self, queries):
+        results = {}
+        for name, queryset in queries.items():
+            (plan,) = json.loads(
+                queryset.explain(format='json', analyze=True)
+            )
+            results[name] = (get_scans(plan['Plan']), plan['Execution Time'])
+        return results
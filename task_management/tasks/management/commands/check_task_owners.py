@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.owners import find_owner_drift, fix_owner_drift
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверяет, что снимок имени и email автора в задачах '
+        'и архивных задачах совпадает с пользователями, и выводит '
+        'расхождения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Обновить снимок автора в задачах с расхождениями.',
+        )
+
+    def handle(self, *args, **options):
+        drift = find_owner_drift()
+        for user_id, count in sorted(
+            drift.items(), key=lambda item: item[0] or 0
+        ):
+            owner = (
+                'без автора' if user_id is None else f'пользователь {user_id}'
+            )
+            self.stdout.write(f'{owner}: задач {count}')
+        if not drift:
+            self.stdout.write('Расхождений нет.')
+        elif options['fix']:
+            fixed = fix_owner_drift(
+                list(drift), settings.TASKS_OWNER_SYNC_BATCH_SIZE
+            )
+            self.stdout.write(f'Снимок автора исправлен в задачах: {fixed}.')
+        else:
+            raise CommandError(
+                f'Найдено авторов с расхождениями: {len(drift)}.'
+            )
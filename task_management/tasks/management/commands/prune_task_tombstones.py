@@ -0,0 +1,34 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tasks.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет отметки об удалённых задачах старше '
+        'TASKS_SYNC_TOMBSTONE_RETENTION_DAYS дней пачками. Клиенты '
+        'с курсором синхронизации старше удалённых отметок получают '
+        '{"resync": true}. Команду можно запускать по расписанию.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.TASKS_SYNC_TOMBSTONE_RETENTION_DAYS,
+            help='Удалить отметки старше указанного числа дней.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.TASKS_SYNC_PRUNE_BATCH_SIZE,
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        total = prune_tombstones(cutoff, options['batch_size'])
+        self.stdout.write(f'Удалено отметок об удалении задач: {total}.')
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счётчики задач по статусам по таблице задач '
+        'и выводит найденные расхождения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить счётчики, не исправляя их. Завершается '
+            'с ошибкой, если найдены расхождения.',
+        )
+
+    def handle(self, *args, **options):
+        mismatches = rebuild_counters(dry_run=options['check'])
+        for (user_id, status), (stored, actual) in sorted(
+            mismatches.items(),
+            key=lambda item: (item[0][0] or 0, item[0][1]),
+        ):
+            owner = 'все' if user_id is None else f'пользователь {user_id}'
+            self.stdout.write(f'{owner}, {status}: {stored} -> {actual}')
+        if options['check'] and mismatches:
+            raise CommandError(f'Найдено расхождений: {len(mismatches)}.')
+        if options['check']:
+            self.stdout.write('Расхождений нет.')
+        else:
+            self.stdout.write(
+                f'Счётчики пересчитаны, исправлено: {len(mismatches)}.'
+            )
@@ -0,0 +1,258 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+DURATION_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+current_metrics = ContextVar('current_metrics', default=None)
+
+
+class RequestMetrics:
+    """
+    Замеры одного запроса.
+    Доступны через current_metrics в потоке запроса и в потоках
+    sync_to_async, которые наследуют контекст.
+    """
+
+    __slots__ = (
+        'queries',
+        'db_time',
+        'cache_time',
+        'serializer_time',
+        'cache_hits',
+        'cache_misses',
+        'channel_sends',
+    )
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.cache_time = 0.0
+        self.serializer_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.channel_sends = 0
+
+
+@contextmanager
+def timer(name):
+    """Добавляет время выполнения блока к замеру name текущего запроса."""
+
+    metrics = current_metrics.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        attr = f'{name}_time'
+        elapsed = time.perf_counter() - started
+        setattr(metrics, attr, getattr(metrics, attr) + elapsed)
+
+
+def increment(name, value=1):
+    """Увеличивает счётчик name текущего запроса."""
+
+    metrics = current_metrics.get()
+    if metrics is not None:
+        setattr(metrics, name, getattr(metrics, name) + value)
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - started
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """
+    Подключает учёт запросов к каждому новому соединению с базой,
+    в том числе к соединениям потоков sync_to_async.
+    """
+
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    Гистограммы замеров запросов в памяти процесса
+    с выводом в текстовом формате Prometheus.
+    """
+
+    histograms = {
+        'http_request_duration_seconds': (
+            'Полное время обработки запроса.',
+            DURATION_BUCKETS,
+            None,
+        ),
+        'http_request_db_duration_seconds': (
+            'Время выполнения SQL-запросов.',
+            DURATION_BUCKETS,
+            'db_time',
+        ),
+        'http_request_cache_duration_seconds': (
+            'Время обращений к кэшу.',
+            DURATION_BUCKETS,
+            'cache_time',
+        ),
+        'http_request_serializer_duration_seconds': (
+            'Время сериализации ответа.',
+            DURATION_BUCKETS,
+            'serializer_time',
+        ),
+        'http_request_db_queries': (
+            'Количество SQL-запросов.',
+            COUNT_BUCKETS,
+            'queries',
+        ),
+        'http_request_channel_sends': (
+            'Количество уведомлений, поставленных в очередь отправки.',
+            COUNT_BUCKETS,
+            'channel_sends',
+        ),
+    }
+    counters = {
+        'http_request_cache_hits_total': (
+            'Попадания в кэш.',
+            'cache_hits',
+        ),
+        'http_request_cache_misses_total': (
+            'Промахи кэша.',
+            'cache_misses',
+        ),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def observe(self, labels, metrics, duration):
+        labels = tuple(sorted(labels.items()))
+        with self._lock:
+            for name, (_, buckets, attr) in self.histograms.items():
+                histogram = self._histograms.get((name, labels))
+                if histogram is None:
+                    histogram = Histogram(buckets)
+                    self._histograms[(name, labels)] = histogram
+                histogram.observe(
+                    duration if attr is None else getattr(metrics, attr)
+                )
+            for name, (_, attr) in self.counters.items():
+                key = (name, labels)
+                self._counters[key] = self._counters.get(key, 0) + getattr(
+                    metrics, attr
+                )
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    @staticmethod
+    def format_labels(labels):
+        return ','.join(
+            '{}="{}"'.format(
+                name,
+                str(value)
+                .replace('\\', '\\\\')
+                .replace('"', '\\"')
+                .replace('\n', '\\n'),
+            )
+            for name, value in labels
+        )
+
+    @classmethod
+    def format_sample(cls, name, labels, value):
+        if not labels:
+            return f'{name} {value}'
+        return f'{name}{{{cls.format_labels(labels)}}} {value}'
+
+    @classmethod
+    def render_histogram(cls, lines, name, labels, histogram):
+        cumulative = 0
+        for bound, count in zip(
+            (*histogram.buckets, '+Inf'), histogram.counts
+        ):
+            cumulative += count
+            lines.append(
+                cls.format_sample(
+                    f'{name}_bucket', (*labels, ('le', bound)), cumulative
+                )
+            )
+        lines.append(cls.format_sample(f'{name}_sum', labels, histogram.sum))
+        lines.append(
+            cls.format_sample(f'{name}_count', labels, histogram.count)
+        )
+
+    def render(self, extra=()):
+        """
+        Возвращает метрики в текстовом формате Prometheus.
+        extra - дополнительные метрики вида
+        (имя, описание, тип, [(метки, значение или Histogram), ...]).
+        """
+
+        lines = []
+        with self._lock:
+            for name, (description, _, _) in self.histograms.items():
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} histogram')
+                for (key, labels), histogram in self._histograms.items():
+                    if key == name:
+                        self.render_histogram(lines, name, labels, histogram)
+            for name, (description, _) in self.counters.items():
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} counter')
+                for (key, labels), value in self._counters.items():
+                    if key == name:
+                        lines.append(self.format_sample(name, labels, value))
+        for name, description, metric_type, samples in extra:
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            for labels, value in samples:
+                if isinstance(value, Histogram):
+                    self.render_histogram(lines, name, labels, value)
+                else:
+                    lines.append(self.format_sample(name, labels, value))
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
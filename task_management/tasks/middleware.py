@@ -0,0 +1,120 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .metrics import RequestMetrics, current_metrics, registry
+
+
+class MetricsMiddleware:
+    """
+    Собирает по каждому запросу количество SQL-запросов, время базы,
+    кэша, сериализации и полное время обработки.
+    Замеры копятся в гистограммах по имени представления и методу.
+    Потоковые ответы замеряются до закрытия ответа, вместе
+    с формированием тела.
+    При METRICS_SERVER_TIMING добавляет заголовок Server-Timing,
+    кроме потоковых ответов: их заголовки уходят до конца замера.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics, started)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics, started)
+
+    def finish(self, request, response, metrics, started):
+        if response.streaming:
+            # Тело потокового ответа формируется после выхода
+            # из middleware, замер завершается при закрытии ответа.
+            wrap = self.wrap_async if response.is_async else self.wrap_sync
+            response.streaming_content = wrap(
+                response.streaming_content, request, metrics, started
+            )
+            return response
+        duration = self.observe(request, metrics, started)
+        if settings.METRICS_SERVER_TIMING:
+            response['Server-Timing'] = ', '.join(
+                (
+                    f'db;desc="{metrics.queries} queries";'
+                    f'dur={metrics.db_time * 1000:.2f}',
+                    f'cache;dur={metrics.cache_time * 1000:.2f}',
+                    f'serializer;dur={metrics.serializer_time * 1000:.2f}',
+                    f'total;dur={duration * 1000:.2f}',
+                )
+            )
+        return response
+
+    @staticmethod
+    def observe(request, metrics, started):
+        duration = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        registry.observe(
+            {
+                'view': match.view_name if match else 'unresolved',
+                'method': request.method,
+            },
+            metrics,
+            duration,
+        )
+        return duration
+
+    def wrap_sync(self, content, request, metrics, started):
+        """
+        Отдаёт части тела, учитывая запросы при их формировании
+        в замерах запроса. Замер завершается при закрытии ответа.
+        """
+
+        try:
+            while True:
+                token = current_metrics.set(metrics)
+                try:
+                    chunk = next(content)
+                except StopIteration:
+                    return
+                finally:
+                    current_metrics.reset(token)
+                yield chunk
+        finally:
+            self.observe(request, metrics, started)
+
+    async def wrap_async(self, content, request, metrics, started):
+        """Асинхронный аналог wrap_sync."""
+
+        try:
+            while True:
+                token = current_metrics.set(metrics)
+                try:
+                    chunk = await anext(content)
+                except StopAsyncIteration:
+                    return
+                finally:
+                    current_metrics.reset(token)
+                yield chunk
+        finally:
+            self.observe(request, metrics, started)
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.4 on 2026-10-18 19:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Task',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=30, verbose_name='Название')),
+                ('description', models.CharField(max_length=300, verbose_name='Описание')),
+                ('status', models.CharField(choices=[('new', 'Новая'), ('in_progress', 'В процессе'), ('done', 'Выполнена')], default='new', max_length=20, verbose_name='Статус')),
+                ('created_date', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('last_updated_date', models.DateTimeField(default=None, null=True, verbose_name='Дата последнего обновления')),
+            ],
+            options={
+                'verbose_name': 'Задача',
+                'verbose_name_plural': 'Задачи',
+                'ordering': ('-created_date',),
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.4 on 2026-10-18 19:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+from tasks.operations import AddIndexConcurrentlyIfSupported
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('tasks', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='task',
+            options={'ordering': ('-created_date', '-id'), 'verbose_name': 'Задача', 'verbose_name_plural': 'Задачи'},
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name='task',
+            index=models.Index(fields=['-created_date', '-id'], name='task_created_idx'),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name='task',
+            index=models.Index(fields=['user', '-created_date', '-id'], name='task_user_created_idx'),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name='task',
+            index=models.Index(fields=['status', '-created_date', '-id'], name='task_status_created_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.0.4 on 2026-10-18 20:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_counters(apps, schema_editor):
+    Task = apps.get_model('tasks', 'Task')
+    TaskStatusCounter = apps.get_model('tasks', 'TaskStatusCounter')
+    counters = {}
+    for row in Task.objects.order_by().values('user_id', 'status').annotate(
+        count=Count('id')
+    ):
+        for user_id in {None, row['user_id']}:
+            key = (user_id, row['status'])
+            counters[key] = counters.get(key, 0) + row['count']
+    TaskStatusCounter.objects.bulk_create(
+        TaskStatusCounter(user_id=user_id, status=status, count=count)
+        for (user_id, status), count in counters.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0003_task_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskStatusCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('new', 'Новая'), ('in_progress', 'В процессе'), ('done', 'Выполнена')], max_length=20, verbose_name='Статус')),
+                ('count', models.BigIntegerField(default=0, verbose_name='Количество')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='task_counters', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Счётчик задач',
+                'verbose_name_plural': 'Счётчики задач',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='taskstatuscounter',
+            constraint=models.UniqueConstraint(fields=('user', 'status'), name='task_counter_user_status_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='taskstatuscounter',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', True)), fields=('status',), name='task_counter_global_status_uniq'),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
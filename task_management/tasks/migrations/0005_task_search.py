@@ -0,0 +1,34 @@
+# Generated by Django 5.0.4 on 2026-10-18 20:16
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+from tasks.operations import (
+    AddPostgresIndexConcurrently,
+    CreateExtensionIfAvailable,
+)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('tasks', '0004_task_status_counter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        CreateExtensionIfAvailable('pg_trgm'),
+        AddPostgresIndexConcurrently(
+            model_name='task',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('title', config='russian', weight='A'), '||', django.contrib.postgres.search.SearchVector('description', config='russian', weight='B'), django.contrib.postgres.search.SearchConfig('russian')), name='task_search_idx'),
+        ),
+        AddPostgresIndexConcurrently(
+            model_name='task',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='task_title_trgm_idx', opclasses=('gin_trgm_ops',)),
+            extension='pg_trgm',
+        ),
+    ]
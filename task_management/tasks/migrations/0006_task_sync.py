@@ -0,0 +1,68 @@
+# Generated by Django 5.0.4 on 2026-10-18 20:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from tasks.operations import AddIndexConcurrentlyIfSupported
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('tasks', '0005_task_search'),
+        ('users', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskSyncState',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='task_sync_state', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('version', models.BigIntegerField(default=0, verbose_name='Версия')),
+            ],
+            options={
+                'verbose_name': 'Версия задач пользователя',
+                'verbose_name_plural': 'Версии задач пользователей',
+            },
+        ),
+        migrations.CreateModel(
+            name='TaskTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.BigIntegerField(verbose_name='ID задачи')),
+                ('version', models.BigIntegerField(verbose_name='Версия')),
+                ('deleted_date', models.DateTimeField(auto_now_add=True, verbose_name='Дата удаления')),
+            ],
+            options={
+                'verbose_name': 'Удалённая задача',
+                'verbose_name_plural': 'Удалённые задачи',
+            },
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='created_version',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Версия создания'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='sync_version',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Версия изменения'),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name='task',
+            index=models.Index(fields=['user', 'sync_version', 'id'], name='task_user_sync_idx'),
+        ),
+        migrations.AddField(
+            model_name='tasktombstone',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_tombstones', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AddIndex(
+            model_name='tasktombstone',
+            index=models.Index(fields=['user', 'version', 'task_id'], name='task_tombstone_user_sync_idx'),
+        ),
+    ]
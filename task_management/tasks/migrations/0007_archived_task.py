@@ -0,0 +1,37 @@
+# Generated by Django 5.0.4 on 2026-10-18 20:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0006_task_sync'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTask',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=30, verbose_name='Название')),
+                ('description', models.CharField(max_length=300, verbose_name='Описание')),
+                ('status', models.CharField(choices=[('new', 'Новая'), ('in_progress', 'В процессе'), ('done', 'Выполнена')], max_length=20, verbose_name='Статус')),
+                ('created_date', models.DateTimeField(verbose_name='Дата создания')),
+                ('last_updated_date', models.DateTimeField(null=True, verbose_name='Дата последнего обновления')),
+                ('created_version', models.BigIntegerField(default=0, editable=False, verbose_name='Версия создания')),
+                ('sync_version', models.BigIntegerField(default=0, editable=False, verbose_name='Версия изменения')),
+                ('archived_date', models.DateTimeField(auto_now_add=True, verbose_name='Дата архивирования')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_tasks', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Архивная задача',
+                'verbose_name_plural': 'Архивные задачи',
+                'ordering': ('-created_date', '-id'),
+                'indexes': [models.Index(fields=['-created_date', '-id'], name='archived_task_created_idx'), models.Index(fields=['user', '-created_date', '-id'], name='archived_task_user_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.0.4 on 2026-10-18 20:50
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+
+BACKFILL_BATCH_SIZE = 10000
+
+
+def backfill_owners(apps, schema_editor):
+    """
+    Заполняет снимок автора в существующих задачах пачками по id,
+    каждая пачка фиксируется отдельно и не блокирует таблицу надолго.
+    """
+
+    CustomUser = apps.get_model(settings.AUTH_USER_MODEL)
+    users = CustomUser.objects.filter(pk=OuterRef('user_id'))
+    for model_name in ('Task', 'ArchivedTask'):
+        model = apps.get_model('tasks', model_name)
+        last_id = model.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+        for start in range(0, last_id + 1, BACKFILL_BATCH_SIZE):
+            model.objects.filter(
+                id__gte=start,
+                id__lt=start + BACKFILL_BATCH_SIZE,
+                user__isnull=False,
+            ).update(
+                owner_first_name=Subquery(users.values('first_name')[:1]),
+                owner_email=Subquery(users.values('email')[:1]),
+            )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('tasks', '0007_archived_task'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedtask',
+            name='owner_email',
+            field=models.CharField(default='', editable=False, max_length=254, verbose_name='Email автора'),
+        ),
+        migrations.AddField(
+            model_name='archivedtask',
+            name='owner_first_name',
+            field=models.CharField(default='', editable=False, max_length=150, verbose_name='Имя автора'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='owner_email',
+            field=models.CharField(default='', editable=False, max_length=254, verbose_name='Email автора'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='owner_first_name',
+            field=models.CharField(default='', editable=False, max_length=150, verbose_name='Имя автора'),
+        ),
+        migrations.RunPython(backfill_owners, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.4 on 2026-10-18 21:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0008_owner_snapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='taskstatuscounter',
+            name='task_counter_global_status_uniq',
+        ),
+        migrations.AddField(
+            model_name='taskstatuscounter',
+            name='shard',
+            field=models.PositiveSmallIntegerField(
+                default=0, verbose_name='Часть счётчика'
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name='taskstatuscounter',
+            constraint=models.UniqueConstraint(
+                condition=models.Q(('user__isnull', True)),
+                fields=('status', 'shard'),
+                name='task_counter_global_status_shard_uniq',
+            ),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.4 on 2026-10-18 21:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0009_task_counter_shard'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tasksyncstate',
+            name='pruned_version',
+            field=models.BigIntegerField(
+                default=0, verbose_name='Версия удалённых отметок'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='tasktombstone',
+            index=models.Index(
+                fields=['deleted_date'], name='task_tombstone_deleted_idx'
+            ),
+        ),
+    ]
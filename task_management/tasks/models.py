@@ -31,11 +31,218 @@ class Task(models.Model):
         null=True,
         related_name='tasks',
     )
+    # Снимок имени и email автора: списки задач читают его без
+    # соединения с таблицей пользователей. После изменения
+    # пользователя снимок обновляется фоново, см. tasks.owners.
+    owner_first_name = models.CharField(
+        verbose_name='Имя автора', max_length=150, default='', editable=False
+    )
+    owner_email = models.CharField(
+        verbose_name='Email автора', max_length=254, default='', editable=False
+    )
+    created_version = models.BigIntegerField(
+        verbose_name='Версия создания', default=0, editable=False
+    )
+    sync_version = models.BigIntegerField(
+        verbose_name='Версия изменения', default=0, editable=False
+    )
 
     class Meta:
         verbose_name = 'Задача'
         verbose_name_plural = 'Задачи'
-        ordering = ('-created_date',)
+        ordering = ('-created_date', '-id')
+        # GIN-индексы поиска есть только в PostgreSQL и создаются
+        # миграцией 0005_task_search вне состояния моделей.
+        indexes = (
+            models.Index(
+                fields=('-created_date', '-id'), name='task_created_idx'
+            ),
+            models.Index(
+                fields=('user', '-created_date', '-id'),
+                name='task_user_created_idx',
+            ),
+            models.Index(
+                fields=('status', '-created_date', '-id'),
+                name='task_status_created_idx',
+            ),
+            models.Index(
+                fields=('user', 'sync_version', 'id'),
+                name='task_user_sync_idx',
+            ),
+        )
 
     def __str__(self):
         return f'Задача {self.title}'
+
+    def copy_owner(self):
+        """Копирует имя и email автора в снимок задачи."""
+
+        user = self.user
+        self.owner_first_name = user.first_name if user else ''
+        self.owner_email = user.email if user else ''
+
+    def save(self, *args, **kwargs):
+        self.copy_owner()
+        super().save(*args, **kwargs)
+
+
+class TaskStatusCounter(models.Model):
+    """
+    Материализованный счётчик задач по статусу.
+    Строки с пользователем считают задачи пользователя,
+    строки без пользователя - все задачи. Общий счётчик статуса
+    разбит на несколько строк (shard), его значение - их сумма.
+    """
+
+    user = models.ForeignKey(
+        CustomUser,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        null=True,
+        related_name='task_counters',
+    )
+    status = models.CharField(
+        verbose_name='Статус', max_length=20, choices=Task.STATUS_CHOICES
+    )
+    shard = models.PositiveSmallIntegerField(
+        verbose_name='Часть счётчика', default=0
+    )
+    count = models.BigIntegerField(verbose_name='Количество', default=0)
+
+    class Meta:
+        verbose_name = 'Счётчик задач'
+        verbose_name_plural = 'Счётчики задач'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'status'), name='task_counter_user_status_uniq'
+            ),
+            models.UniqueConstraint(
+                fields=('status', 'shard'),
+                condition=models.Q(user__isnull=True),
+                name='task_counter_global_status_shard_uniq',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.user_id or "Все"}: {self.status} = {self.count}'
+
+
+class TaskSyncState(models.Model):
+    """
+    Последняя выданная версия изменений задач пользователя.
+    Строка блокируется на время транзакции изменения задач,
+    поэтому версии пользователя фиксируются в порядке возрастания.
+    pruned_version - последняя версия удалённых по сроку хранения
+    отметок об удалении задач.
+    """
+
+    user = models.OneToOneField(
+        CustomUser,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='task_sync_state',
+    )
+    version = models.BigIntegerField(verbose_name='Версия', default=0)
+    pruned_version = models.BigIntegerField(
+        verbose_name='Версия удалённых отметок', default=0
+    )
+
+    class Meta:
+        verbose_name = 'Версия задач пользователя'
+        verbose_name_plural = 'Версии задач пользователей'
+
+    def __str__(self):
+        return f'{self.user_id}: {self.version}'
+
+
+class TaskTombstone(models.Model):
+    """Отметка об удалении задачи для синхронизации клиентов."""
+
+    user = models.ForeignKey(
+        CustomUser,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        related_name='task_tombstones',
+    )
+    task_id = models.BigIntegerField(verbose_name='ID задачи')
+    version = models.BigIntegerField(verbose_name='Версия')
+    deleted_date = models.DateTimeField(
+        verbose_name='Дата удаления', auto_now_add=True
+    )
+
+    class Meta:
+        verbose_name = 'Удалённая задача'
+        verbose_name_plural = 'Удалённые задачи'
+        indexes = (
+            models.Index(
+                fields=('user', 'version', 'task_id'),
+                name='task_tombstone_user_sync_idx',
+            ),
+            models.Index(
+                fields=('deleted_date',), name='task_tombstone_deleted_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'Задача {self.task_id} удалена'
+
+
+class ArchivedTask(models.Model):
+    """
+    Выполненная задача, перенесённая в архив командой archive_tasks.
+    Хранит те же поля и id, что и задача, и читается только
+    по запросу с include_archived, поэтому старые задачи не занимают
+    место в таблице и индексах активных задач.
+    """
+
+    id = models.BigIntegerField(primary_key=True, verbose_name='ID')
+    title = models.CharField(max_length=30, verbose_name='Название')
+    description = models.CharField(max_length=300, verbose_name='Описание')
+    status = models.CharField(
+        verbose_name='Статус', max_length=20, choices=Task.STATUS_CHOICES
+    )
+    created_date = models.DateTimeField(verbose_name='Дата создания')
+    last_updated_date = models.DateTimeField(
+        null=True, verbose_name='Дата последнего обновления'
+    )
+    user = models.ForeignKey(
+        CustomUser,
+        verbose_name='Пользователь',
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='archived_tasks',
+    )
+    owner_first_name = models.CharField(
+        verbose_name='Имя автора', max_length=150, default='', editable=False
+    )
+    owner_email = models.CharField(
+        verbose_name='Email автора', max_length=254, default='', editable=False
+    )
+    created_version = models.BigIntegerField(
+        verbose_name='Версия создания', default=0, editable=False
+    )
+    sync_version = models.BigIntegerField(
+        verbose_name='Версия изменения', default=0, editable=False
+    )
+    archived_date = models.DateTimeField(
+        verbose_name='Дата архивирования', auto_now_add=True
+    )
+
+    class Meta:
+        verbose_name = 'Архивная задача'
+        verbose_name_plural = 'Архивные задачи'
+        ordering = ('-created_date', '-id')
+        indexes = (
+            models.Index(
+                fields=('-created_date', '-id'),
+                name='archived_task_created_idx',
+            ),
+            models.Index(
+                fields=('user', '-created_date', '-id'),
+                name='archived_task_user_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'Архивная задача {self.title}'
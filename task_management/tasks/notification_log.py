@@ -0,0 +1,115 @@
+import re
+
+import redis
+from django.conf import settings
+
+LOG_KEY = 'notifications:log:user:{user_id}'
+SEQUENCE_ID_RE = re.compile(r'^\d+-\d+$')
+
+
+def parse_sequence_id(sequence_id):
+    """Ключ сравнения id уведомлений вида '<мс>-<номер>'."""
+
+    milliseconds, number = sequence_id.split('-')
+    return int(milliseconds), int(number)
+
+
+def get_user_notifications(event):
+    """
+    Уведомления о задачах пользователя из события группы
+    пользователя. События групп задач в журнал не попадают.
+    """
+
+    event_type = event.get('type')
+    if event_type == 'send_notifications':
+        return event['notifications']
+    if event_type == 'send_notification' and event.get('scope') == 'user':
+        return [event]
+    return []
+
+
+class NotificationLog:
+    """
+    Журнал уведомлений о задачах пользователя в потоке Redis,
+    ограниченном NOTIFICATIONS_LOG_SIZE записями и удаляемом
+    через NOTIFICATIONS_LOG_TTL секунд без новых уведомлений.
+    id записи потока возрастает и служит id уведомления,
+    по которому переподключившийся клиент получает пропущенное.
+    """
+
+    def __init__(self, url, size, ttl):
+        self.url = url
+        self.size = size
+        self.ttl = ttl
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = redis.Redis.from_url(self.url)
+        return self._client
+
+    def record(self, batch):
+        """
+        Записывает в журналы уведомления пользователей из пачки
+        (группа, событие) и добавляет им id.
+        """
+
+        notifications = [
+            (event['user_id'], notification)
+            for _, event in batch
+            if event.get('user_id') is not None
+            for notification in get_user_notifications(event)
+        ]
+        if not notifications:
+            return
+        pipeline = self.client.pipeline(transaction=False)
+        for user_id, notification in notifications:
+            pipeline.xadd(
+                LOG_KEY.format(user_id=user_id),
+                {
+                    'task_id': notification['task_id'],
+                    'message': notification['message'],
+                },
+                maxlen=self.size,
+                approximate=True,
+            )
+        for user_id in {user_id for user_id, _ in notifications}:
+            pipeline.expire(LOG_KEY.format(user_id=user_id), self.ttl)
+        sequence_ids = pipeline.execute()
+        for (_, notification), sequence_id in zip(
+            notifications, sequence_ids
+        ):
+            notification['id'] = sequence_id.decode()
+
+    def read_after(self, user_id, last_seen_id):
+        """
+        Возвращает уведомления пользователя после last_seen_id
+        или None, если часть из них уже удалена из журнала
+        и клиенту нужно заново загрузить свои задачи.
+        """
+
+        if not SEQUENCE_ID_RE.match(last_seen_id):
+            return None
+        entries = self.client.xrange(
+            LOG_KEY.format(user_id=user_id), min=last_seen_id
+        )
+        # Запись last_seen_id читается вместе с последующими: если её
+        # нет в журнале, записи после неё могли быть удалены.
+        if not entries or entries[0][0].decode() != last_seen_id:
+            return None
+        return [
+            {
+                'id': sequence_id.decode(),
+                'task_id': int(fields[b'task_id']),
+                'message': fields[b'message'].decode(),
+            }
+            for sequence_id, fields in entries[1:]
+        ]
+
+
+notification_log = NotificationLog(
+    url=settings.REDIS_HOST,
+    size=settings.NOTIFICATIONS_LOG_SIZE,
+    ttl=settings.NOTIFICATIONS_LOG_TTL,
+)
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from collections import deque
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from .metrics import increment
+from .notification_log import notification_log
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationDispatcher:
+    """
+    Фоновый отправщик уведомлений в слой каналов.
+    Уведомления копятся в ограниченной очереди и отправляются пачками
+    из отдельного потока со своим событийным циклом, поэтому запрос
+    не ждёт обращения к Redis.
+    Неудачная отправка повторяется ограниченное число раз.
+    Перед отправкой уведомления пользователей один раз записываются
+    в их журналы notification_log и получают id, повторная отправка
+    идёт с теми же id.
+    """
+
+    def __init__(self, queue_size, batch_size, max_retries, retry_delay):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self._thread = None
+        self._lock = threading.Lock()
+        self._loop = None
+
+    def enqueue(self, group, event):
+        """
+        Ставит уведомление в очередь на отправку.
+        При переполненной очереди уведомление отбрасывается.
+        """
+
+        self._ensure_started()
+        increment('channel_sends')
+        try:
+            self.queue.put_nowait((group, event))
+        except queue.Full:
+            logger.warning(
+                'Очередь уведомлений переполнена, уведомление '
+                'для группы %s отброшено.',
+                group,
+            )
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name='notification-dispatcher',
+                    daemon=True,
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.send_batch(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def send_batch(self, batch):
+        """
+        Отправляет пачку уведомлений, повторяя отправку неотправленных.
+        Возвращает True, если вся пачка отправлена.
+        """
+
+        try:
+            notification_log.record(batch)
+        except Exception:
+            # Уведомления всё равно отправляются, но без id
+            # и не повторятся клиенту при переподключении.
+            logger.warning(
+                'Не удалось записать уведомления в журнал.', exc_info=True
+            )
+        pending = deque(batch)
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                self._loop.run_until_complete(self._group_send(pending))
+                return True
+            except Exception:
+                logger.warning(
+                    'Ошибка отправки уведомлений, попытка %d из %d.',
+                    attempt,
+                    self.max_retries,
+                    exc_info=True,
+                )
+                if attempt < self.max_retries:
+                    time.sleep(self.retry_delay * attempt)
+        logger.error('Не удалось отправить %d уведомлений.', len(pending))
+        return False
+
+    @staticmethod
+    async def _group_send(pending):
+        channel_layer = get_channel_layer()
+        while pending:
+            group, event = pending[0]
+            await channel_layer.group_send(group, event)
+            pending.popleft()
+
+
+dispatcher = NotificationDispatcher(
+    queue_size=settings.NOTIFICATIONS_QUEUE_SIZE,
+    batch_size=settings.NOTIFICATIONS_BATCH_SIZE,
+    max_retries=settings.NOTIFICATIONS_MAX_RETRIES,
+    retry_delay=settings.NOTIFICATIONS_RETRY_DELAY,
+)
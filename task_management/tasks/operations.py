@@ -0,0 +1,114 @@
+from django.contrib.postgres.operations import (
+    AddIndexConcurrently,
+    CreateExtension,
+)
+from django.db import migrations
+
+
+class AddIndexConcurrentlyIfSupported(AddIndexConcurrently):
+    """
+    Создаёт индекс конкурентно в PostgreSQL и обычным AddIndex
+    в остальных СУБД (например, в SQLite для локальных замеров).
+    """
+
+    def database_forwards(
+        self, app_label, schema_editor, from_state, to_state
+    ):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        else:
+            migrations.AddIndex.database_forwards(
+                self, app_label, schema_editor, from_state, to_state
+            )
+
+    def database_backwards(
+        self, app_label, schema_editor, from_state, to_state
+    ):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        else:
+            migrations.AddIndex.database_backwards(
+                self, app_label, schema_editor, from_state, to_state
+            )
+
+
+def is_extension_installed(schema_editor, name):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_extension WHERE extname = %s', [name])
+        return cursor.fetchone() is not None
+
+
+class CreateExtensionIfAvailable(CreateExtension):
+    """
+    Устанавливает расширение PostgreSQL, если оно доступно на сервере.
+    Зависящие от расширения индексы создаются только после установки.
+    """
+
+    def database_forwards(
+        self, app_label, schema_editor, from_state, to_state
+    ):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT 1 FROM pg_available_extensions WHERE name = %s',
+                [self.name],
+            )
+            if cursor.fetchone() is None:
+                return
+        super().database_forwards(
+            app_label, schema_editor, from_state, to_state
+        )
+
+    def database_backwards(
+        self, app_label, schema_editor, from_state, to_state
+    ):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+
+class AddPostgresIndexConcurrently(AddIndexConcurrently):
+    """
+    Создаёт конкурентно индекс, который есть только в PostgreSQL
+    (например, GIN). В остальных СУБД, а также без расширения
+    extension, индекс не создаётся.
+    Индекс не добавляется в состояние моделей: иначе SQLite пытался бы
+    создать его при каждом пересоздании таблицы.
+    """
+
+    def __init__(self, model_name, index, extension=None):
+        super().__init__(model_name, index)
+        self.extension = extension
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def is_supported(self, schema_editor):
+        return schema_editor.connection.vendor == 'postgresql' and (
+            self.extension is None
+            or is_extension_installed(schema_editor, self.extension)
+        )
+
+    def database_forwards(
+        self, app_label, schema_editor, from_state, to_state
+    ):
+        if self.is_supported(schema_editor):
+            super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+    def database_backwards(
+        self, app_label, schema_editor, from_state, to_state
+    ):
+        # Удаление идёт через DROP INDEX IF EXISTS, поэтому
+        # не зависит от того, был ли индекс создан.
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
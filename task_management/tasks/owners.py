@@ -0,0 +1,192 @@
+import logging
+import queue
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, F, Q
+
+from users.models import CustomUser
+from .cache import invalidate_task_caches
+from .models import ArchivedTask, Task
+
+logger = logging.getLogger(__name__)
+
+OWNER_MODELS = (Task, ArchivedTask)
+OWNER_FIELDS = {'first_name', 'email'}
+EMPTY_OWNER = {'owner_first_name': '', 'owner_email': ''}
+
+
+def get_owner_columns():
+    """
+    Выражения имени и email автора для values(): из снимка в задаче
+    или, при выключенном TASKS_OWNER_SNAPSHOT, соединением
+    с таблицей пользователей.
+    """
+
+    if settings.TASKS_OWNER_SNAPSHOT:
+        return {
+            'user_first_name': F('owner_first_name'),
+            'user_email': F('owner_email'),
+        }
+    return {
+        'user_first_name': F('user__first_name'),
+        'user_email': F('user__email'),
+    }
+
+
+def _update_stale(queryset, snapshot, batch_size):
+    """
+    Записывает snapshot в строки queryset, где он отличается,
+    пачками по batch_size строк. Возвращает количество строк.
+    """
+
+    stale = queryset.exclude(**snapshot)
+    updated = 0
+    while ids := list(stale.values_list('pk', flat=True)[:batch_size]):
+        updated += queryset.model.objects.filter(pk__in=ids).update(
+            **snapshot
+        )
+    return updated
+
+
+def propagate_owner(user_id, batch_size):
+    """
+    Обновляет снимок автора в задачах и архивных задачах пользователя
+    по его текущим имени и email. Каждая пачка - отдельный UPDATE
+    по id, поэтому строки не блокируются надолго.
+    Возвращает количество обновлённых задач.
+    """
+
+    user = (
+        CustomUser.objects.filter(pk=user_id)
+        .values('first_name', 'email')
+        .first()
+    )
+    if user is None:
+        return 0
+    snapshot = {
+        'owner_first_name': user['first_name'],
+        'owner_email': user['email'],
+    }
+    updated = sum(
+        _update_stale(
+            model.objects.filter(user_id=user_id), snapshot, batch_size
+        )
+        for model in OWNER_MODELS
+    )
+    if updated:
+        invalidate_task_caches(user_id)
+    return updated
+
+
+def clear_owner(user_id):
+    """Очищает снимок автора в задачах пользователя перед его удалением."""
+
+    for model in OWNER_MODELS:
+        model.objects.filter(user_id=user_id).update(**EMPTY_OWNER)
+
+
+def find_owner_drift():
+    """
+    Ищет задачи и архивные задачи, снимок автора в которых
+    не совпадает с пользователем, а у задач без автора - не пуст.
+    Возвращает {id пользователя или None: количество задач}.
+    """
+
+    drift = Counter()
+    for model in OWNER_MODELS:
+        stale = model.objects.filter(
+            Q(user__isnull=True) & ~Q(**EMPTY_OWNER)
+            | Q(user__isnull=False)
+            & ~Q(
+                owner_first_name=F('user__first_name'),
+                owner_email=F('user__email'),
+            )
+        )
+        for row in (
+            stale.order_by().values('user_id').annotate(count=Count('id'))
+        ):
+            drift[row['user_id']] += row['count']
+    return drift
+
+
+def fix_owner_drift(user_ids, batch_size):
+    """
+    Обновляет снимок автора в задачах пользователей user_ids,
+    None - очищает снимок в задачах без автора.
+    Возвращает количество исправленных задач.
+    """
+
+    fixed = 0
+    for user_id in user_ids:
+        if user_id is not None:
+            fixed += propagate_owner(user_id, batch_size)
+            continue
+        for model in OWNER_MODELS:
+            fixed += _update_stale(
+                model.objects.filter(user__isnull=True),
+                EMPTY_OWNER,
+                batch_size,
+            )
+    return fixed
+
+
+class OwnerPropagator:
+    """
+    Фоновое обновление снимка автора в задачах после изменения
+    пользователя. id пользователей копятся в очереди без повторов
+    и обрабатываются из отдельного потока, поэтому сохранение профиля
+    не ждёт обновления всех его задач.
+    Если обновление не удалось, расхождение находит и исправляет
+    команда check_task_owners.
+    При выключенном TASKS_OWNER_SYNC_BACKGROUND (в тестах) снимок
+    обновляется сразу в вызывающем потоке.
+    """
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.queue = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def enqueue(self, user_id):
+        if not settings.TASKS_OWNER_SYNC_BACKGROUND:
+            propagate_owner(user_id, self.batch_size)
+            return
+        with self._lock:
+            if user_id in self._pending:
+                return
+            self._pending.add(user_id)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='owner-propagator', daemon=True
+                )
+                self._thread.start()
+        self.queue.put(user_id)
+
+    def _run(self):
+        while True:
+            user_id = self.queue.get()
+            # Изменения пользователя во время обновления снова
+            # ставят его в очередь.
+            with self._lock:
+                self._pending.discard(user_id)
+            try:
+                propagate_owner(user_id, self.batch_size)
+            except Exception:
+                logger.exception(
+                    'Не удалось обновить снимок автора в задачах '
+                    'пользователя %s.',
+                    user_id,
+                )
+            finally:
+                close_old_connections()
+                self.queue.task_done()
+
+
+owner_propagator = OwnerPropagator(
+    batch_size=settings.TASKS_OWNER_SYNC_BATCH_SIZE
+)
@@ -0,0 +1,281 @@
+import binascii
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class TaskCursorPagination(BasePagination):
+    """
+    Keyset-пагинация задач по паре (created_date, id), а результатов
+    поиска - по тройке (search_rank, created_date, id).
+    Страница выбирается условием по позиции последней записи,
+    поэтому время выборки не зависит от глубины страницы.
+    Курсор непрозрачный и не зависит от вставки новых задач.
+    С envelope=users авторы задач передаются один раз отдельным
+    списком users, а в задачах остаются только их id.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    envelope_query_param = 'envelope'
+    users_envelope = 'users'
+    ordering = ('-created_date', '-id')
+    rank_field = 'search_rank'
+    cursor_keys = {
+        'search_rank': ('s', float),
+        'created_date': ('d', datetime.fromisoformat),
+        'id': ('i', int),
+    }
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def __init__(self):
+        self.page_size = settings.TASKS_PAGE_SIZE
+        self.max_page_size = settings.TASKS_MAX_PAGE_SIZE
+        self.fields = tuple(field.lstrip('-') for field in self.ordering)
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def use_users_envelope(self, request):
+        return (
+            request.query_params.get(self.envelope_query_param)
+            == self.users_envelope
+        )
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            data = json.loads(urlsafe_b64decode(encoded.encode()))
+            position = tuple(
+                parse(data[key])
+                for key, parse in (
+                    self.cursor_keys[field] for field in self.fields
+                )
+            )
+            return position, bool(data.get('r'))
+        except (
+            binascii.Error,
+            json.JSONDecodeError,
+            KeyError,
+            TypeError,
+            ValueError,
+        ):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position, reverse=False):
+        data = {}
+        for field, value in zip(self.fields, position):
+            key, _ = self.cursor_keys[field]
+            data[key] = (
+                value.isoformat() if isinstance(value, datetime) else value
+            )
+        if reverse:
+            data['r'] = 1
+        encoded = urlsafe_b64encode(
+            json.dumps(data, separators=(',', ':')).encode()
+        ).decode()
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded
+        )
+
+    def get_position(self, item):
+        if isinstance(item, dict):
+            return tuple(item[field] for field in self.fields)
+        return tuple(getattr(item, field) for field in self.fields)
+
+    def get_keyset_filter(self, position, reverse):
+        """
+        Условие "после позиции" для убывающего порядка полей
+        (или "до позиции" при reverse). Отдельное условие по первому
+        полю позволяет использовать индекс по нему.
+        """
+
+        lookup = 'gt' if reverse else 'lt'
+        condition = Q()
+        for index, field in enumerate(self.fields):
+            condition |= Q(
+                *(
+                    Q(**{name: value})
+                    for name, value in zip(
+                        self.fields[:index], position[:index]
+                    )
+                ),
+                **{f'{field}__{lookup}': position[index]},
+            )
+        return condition & Q(**{f'{self.fields[0]}__{lookup}e': position[0]})
+
+    def get_page_queryset(self, queryset, request, archived=None):
+        """
+        Возвращает запрос страницы с одной лишней записью
+        для определения наличия следующей страницы.
+        Результаты поиска упорядочиваются сначала по релевантности.
+        Запрос архивных задач archived с теми же столбцами объединяется
+        с запросом задач после условия по курсору. Если СУБД позволяет,
+        каждая часть объединения упорядочивается и ограничивается
+        страницей, чтобы таблицы читались по индексам.
+        """
+
+        ordering = self.ordering
+        if self.rank_field in queryset.query.annotations:
+            ordering = (f'-{self.rank_field}', *ordering)
+        self.fields = tuple(field.lstrip('-') for field in ordering)
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+        self.reverse = self.cursor is not None and self.cursor[1]
+        if self.reverse:
+            ordering = tuple(field.lstrip('-') for field in ordering)
+
+        parts = [queryset] if archived is None else [queryset, archived]
+        if self.cursor is not None:
+            condition = self.get_keyset_filter(self.cursor[0], self.reverse)
+            parts = [part.filter(condition) for part in parts]
+        if len(parts) == 1:
+            return parts[0].order_by(*ordering)[: self.page_size + 1]
+        features = connections[queryset.db].features
+        if features.supports_slicing_ordering_in_compound:
+            parts = [
+                part.order_by(*ordering)[: self.page_size + 1]
+                for part in parts
+            ]
+        else:
+            parts = [part.order_by() for part in parts]
+        queryset = parts[0].union(*parts[1:], all=True)
+        return queryset.order_by(*ordering)[: self.page_size + 1]
+
+    def get_page(self, page):
+        cursor, reverse = self.cursor, self.reverse
+        has_more = len(page) > self.page_size
+        page = page[: self.page_size]
+        if reverse:
+            page.reverse()
+
+        if page:
+            first = self.get_position(page[0])
+            last = self.get_position(page[-1])
+        else:
+            first = cursor[0] if cursor is not None else None
+            last = None
+        if reverse:
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+        self.next_position = last
+        self.previous_position = first
+        return page
+
+    def paginate_queryset(self, queryset, request, view=None, archived=None):
+        return self.get_page(
+            list(self.get_page_queryset(queryset, request, archived))
+        )
+
+    async def apaginate_queryset(
+        self, queryset, request, view=None, archived=None
+    ):
+        """
+        Асинхронный аналог paginate_queryset.
+        Страница ограничена по размеру, поэтому выбирается одним запросом.
+        """
+
+        queryset = self.get_page_queryset(queryset, request, archived)
+        return self.get_page([item async for item in queryset])
+
+    def get_next_link(self):
+        if not self.has_next or self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position)
+
+    def get_previous_link(self):
+        if not self.has_previous or self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    def get_paginated_response(self, data, users=None):
+        response = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+        }
+        if users is not None:
+            response['users'] = users
+        response['results'] = data
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {
+                    'type': 'string',
+                    'nullable': True,
+                    'format': 'uri',
+                    'example': 'http://api.example.org/tasks/?cursor=eyJkIjo',
+                },
+                'previous': {
+                    'type': 'string',
+                    'nullable': True,
+                    'format': 'uri',
+                    'example': None,
+                },
+                'users': {
+                    'type': 'array',
+                    'description': 'Авторы задач при envelope=users, '
+                    'в задачах тогда вместо автора его id.',
+                    'items': {
+                        'type': 'object',
+                        'properties': {
+                            'id': {'type': 'integer'},
+                            'first_name': {'type': 'string'},
+                            'email': {'type': 'string', 'format': 'email'},
+                        },
+                    },
+                },
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Курсор страницы из ссылок next и previous.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Количество задач на странице '
+                f'(не более {self.max_page_size}).',
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': self.envelope_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'users - авторы задач отдельным списком '
+                'users без повторов, в задачах только id автора.',
+                'schema': {'type': 'string', 'enum': [self.users_envelope]},
+            },
+        ]
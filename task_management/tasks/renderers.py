@@ -0,0 +1,83 @@
+import msgpack
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from .metrics import timer
+
+_encoder = JSONEncoder()
+
+
+def encode_default(obj):
+    """
+    Преобразует типы, которых нет в JSON и MessagePack (даты, Decimal,
+    UUID, ленивые строки), так же, как стандартный рендерер DRF.
+    """
+
+    return _encoder.default(obj)
+
+
+def render_event(data, event_id=None, event=None):
+    """Событие text/event-stream с данными в JSON."""
+
+    head = ''
+    if event is not None:
+        head += f'event: {event}\n'
+    if event_id is not None:
+        head += f'id: {event_id}\n'
+    data = orjson.dumps(data, default=encode_default).decode()
+    return f'{head}data: {data}\n\n'
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSON-рендерер на orjson.
+    Формирует тот же компактный UTF-8 JSON, что и JSONRenderer,
+    но в несколько раз быстрее на больших списках задач.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        option = orjson.OPT_NON_STR_KEYS
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            option |= orjson.OPT_INDENT_2
+        with timer('serializer'):
+            return orjson.dumps(data, default=encode_default, option=option)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Рендерер MessagePack для клиентов, которые запрашивают
+    Accept: application/msgpack или format=msgpack.
+    """
+
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        with timer('serializer'):
+            return msgpack.packb(
+                data, default=encode_default, use_bin_type=True
+            )
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Рендерер для согласования формата потоков Server-Sent Events.
+    Сам поток отдаётся StreamingHttpResponse, рендерер формирует
+    только ответы с ошибками - событием error.
+    """
+
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return render_event(data, event='error').encode()
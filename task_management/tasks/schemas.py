@@ -5,6 +5,8 @@ from drf_spectacular.utils import (
     OpenApiResponse,
 )
 
+from .serializers import TaskSerializer
+
 
 def get_unique_id_param(name):
     return OpenApiParameter(
@@ -15,10 +17,21 @@ def get_unique_id_param(name):
     )
 
 
+include_archived_param = OpenApiParameter(
+    name='include_archived',
+    description='true - включить выполненные задачи, перенесённые в архив',
+    required=False,
+    type=bool,
+)
+
+
 task_schema = {
     'list': extend_schema(
         summary='Получение всех задач',
-        description='Возвращает список всех задач.',
+        description='Возвращает список всех задач постранично, '
+        'от новых к старым, а при поиске по q - сначала наиболее '
+        'релевантные. Ссылки next и previous содержат курсор '
+        'соседней страницы.',
         examples=[
             OpenApiExample(
                 'list_tasks_example',
@@ -76,12 +89,13 @@ task_schema = {
                     ),
                 ],
             ),
+            include_archived_param,
         ],
     ),
     'current_user_tasks': extend_schema(
         summary='Получение списка задач текущего пользователя',
         description='Возвращает список задач пользователя, '
-        'который сделал запрос.',
+        'который сделал запрос, постранично по курсору.',
         examples=[
             OpenApiExample(
                 'Пример списка задач текущего пользователя',
@@ -116,6 +130,7 @@ task_schema = {
                 response_only=True,
             ),
         ],
+        parameters=[include_archived_param],
     ),
     'retrieve': extend_schema(
         summary='Получение конкретной задачи',
@@ -140,7 +155,7 @@ task_schema = {
                 response_only=True,
             )
         ],
-        parameters=[get_unique_id_param('задачи')],
+        parameters=[get_unique_id_param('задачи'), include_archived_param],
     ),
     'create': extend_schema(
         summary='Создание задачи',
@@ -211,4 +226,207 @@ task_schema = {
         description='Удаляет задачу с указанным ID.',
         parameters=[get_unique_id_param('задачи')],
     ),
+    'bulk_create': extend_schema(
+        summary='Массовое создание задач',
+        description='Создает задачи из переданного списка одним запросом '
+        'к базе данных.',
+        request=TaskSerializer(many=True),
+        responses=TaskSerializer(many=True),
+        examples=[
+            OpenApiExample(
+                'bulk_create_tasks_example',
+                summary='Пример запроса на массовое создание задач',
+                value=[
+                    {"title": "Задача 1", "description": "Описание 1"},
+                    {"title": "Задача 2", "description": "Описание 2"},
+                ],
+                request_only=True,
+            ),
+        ],
+    ),
+    'sync': extend_schema(
+        summary='Изменения своих задач после курсора',
+        description='Возвращает задачи текущего пользователя, созданные '
+        'и изменённые после курсора, и id удалённых задач в порядке '
+        'изменения. Без курсора возвращает все задачи пользователя. '
+        'Курсор ответа передаётся в следующий запрос, has_more означает, '
+        'что изменения получены не все. Если отметки об удалённых '
+        'задачах после курсора уже не хранятся, возвращается '
+        '{"resync": true}, и синхронизацию нужно начать без курсора.',
+        parameters=[
+            OpenApiParameter(
+                name='cursor',
+                description='Курсор из предыдущего ответа',
+                required=False,
+                location=OpenApiParameter.QUERY,
+            ),
+        ],
+        responses=OpenApiResponse(description='Изменения задач'),
+        examples=[
+            OpenApiExample(
+                'sync_tasks_example',
+                summary='Пример ответа с изменениями задач',
+                value={
+                    "cursor": "eyJ2IjoxMiwiaSI6NDJ9",
+                    "has_more": False,
+                    "created": [
+                        {
+                            "id": 42,
+                            "title": "Задача 42",
+                            "description": "Описание задачи 42",
+                            "status": "new",
+                            "created_date": "2023-01-01T00:00:00Z",
+                            "last_updated_date": None,
+                            "user": {
+                                "id": 1,
+                                "first_name": "Иван",
+                                "email": "ivan@example.com",
+                            },
+                        }
+                    ],
+                    "updated": [],
+                    "deleted": [7, 9],
+                },
+                response_only=True,
+            ),
+        ],
+    ),
+    'summary': extend_schema(
+        summary='Количество задач по статусам',
+        description='Возвращает количество всех задач по статусам, '
+        'а для аутентифицированного пользователя также количество '
+        'его задач. Значения читаются из счётчиков, которые '
+        'обновляются вместе с задачами.',
+        responses=OpenApiResponse(
+            description='Количество задач по статусам'
+        ),
+        examples=[
+            OpenApiExample(
+                'tasks_summary_example',
+                summary='Пример ответа с количеством задач',
+                value={
+                    "global": {
+                        "new": 10,
+                        "in_progress": 5,
+                        "done": 20,
+                        "total": 35,
+                    },
+                    "user": {
+                        "new": 2,
+                        "in_progress": 1,
+                        "done": 3,
+                        "total": 6,
+                    },
+                },
+                response_only=True,
+            ),
+        ],
+    ),
+}
+
+task_bulk_update_schema = {
+    'summary': 'Массовое частичное обновление задач',
+    'description': 'Обновляет задачи текущего пользователя из переданного '
+    'списка. Каждый элемент содержит id задачи и изменяемые поля.',
+    'request': TaskSerializer(many=True),
+    'responses': TaskSerializer(many=True),
+    'examples': [
+        OpenApiExample(
+            'bulk_update_tasks_example',
+            summary='Пример запроса на массовое обновление задач',
+            value=[
+                {"id": 1, "status": "in_progress"},
+                {"id": 2, "status": "done"},
+            ],
+            request_only=True,
+        ),
+    ],
+}
+
+task_bulk_destroy_schema = {
+    'summary': 'Массовое удаление задач',
+    'description': 'Удаляет задачи текущего пользователя с переданными ID.',
+    'request': {
+        'application/json': {'type': 'array', 'items': {'type': 'integer'}}
+    },
+    'responses': {204: None},
+    'examples': [
+        OpenApiExample(
+            'bulk_destroy_tasks_example',
+            summary='Пример запроса на массовое удаление задач',
+            value=[1, 2],
+            request_only=True,
+        ),
+    ],
+}
+
+notification_params = [
+    OpenApiParameter(
+        name='tasks',
+        description='id задач через запятую, уведомления о которых '
+        'нужны кроме уведомлений о своих задачах',
+        required=False,
+        location=OpenApiParameter.QUERY,
+    ),
+    OpenApiParameter(
+        name='last_seen_id',
+        description='id последнего полученного уведомления, '
+        'пропущенные после него уведомления о своих задачах '
+        'возвращаются из журнала',
+        required=False,
+        location=OpenApiParameter.QUERY,
+    ),
+]
+
+notification_schema = {
+    'stream': extend_schema(
+        summary='Поток уведомлений о задачах',
+        description='Поток Server-Sent Events с теми же уведомлениями, '
+        'что отправляются по веб-сокету. Каждое уведомление - событие '
+        'с id, по которому при переподключении через заголовок '
+        'Last-Event-ID приходят пропущенные уведомления. Если журнал '
+        'их уже не хранит, приходит событие {"resync": true}. '
+        'Токен можно передать в параметре token.',
+        parameters=notification_params,
+        responses={
+            (200, 'text/event-stream'): OpenApiResponse(
+                description='Поток событий с уведомлениями'
+            ),
+        },
+    ),
+    'poll': extend_schema(
+        summary='Долгий опрос уведомлений о задачах',
+        description='Возвращает пропущенные после last_seen_id '
+        'уведомления или ждёт новые не дольше timeout секунд. '
+        'Пустой список означает, что уведомлений за это время не было, '
+        'resync - что журнал пропущенных уведомлений уже не хранит.',
+        parameters=[
+            *notification_params,
+            OpenApiParameter(
+                name='timeout',
+                description='Время ожидания в секундах',
+                required=False,
+                type=float,
+                location=OpenApiParameter.QUERY,
+            ),
+        ],
+        responses=OpenApiResponse(description='Уведомления о задачах'),
+        examples=[
+            OpenApiExample(
+                'poll_notifications_example',
+                summary='Пример ответа с уведомлениями',
+                value={
+                    "notifications": [
+                        {
+                            "id": "1700000000000-0",
+                            "task_id": 1,
+                            "message": "Изменился статус задачи "
+                            "Задача 1 с new на done",
+                        }
+                    ]
+                },
+                response_only=True,
+            ),
+        ],
+    ),
 }
@@ -0,0 +1,115 @@
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramWordSimilarity,
+)
+from django.db import connections
+from django.db.models import CharField, FloatField, Func, Q, Value
+from django.db.models.functions import Cast
+
+SEARCH_CONFIG = 'russian'
+SEARCH_MAX_TERMS = 10
+SEARCH_TERM_RE = re.compile(r'\w+')
+
+
+class CaseFold(Func):
+    """
+    Приводит строку к нижнему регистру функцией Python в SQLite:
+    встроенные lower() и LIKE в SQLite меняют регистр только
+    латинских букв.
+    """
+
+    function = 'CASEFOLD'
+    output_field = CharField()
+
+
+def _casefold(value):
+    return None if value is None else value.casefold()
+
+
+def install_casefold(sender, connection, **kwargs):
+    """Регистрирует функцию CASEFOLD в каждом новом соединении SQLite."""
+
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function(
+            'CASEFOLD', 1, _casefold, deterministic=True
+        )
+
+
+def get_search_vector():
+    """
+    Поисковый вектор задачи: название весомее описания.
+    Выражение совпадает с выражением GIN-индекса task_search_idx,
+    поэтому поиск идёт по индексу.
+    """
+
+    return SearchVector(
+        'title', weight='A', config=SEARCH_CONFIG
+    ) + SearchVector('description', weight='B', config=SEARCH_CONFIG)
+
+
+def get_search_query(terms):
+    """
+    Строит запрос, в котором каждое слово ищется по префиксу,
+    чтобы находить задачи по началу слова.
+    Слова состоят только из букв и цифр, поэтому не содержат
+    операторов tsquery.
+    """
+
+    return SearchQuery(
+        ' & '.join(f'{term}:*' for term in terms),
+        search_type='raw',
+        config=SEARCH_CONFIG,
+    )
+
+
+def search_tasks(queryset, text):
+    """
+    Отбирает задачи по тексту и добавляет релевантность search_rank.
+    В PostgreSQL ищет полнотекстово по названию и описанию, а при
+    TASKS_SEARCH_TRIGRAM также находит названия с похожими словами,
+    например с опечатками (нужно расширение pg_trgm).
+    В остальных СУБД ищет по вхождению подстроки без учёта регистра
+    и без ранжирования.
+    """
+
+    terms = SEARCH_TERM_RE.findall(text)[:SEARCH_MAX_TERMS]
+    if not terms:
+        return queryset.none()
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        title, description = 'title', 'description'
+        if connection.vendor == 'sqlite':
+            queryset = queryset.alias(
+                search_title=CaseFold('title'),
+                search_description=CaseFold('description'),
+            )
+            title, description = 'search_title', 'search_description'
+            terms = [term.casefold() for term in terms]
+        condition = Q()
+        for term in terms:
+            condition &= Q(**{f'{title}__icontains': term}) | Q(
+                **{f'{description}__icontains': term}
+            )
+        return queryset.filter(condition).annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        )
+
+    query = get_search_query(terms)
+    vector = get_search_vector()
+    condition = Q(search_vector=query)
+    rank = SearchRank(vector, query)
+    if settings.TASKS_SEARCH_TRIGRAM:
+        condition |= Q(title__trigram_word_similar=text)
+        rank += TrigramWordSimilarity(text, 'title')
+    # ts_rank возвращает real, приведение к double precision
+    # сохраняет значение точным при передаче в курсоре страницы.
+    return (
+        queryset.alias(search_vector=vector)
+        .filter(condition)
+        .annotate(search_rank=Cast(rank, FloatField()))
+    )
@@ -1,9 +1,75 @@
+from django.db import transaction
 from django.utils import timezone
 from rest_framework import serializers
+from rest_framework.exceptions import NotFound
 
 from users.serializers import UserSerializer
+from .counters import count_created_tasks, count_status_changes, lock_tasks
+from .metrics import timer
 from .models import Task
-from .utils import send_task_status_change_notification
+from .owners import get_owner_columns
+from .sync import mark_changed
+from .utils import (
+    send_task_status_change_notification,
+    send_tasks_status_change_notification,
+)
+
+
+class TaskListSerializer(serializers.ListSerializer):
+    """
+    Сериализатор списка задач для массовых операций.
+    Создаёт задачи одним bulk_create, обновляет одним bulk_update.
+    При обновлении задачи передаются в том же порядке, что и данные.
+    """
+
+    def run_child_validation(self, data):
+        if self.instance is not None:
+            self.child.instance = self.instance[self._child_index]
+            self.child.initial_data = data
+        self._child_index += 1
+        return super().run_child_validation(data)
+
+    def to_internal_value(self, data):
+        self._child_index = 0
+        return super().to_internal_value(data)
+
+    @property
+    def data(self):
+        with timer('serializer'):
+            return super().data
+
+    def create(self, validated_data):
+        tasks = [Task(**attrs) for attrs in validated_data]
+        for task in tasks:
+            task.copy_owner()
+        with transaction.atomic():
+            mark_changed(tasks, created=True)
+            Task.objects.bulk_create(tasks)
+            count_created_tasks(tasks)
+        return tasks
+
+    def update(self, tasks, validated_data):
+        now = timezone.now()
+        fields = {'last_updated_date', 'sync_version'}
+        changes = []
+        with transaction.atomic():
+            locked = {task.pk for task in lock_tasks(tasks)}
+            missing = [task.pk for task in tasks if task.pk not in locked]
+            if missing:
+                raise NotFound(f'Задачи не найдены: {missing}.')
+            for task, attrs in zip(tasks, validated_data):
+                old_status = task.status
+                for attr, value in attrs.items():
+                    setattr(task, attr, value)
+                    fields.add(attr)
+                task.last_updated_date = now
+                if task.status != old_status:
+                    changes.append((task, old_status))
+            mark_changed(tasks)
+            Task.objects.bulk_update(tasks, fields)
+            count_status_changes(changes)
+            send_tasks_status_change_notification(changes)
+        return tasks
 
 
 class TaskSerializer(serializers.ModelSerializer):
@@ -20,19 +86,138 @@ class TaskSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Task
-        fields = '__all__'
+        exclude = (
+            'created_version',
+            'sync_version',
+            'owner_first_name',
+            'owner_email',
+        )
         read_only_fields = ('created_date',)
+        list_serializer_class = TaskListSerializer
+
+    @property
+    def data(self):
+        with timer('serializer'):
+            return super().data
+
+    def create(self, validated_data):
+        task = Task(**validated_data)
+        with transaction.atomic():
+            mark_changed([task], created=True)
+            task.save()
+            count_created_tasks([task])
+        return task
 
     def update(self, task, validated_data):
         """
         Переопределение метода обновления с изменением даты
-        последнего обновления задачи.
+        последнего обновления и версии изменения задачи, пересчётом
+        счётчиков статусов и уведомлением о смене статуса.
+        Строка задачи перечитывается с блокировкой, поэтому
+        параллельные изменения одной задачи применяются по очереди.
         """
 
-        for attr, value in validated_data.items():
-            if attr == 'status' and task.status != value:
-                send_task_status_change_notification(task, value)
-            setattr(task, attr, value)
-        task.last_updated_date = timezone.now()
-        task.save()
+        with transaction.atomic():
+            if not lock_tasks([task]):
+                raise NotFound()
+            old_status = task.status
+            for attr, value in validated_data.items():
+                setattr(task, attr, value)
+            task.last_updated_date = timezone.now()
+            mark_changed([task])
+            task.save()
+            if task.status != old_status:
+                count_status_changes([(task, old_status)])
+                send_task_status_change_notification(task, old_status)
         return task
+
+
+class TaskReadSerializer:
+    """
+    Быстрый сериализатор списков задач только для чтения.
+    Выбирает нужные столбцы через values() вместе с именем и email
+    автора из снимка в задаче и собирает словари напрямую,
+    без вложенного сериализатора
+    и обхода полей на каждой строке.
+    Результат совпадает с представлением TaskSerializer.
+    """
+
+    datetime_field = serializers.DateTimeField()
+
+    @staticmethod
+    def get_rows(queryset):
+        """
+        Выбирает столбцы представления, а для результатов поиска
+        также релевантность, по которой строится курсор страницы.
+        """
+
+        fields = [
+            'id',
+            'status',
+            'title',
+            'description',
+            'created_date',
+            'last_updated_date',
+            'user_id',
+        ]
+        if 'search_rank' in queryset.query.annotations:
+            fields.append('search_rank')
+        return queryset.values(*fields, **get_owner_columns())
+
+    @staticmethod
+    def get_user(row):
+        return {
+            'id': row['user_id'],
+            'first_name': row['user_first_name'],
+            'email': row['user_email'],
+        }
+
+    @classmethod
+    def to_representation(cls, row, users=None):
+        """
+        Представление строки задачи. Если передан словарь users,
+        вместо автора в задаче остаётся его id, а сам автор
+        добавляется в users один раз.
+        """
+
+        to_datetime = cls.datetime_field.to_representation
+        last_updated_date = row['last_updated_date']
+        user_id = row['user_id']
+        if user_id is None:
+            user = None
+        elif users is None:
+            user = cls.get_user(row)
+        else:
+            user = user_id
+            if user_id not in users:
+                users[user_id] = cls.get_user(row)
+        return {
+            'id': row['id'],
+            'status': row['status'],
+            'user': user,
+            'title': row['title'],
+            'description': row['description'],
+            'created_date': to_datetime(row['created_date']),
+            'last_updated_date': (
+                None
+                if last_updated_date is None
+                else to_datetime(last_updated_date)
+            ),
+        }
+
+    @classmethod
+    def many(cls, rows):
+        with timer('serializer'):
+            return [cls.to_representation(row) for row in rows]
+
+    @classmethod
+    def many_with_users(cls, rows):
+        """
+        Возвращает задачи со ссылками на авторов по id
+        и список этих авторов без повторов.
+        """
+
+        users = {}
+        with timer('serializer'):
+            tasks = [cls.to_representation(row, users) for row in rows]
+        return tasks, list(users.values())
@@ -0,0 +1,56 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from users.models import CustomUser
+from .owners import OWNER_FIELDS, clear_owner, owner_propagator
+
+
+def get_owner_values(user):
+    """
+    Имя и email пользователя из загруженных полей, без загрузки
+    отложенных полей. Незагруженное поле - None.
+    """
+
+    return tuple(user.__dict__.get(field) for field in OWNER_FIELDS)
+
+
+@receiver(post_init, sender=CustomUser)
+def remember_owner_values(sender, instance, **kwargs):
+    """Запоминает имя и email пользователя при загрузке из базы."""
+
+    instance._owner_values = get_owner_values(instance)
+
+
+@receiver(post_save, sender=CustomUser)
+def propagate_owner_change(
+    sender, instance, created=False, update_fields=None, **kwargs
+):
+    """
+    Если сохранение изменило имя или email пользователя, после
+    фиксации ставит обновление снимка автора в его задачах в очередь
+    фонового потока. Сохранения без этих изменений, например смена
+    is_active, пароля или last_login, пропускаются. Изменения через
+    QuerySet.update() сигналов не вызывают и исправляются командой
+    check_task_owners.
+    """
+
+    if update_fields is not None and not OWNER_FIELDS & set(update_fields):
+        return
+    values = get_owner_values(instance)
+    previous, instance._owner_values = instance._owner_values, values
+    if created or values == previous:
+        return
+    transaction.on_commit(partial(owner_propagator.enqueue, instance.pk))
+
+
+@receiver(pre_delete, sender=CustomUser)
+def clear_deleted_owner(sender, instance, **kwargs):
+    """
+    Очищает снимок автора в задачах удаляемого пользователя
+    в той же транзакции: задачи остаются без автора.
+    """
+
+    clear_owner(instance.pk)
@@ -0,0 +1,144 @@
+import asyncio
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from .consumers import task_group_name, user_group_name
+from .notification_log import notification_log, parse_sequence_id
+
+
+def parse_task_ids(values):
+    """
+    id задач из значений параметра tasks=1,2, не больше
+    NOTIFICATIONS_MAX_TASK_SUBSCRIPTIONS.
+    """
+
+    task_ids = []
+    for value in values:
+        for task_id in value.split(','):
+            task_id = task_id.strip()
+            if task_id.isdigit() and int(task_id) not in task_ids:
+                task_ids.append(int(task_id))
+    return task_ids[: settings.NOTIFICATIONS_MAX_TASK_SUBSCRIPTIONS]
+
+
+def coalesce(notifications):
+    """Оставляет из уведомлений об одной задаче последнее."""
+
+    latest = OrderedDict()
+    for notification in notifications:
+        latest.pop(notification['task_id'], None)
+        latest[notification['task_id']] = notification
+    return list(latest.values())
+
+
+class NotificationSubscription:
+    """
+    Подписка HTTP-запроса на те же уведомления, что получает
+    NotificationConsumer: о задачах пользователя и выбранных задачах.
+    Уведомления приходят в отдельный канал слоя каналов и ожидаются
+    асинхронно, поэтому открытая подписка не занимает поток.
+    """
+
+    def __init__(self, user, task_ids=()):
+        self.user = user
+        self.groups = [
+            user_group_name(user.pk),
+            *(task_group_name(task_id) for task_id in task_ids),
+        ]
+        self.channel_layer = get_channel_layer()
+        self.channel = None
+        self.replayed_id = None
+
+    async def __aenter__(self):
+        self.channel = await self.channel_layer.new_channel(
+            'notifications.http'
+        )
+        for group_name in self.groups:
+            await self.channel_layer.group_add(group_name, self.channel)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        for group_name in self.groups:
+            await self.channel_layer.group_discard(group_name, self.channel)
+
+    async def replay(self, last_seen_id):
+        """
+        Возвращает уведомления из журнала после last_seen_id или None,
+        если журнал их уже не хранит. Уведомления, пришедшие в канал
+        после подписки и уже прочитанные из журнала, потом пропускаются.
+        """
+
+        missed = await sync_to_async(
+            notification_log.read_after, thread_sensitive=False
+        )(self.user.pk, last_seen_id)
+        if missed:
+            self.replayed_id = parse_sequence_id(missed[-1]['id'])
+        return missed
+
+    async def receive(self, timeout):
+        """
+        Ждёт уведомления не дольше timeout секунд, затем ещё
+        NOTIFICATIONS_FLUSH_INTERVAL секунд собирает следующие.
+        Возвращает их без повторов по задачам или пустой список.
+        """
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        notifications = []
+        while not notifications:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return []
+            notifications = await self.receive_event(remaining)
+        deadline = loop.time() + settings.NOTIFICATIONS_FLUSH_INTERVAL
+        while (remaining := deadline - loop.time()) > 0:
+            notifications.extend(await self.receive_event(remaining))
+        return coalesce(notifications)
+
+    async def receive_event(self, timeout):
+        try:
+            event = await asyncio.wait_for(
+                self.channel_layer.receive(self.channel), timeout
+            )
+        except asyncio.TimeoutError:
+            return []
+        return self.get_notifications(event)
+
+    def get_notifications(self, event):
+        if event['type'] == 'send_notifications':
+            notifications = event['notifications']
+        elif event['type'] == 'send_notification':
+            if (
+                event.get('scope') == 'task'
+                and event['user_id'] == self.user.pk
+            ):
+                # Владелец уже получает уведомление через свою группу.
+                return []
+            notifications = [event]
+        else:
+            return []
+        return [
+            self.to_frame(notification)
+            for notification in notifications
+            if not self.is_replayed(notification)
+        ]
+
+    @staticmethod
+    def to_frame(notification):
+        frame = {
+            'task_id': notification['task_id'],
+            'message': notification['message'],
+        }
+        if 'id' in notification:
+            frame['id'] = notification['id']
+        return frame
+
+    def is_replayed(self, notification):
+        return (
+            self.replayed_id is not None
+            and 'id' in notification
+            and parse_sequence_id(notification['id']) <= self.replayed_id
+        )
@@ -0,0 +1,188 @@
+import binascii
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from heapq import merge
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import F, Max, Q
+
+from .models import Task, TaskSyncState, TaskTombstone
+
+
+class InvalidSyncCursor(ValueError):
+    pass
+
+
+def allocate_versions(user_id, count):
+    """
+    Выдаёт count следующих версий изменений задач пользователя.
+    Блокирует строку версий пользователя до конца транзакции,
+    поэтому должна вызываться в транзакции изменения задач.
+    """
+
+    if user_id is None:
+        return [0] * count
+    state, _ = TaskSyncState.objects.select_for_update().get_or_create(
+        user_id=user_id
+    )
+    first = state.version + 1
+    state.version += count
+    state.save(update_fields=('version',))
+    return list(range(first, first + count))
+
+
+def _by_user(tasks):
+    tasks_by_user = {}
+    for task in tasks:
+        tasks_by_user.setdefault(task.user_id, []).append(task)
+    # Версии пользователей блокируются в одном порядке,
+    # чтобы параллельные транзакции не взаимоблокировались.
+    return sorted(
+        tasks_by_user.items(), key=lambda item: (item[0] is not None, item[0])
+    )
+
+
+def mark_changed(tasks, created=False):
+    """
+    Назначает задачам новые версии изменений до их сохранения,
+    новым задачам также версию создания.
+    """
+
+    for user_id, user_tasks in _by_user(tasks):
+        versions = allocate_versions(user_id, len(user_tasks))
+        for task, version in zip(user_tasks, versions):
+            task.sync_version = version
+            if created:
+                task.created_version = version
+
+
+def record_deleted(tasks):
+    """Сохраняет отметки об удалении задач с новыми версиями."""
+
+    tombstones = []
+    for user_id, user_tasks in _by_user(tasks):
+        if user_id is None:
+            continue
+        versions = allocate_versions(user_id, len(user_tasks))
+        tombstones.extend(
+            TaskTombstone(user_id=user_id, task_id=task.pk, version=version)
+            for task, version in zip(user_tasks, versions)
+        )
+    TaskTombstone.objects.bulk_create(tombstones)
+
+
+def prune_tombstones(cutoff, batch_size):
+    """
+    Удаляет отметки об удалении задач старше cutoff пачками,
+    каждая пачка удаляется отдельной транзакцией.
+    Запоминает у пользователей последнюю удалённую версию:
+    курсору с меньшей версией нужна полная синхронизация.
+    Возвращает количество удалённых отметок.
+    """
+
+    total = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                TaskTombstone.objects.filter(deleted_date__lt=cutoff)
+                .order_by('deleted_date', 'id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                return total
+            tombstones = TaskTombstone.objects.filter(pk__in=ids)
+            pruned = (
+                tombstones.order_by('user_id')
+                .values('user_id')
+                .annotate(version=Max('version'))
+                .values_list('user_id', 'version')
+            )
+            for user_id, version in pruned:
+                TaskSyncState.objects.filter(
+                    user_id=user_id, pruned_version__lt=version
+                ).update(pruned_version=version)
+            tombstones.delete()
+        total += len(ids)
+
+
+def is_cursor_expired(user, position):
+    """
+    Проверяет, удалены ли по сроку хранения отметки об удалении
+    после позиции курсора. Позиция без курсора не устаревает.
+    """
+
+    version, _ = position
+    if version < 0:
+        return False
+    return TaskSyncState.objects.filter(
+        user=user, pruned_version__gt=version
+    ).exists()
+
+
+def encode_sync_cursor(position):
+    version, pk = position
+    return urlsafe_b64encode(
+        json.dumps({'v': version, 'i': pk}, separators=(',', ':')).encode()
+    ).decode()
+
+
+def decode_sync_cursor(encoded):
+    """
+    Возвращает позицию (версия, id) из курсора. Без курсора
+    возвращает позицию перед всеми задачами, в том числе
+    созданными до появления версий.
+    """
+
+    if not encoded:
+        return -1, 0
+    try:
+        data = json.loads(urlsafe_b64decode(encoded.encode()))
+        return int(data['v']), int(data['i'])
+    except (
+        binascii.Error,
+        json.JSONDecodeError,
+        KeyError,
+        TypeError,
+        ValueError,
+    ):
+        raise InvalidSyncCursor(encoded)
+
+
+def get_changes(user, position, limit, get_rows):
+    """
+    Возвращает изменения задач пользователя после позиции курсора
+    в порядке версий: не больше limit записей и признак наличия
+    следующих изменений.
+    Задачи и отметки об удалении выбираются по индексам
+    (пользователь, версия, id), каждая выборка ограничена limit + 1.
+    get_rows превращает запрос задач в запрос строк представления.
+    """
+
+    version, pk = position
+    tasks = get_rows(
+        Task.objects.filter(
+            Q(sync_version__gt=version) | Q(sync_version=version, id__gt=pk),
+            user=user,
+            sync_version__gte=version,
+        ).order_by('sync_version', 'id')
+    ).annotate(
+        row_version=F('sync_version'),
+        row_created_version=F('created_version'),
+    )[: limit + 1]
+    tombstones = (
+        TaskTombstone.objects.filter(
+            Q(version__gt=version) | Q(version=version, task_id__gt=pk),
+            user=user,
+            version__gte=version,
+        )
+        .order_by('version', 'task_id')
+        .values_list('version', 'task_id')[: limit + 1]
+    )
+    changes = merge(
+        (((row['row_version'], row['id']), row) for row in tasks),
+        (((version, task_id), None) for version, task_id in tombstones),
+        key=lambda change: change[0],
+    )
+    changes = list(islice(changes, limit + 1))
+    return changes[:limit], len(changes) > limit
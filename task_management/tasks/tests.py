@@ -1,14 +1,56 @@
+import asyncio
+import csv
+import json
+import threading
 from datetime import timedelta
+from functools import partial
+from io import StringIO
+from itertools import cycle
+from types import SimpleNamespace
+from unittest import mock
 
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from config.db_pool.pool import ConnectionPool, get_pools
+from config.db_router import lag_monitor
 from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, connections
 from django.forms import model_to_dict
+from django.test import (
+    AsyncClient,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
+from django_redis.cache import RedisCache
+import msgpack
 from rest_framework import status
+from rest_framework.authtoken.models import Token
 from rest_framework.test import APITestCase, APIClient
+from users.authentication import TokenAuthMiddleware
 from users.models import CustomUser
 
-from .models import Task
+from .cache import (
+    AsyncCacheMiddleware,
+    async_cache,
+    get_list_generation,
+    get_user_generation,
+)
+from .consumers import outbound_stats, task_group_name, user_group_name
+from .counters import rebuild_counters
+from .metrics import registry
+from .models import ArchivedTask, Task, TaskStatusCounter, TaskTombstone
+from .notification_log import LOG_KEY, notification_log
+from .notifications import NotificationDispatcher
+from .owners import find_owner_drift, owner_propagator, propagate_owner
+from .routing import websocket_urlpatterns
+from .serializers import TaskReadSerializer, TaskSerializer
+from .views import TaskViewSet
 
 
 class TaskTestCase(APITestCase):
@@ -108,7 +150,7 @@ class TaskTestCase(APITestCase):
 
         response = self.client.get(self.task_list_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data['results']), 2)
 
     def test_update_task(self):
         """
@@ -170,7 +212,7 @@ class TaskTestCase(APITestCase):
             self.task_list_url, {'created_date': now_date}
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        for task in response.data:
+        for task in response.data['results']:
             with self.subTest(task=task):
                 self.assertIn(now_date, task['created_date'])
 
@@ -182,7 +224,7 @@ class TaskTestCase(APITestCase):
 
         response = self.client.get(self.task_list_url, {'status': 'new'})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        for task in response.data:
+        for task in response.data['results']:
             with self.subTest(task=task):
                 self.assertEqual(task['status'], 'new')
 
@@ -193,7 +235,7 @@ class TaskTestCase(APITestCase):
         пользователя сделавшего запрос
         """
         response = self.client_user_1.get(reverse('task-my-tasks'))
-        for task in response.data:
+        for task in response.data['results']:
             with self.subTest(task=task):
                 self.assertEqual(
                     task['user'],
@@ -202,3 +244,1438 @@ class TaskTestCase(APITestCase):
                         fields=['id', 'email', 'first_name'],
                     ),
                 )
+
+    def test_update_invalidates_only_affected_caches(self):
+        """
+        Тест инвалидации кэша при обновлении задачи.
+        Ожидаемый результат: меняются поколения общего списка и списка
+        владельца задачи, поколение другого пользователя не меняется.
+        """
+
+        list_generation = get_list_generation()
+        user_1_generation = get_user_generation(self.user_1.pk)
+        user_2_generation = get_user_generation(self.user_2.pk)
+
+        self.client_user_1.patch(
+            self.task_user_1_detail_url, data={'status': 'done'}
+        )
+
+        self.assertNotEqual(get_list_generation(), list_generation)
+        self.assertNotEqual(
+            get_user_generation(self.user_1.pk), user_1_generation
+        )
+        self.assertEqual(
+            get_user_generation(self.user_2.pk), user_2_generation
+        )
+
+    def test_task_list_cache_refreshed_after_create(self):
+        """
+        Тест обновления закэшированного списка после создания задачи.
+        Ожидаемый результат: новая задача появляется в списке.
+        """
+
+        response = self.client.get(self.task_list_url)
+        self.assertEqual(len(response.data['results']), 2)
+        self.client_user_1.post(self.task_list_url, data=self.user_1_task_data)
+        response = self.client.get(self.task_list_url)
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_current_user_task_list_cached_per_user(self):
+        """
+        Тест кэширования списка задач текущего пользователя.
+        Ожидаемый результат: второй пользователь получает свои задачи,
+        а не закэшированный ответ первого пользователя.
+        """
+
+        client_user_2 = APIClient()
+        client_user_2.force_authenticate(user=self.user_2)
+        self.client_user_1.get(reverse('task-my-tasks'))
+        response = client_user_2.get(reverse('task-my-tasks'))
+        self.assertEqual(
+            [task['id'] for task in response.json()['results']],
+            [self.task_user_2.pk],
+        )
+
+    def test_async_cache_clients_closed(self):
+        """
+        Тест жизненного цикла клиентов async_cache.
+        Ожидаемый результат: клиент сессии закрывается по её окончании,
+        клиент цикла сервера закрепляется при lifespan.startup,
+        используется запросами и закрывается при lifespan.shutdown.
+        """
+
+        if not isinstance(async_cache.backend, RedisCache):
+            self.skipTest('Клиенты redis.asyncio есть только у django-redis.')
+
+        def is_connected(client):
+            pool = client.connection_pool
+            return any(
+                connection.is_connected
+                for connection in pool._available_connections
+            )
+
+        async def app(scope, receive, send):
+            self.assertIs(async_cache.get_client(), bound)
+            await async_cache.set('async-cache-test', 1, 60)
+            self.assertTrue(is_connected(bound))
+
+        async def run():
+            nonlocal bound
+            async with async_cache.session():
+                client = async_cache.get_client()
+                await async_cache.set('async-cache-test', 1, 60)
+                self.assertIs(async_cache.get_client(), client)
+            self.assertFalse(is_connected(client))
+
+            messages = asyncio.Queue()
+            sent = []
+
+            async def send(message):
+                sent.append(message)
+
+            middleware = AsyncCacheMiddleware(app)
+            lifespan = asyncio.create_task(
+                middleware({'type': 'lifespan'}, messages.get, send)
+            )
+            await messages.put({'type': 'lifespan.startup'})
+            while not sent:
+                await asyncio.sleep(0)
+            bound = async_cache.get_client()
+            await middleware({'type': 'http'}, None, None)
+            await messages.put({'type': 'lifespan.shutdown'})
+            await lifespan
+            self.assertEqual(
+                [message['type'] for message in sent],
+                ['lifespan.startup.complete', 'lifespan.shutdown.complete'],
+            )
+            self.assertFalse(is_connected(bound))
+            with self.assertRaises(KeyError):
+                async_cache.get_client()
+
+        bound = None
+        asyncio.run(run())
+        self.assertEqual(cache.get('async-cache-test'), 1)
+
+    def test_task_list_not_modified(self):
+        """
+        Тест условного запроса списка задач.
+        Ожидаемый результат: при совпадении ETag возвращается
+        код 304 NOT MODIFIED.
+        """
+
+        response = self.client.get(self.task_list_url)
+        etag = response['ETag']
+        response = self.client.get(
+            self.task_list_url, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_task_list_cursor_pagination(self):
+        """
+        Тест постраничного получения списка задач.
+        Ожидаемый результат: переход по ссылкам next и previous
+        возвращает задачи в порядке убывания даты создания без повторов.
+        """
+
+        response = self.client.get(self.task_list_url, {'page_size': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data['previous'])
+        first_page = [task['id'] for task in response.data['results']]
+
+        response = self.client.get(response.data['next'])
+        second_page = [task['id'] for task in response.data['results']]
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(
+            first_page + second_page,
+            [self.task_user_2.pk, self.task_user_1.pk],
+        )
+
+        response = self.client.get(response.data['previous'])
+        self.assertEqual(
+            [task['id'] for task in response.data['results']], first_page
+        )
+
+    def test_task_list_invalid_cursor(self):
+        """
+        Тест запроса списка задач с неверным курсором.
+        Ожидаемый результат: возвращается код 404 NOT FOUND.
+        """
+
+        response = self.client.get(self.task_list_url, {'cursor': 'invalid'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_task_list_formats(self):
+        """
+        Тест форматов ответа списка задач.
+        Ожидаемый результат: JSON и MessagePack содержат одинаковые
+        данные, при envelope=users каждый автор передаётся один раз,
+        а задачи ссылаются на него по id.
+        """
+
+        Task.objects.create(user=self.user_1, title='Третья задача')
+
+        response = self.client.get(self.task_list_url)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        data = json.loads(response.content)
+
+        response = self.client.get(
+            self.task_list_url, HTTP_ACCEPT='application/msgpack'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), data)
+
+        response = self.client.get(
+            self.task_list_url, {'envelope': 'users'}
+        )
+        envelope = json.loads(response.content)
+        self.assertEqual(
+            envelope['users'],
+            [task['user'] for task in data['results'][:2]],
+        )
+        self.assertEqual(
+            envelope['results'],
+            [
+                {**task, 'user': task['user']['id']}
+                for task in data['results']
+            ],
+        )
+
+    def test_search_tasks(self):
+        """
+        Тест поиска задач по тексту.
+        Ожидаемый результат: находятся задачи с началом слова
+        в названии или описании, совпадения в названии идут первыми,
+        страницы результатов поиска переходят без повторов.
+        """
+
+        in_description = Task.objects.create(
+            user=self.user_2,
+            title='Покупки',
+            description='Купить молоко и хлеб',
+        )
+        in_title = Task.objects.create(
+            user=self.user_1, title='Молоко', description='Срочно'
+        )
+        Task.objects.create(
+            user=self.user_1, title='Отчёт', description='Квартальный'
+        )
+
+        response = self.client.get(
+            self.task_list_url, {'q': 'молок', 'page_size': 1}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        first_page = [task['id'] for task in response.data['results']]
+        response = self.client.get(response.data['next'])
+        second_page = [task['id'] for task in response.data['results']]
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(
+            first_page + second_page, [in_title.pk, in_description.pk]
+        )
+
+        response = self.client.get(response.data['previous'])
+        self.assertEqual(
+            [task['id'] for task in response.data['results']], first_page
+        )
+
+        response = self.client.get(
+            self.task_list_url, {'q': 'купить хлеб', 'status': 'new'}
+        )
+        self.assertEqual(
+            [task['id'] for task in response.data['results']],
+            [in_description.pk],
+        )
+        response = self.client.get(self.task_list_url, {'q': '!!!'})
+        self.assertEqual(response.data['results'], [])
+
+    @override_settings(TASKS_SEARCH_TRIGRAM=True)
+    def test_search_similar_words(self):
+        """
+        Тест поиска похожих слов при TASKS_SEARCH_TRIGRAM.
+        Ожидаемый результат: название находится по слову с опечаткой.
+        """
+
+        if connection.vendor != 'postgresql':
+            self.skipTest('Поиск похожих слов есть только в PostgreSQL.')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT 1 FROM pg_extension WHERE extname = %s', ['pg_trgm']
+            )
+            if cursor.fetchone() is None:
+                self.skipTest('Расширение pg_trgm не установлено.')
+
+        task = Task.objects.create(
+            user=self.user_1, title='Молоко', description='Срочно'
+        )
+        response = self.client.get(self.task_list_url, {'q': 'молокоо'})
+        self.assertEqual(
+            [item['id'] for item in response.data['results']], [task.pk]
+        )
+        with override_settings(TASKS_SEARCH_TRIGRAM=False):
+            response = self.client.get(self.task_list_url, {'q': 'молокоо'})
+        self.assertEqual(response.data['results'], [])
+
+    def test_sync_my_tasks(self):
+        """
+        Тест получения изменений своих задач после курсора.
+        Ожидаемый результат: без курсора возвращаются все свои задачи,
+        после курсора - только созданные, изменённые и удалённые,
+        изменения передаются частями не больше TASKS_SYNC_BATCH_SIZE.
+        """
+
+        sync_url = reverse('task-my-tasks-sync')
+        response = self.client_user_1.get(sync_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [task['id'] for task in response.data['created']],
+            [self.task_user_1.pk],
+        )
+        self.assertFalse(response.data['has_more'])
+        cursor = response.data['cursor']
+
+        response = self.client_user_1.get(sync_url, {'cursor': cursor})
+        self.assertEqual(
+            (
+                response.data['created'],
+                response.data['updated'],
+                response.data['deleted'],
+            ),
+            ([], [], []),
+        )
+        self.assertEqual(response.data['cursor'], cursor)
+
+        self.client_user_1.patch(
+            self.task_user_1_detail_url, {'status': 'done'}, format='json'
+        )
+        created = self.client_user_1.post(
+            reverse('task-bulk'),
+            data=[self.user_1_task_data, self.user_1_task_data],
+            format='json',
+        ).data
+        self.client_user_1.delete(
+            reverse('task-detail', kwargs={'pk': created[1]['id']})
+        )
+        with override_settings(TASKS_SYNC_BATCH_SIZE=2):
+            response = self.client_user_1.get(sync_url, {'cursor': cursor})
+            self.assertTrue(response.data['has_more'])
+            first = response.data
+            response = self.client_user_1.get(
+                sync_url, {'cursor': first['cursor']}
+            )
+        self.assertFalse(response.data['has_more'])
+        self.assertEqual(
+            [task['id'] for task in first['updated']], [self.task_user_1.pk]
+        )
+        self.assertEqual(first['updated'][0]['status'], 'done')
+        self.assertEqual(
+            [
+                task['id']
+                for task in first['created'] + response.data['created']
+            ],
+            [created[0]['id']],
+        )
+        self.assertEqual(response.data['deleted'], [created[1]['id']])
+
+        response = self.client_user_1.get(sync_url, {'cursor': 'invalid'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sync_tombstones_pruned(self):
+        """
+        Тест удаления старых отметок об удалении задач.
+        Ожидаемый результат: команда удаляет отметки старше срока
+        хранения, курсор до удалённых отметок получает resync,
+        курсор после них и запрос без курсора работают как прежде.
+        """
+
+        sync_url = reverse('task-my-tasks-sync')
+        created = self.client_user_1.post(
+            reverse('task-bulk'),
+            data=[self.user_1_task_data, self.user_1_task_data],
+            format='json',
+        ).data
+        stale_cursor = self.client_user_1.get(sync_url).data['cursor']
+        self.client_user_1.delete(
+            reverse('task-detail', kwargs={'pk': created[0]['id']})
+        )
+        TaskTombstone.objects.update(
+            deleted_date=timezone.now() - timedelta(days=31)
+        )
+        cursor = self.client_user_1.get(
+            sync_url, {'cursor': stale_cursor}
+        ).data['cursor']
+        self.client_user_1.delete(
+            reverse('task-detail', kwargs={'pk': created[1]['id']})
+        )
+
+        output = StringIO()
+        call_command(
+            'prune_task_tombstones', days=30, batch_size=1, stdout=output
+        )
+        self.assertIn('задач: 1.', output.getvalue())
+        self.assertEqual(
+            list(TaskTombstone.objects.values_list('task_id', flat=True)),
+            [created[1]['id']],
+        )
+
+        response = self.client_user_1.get(sync_url, {'cursor': stale_cursor})
+        self.assertEqual(response.data, {'resync': True})
+        response = self.client_user_1.get(sync_url, {'cursor': cursor})
+        self.assertEqual(response.data['deleted'], [created[1]['id']])
+        response = self.client_user_1.get(sync_url)
+        self.assertEqual(
+            [task['id'] for task in response.data['created']],
+            [self.task_user_1.pk],
+        )
+
+    def test_status_change_notification_sent_after_commit(self):
+        """
+        Тест отложенной отправки уведомления о смене статуса.
+        Ожидаемый результат: уведомление ставится в очередь только
+        после фиксации транзакции.
+        """
+
+        with mock.patch('tasks.utils.dispatcher.enqueue') as enqueue:
+            with self.captureOnCommitCallbacks() as callbacks:
+                self.client_user_1.patch(
+                    self.task_user_1_detail_url, data={'status': 'done'}
+                )
+                enqueue.assert_not_called()
+            for callback in callbacks:
+                callback()
+        self.assertEqual(
+            [call.args[0] for call in enqueue.call_args_list],
+            [
+                user_group_name(self.user_1.pk),
+                task_group_name(self.task_user_1.pk),
+            ],
+        )
+        event = enqueue.call_args.args[1]
+        self.assertIn('с new на done', event['message'])
+
+    def test_notification_dispatcher_retries_failed_batch(self):
+        """
+        Тест повторной отправки пачки уведомлений.
+        Ожидаемый результат: после ошибки повторно отправляются только
+        неотправленные уведомления, в журнал пачка записывается один раз.
+        """
+
+        dispatcher = NotificationDispatcher(
+            queue_size=10, batch_size=10, max_retries=3, retry_delay=0
+        )
+        channel_layer = mock.Mock()
+        channel_layer.group_send = mock.AsyncMock(
+            side_effect=[None, ConnectionError, None]
+        )
+        batch = [('group', {'n': 1}), ('group', {'n': 2})]
+        with mock.patch(
+            'tasks.notifications.get_channel_layer',
+            return_value=channel_layer,
+        ), mock.patch.object(
+            notification_log, 'record'
+        ) as record, self.assertLogs('tasks.notifications', 'WARNING'):
+            self.assertTrue(dispatcher.send_batch(batch))
+        record.assert_called_once_with(batch)
+        self.assertEqual(
+            [call.args[1] for call in channel_layer.group_send.call_args_list],
+            [{'n': 1}, {'n': 2}, {'n': 2}],
+        )
+
+    def test_bulk_create_tasks(self):
+        """
+        Тест массового создания задач.
+        Ожидаемый результат: задачи создаются с кодом 201 CREATED
+        и принадлежат пользователю, сделавшему запрос.
+        """
+
+        response = self.client_user_1.post(
+            reverse('task-bulk'),
+            data=[self.user_1_task_data, self.user_1_task_data],
+            format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(Task.objects.filter(user=self.user_1).count(), 3)
+
+    def test_bulk_update_tasks(self):
+        """
+        Тест массового обновления задач.
+        Ожидаемый результат: статусы обновлены, владелец получает
+        одно общее уведомление.
+        """
+
+        other_task = Task.objects.create(
+            user=self.user_1, **self.user_1_task_data
+        )
+        data = [
+            {'id': self.task_user_1.pk, 'status': 'done'},
+            {'id': other_task.pk, 'status': 'in_progress'},
+        ]
+        with mock.patch('tasks.utils.dispatcher.enqueue') as enqueue:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client_user_1.patch(
+                    reverse('task-bulk'), data=data, format='json'
+                )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [task['status'] for task in response.data],
+            ['done', 'in_progress'],
+        )
+        user_events = [
+            call.args[1]
+            for call in enqueue.call_args_list
+            if call.args[0] == user_group_name(self.user_1.pk)
+        ]
+        self.assertEqual(len(user_events), 1)
+        self.assertEqual(len(user_events[0]['notifications']), 2)
+
+    def test_bulk_update_other_users_task(self):
+        """
+        Тест массового обновления с чужой задачей в списке.
+        Ожидаемый результат: возвращается код 403 FORBIDDEN,
+        ни одна задача не изменена.
+        """
+
+        data = [
+            {'id': self.task_user_1.pk, 'status': 'done'},
+            {'id': self.task_user_2.pk, 'status': 'done'},
+        ]
+        response = self.client_user_1.patch(
+            reverse('task-bulk'), data=data, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.task_user_1.refresh_from_db()
+        self.assertEqual(self.task_user_1.status, 'new')
+
+    def test_bulk_delete_tasks(self):
+        """
+        Тест массового удаления задач.
+        Ожидаемый результат: удаление с кодом 204 NO CONTENT.
+        """
+
+        response = self.client_user_1.delete(
+            reverse('task-bulk'), data=[self.task_user_1.pk], format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(
+            Task.objects.filter(pk=self.task_user_1.pk).exists()
+        )
+
+    def test_task_status_counters(self):
+        """
+        Тест счётчиков задач по статусам.
+        Ожидаемый результат: создание, изменение статуса и удаление задач
+        обновляют счётчики, общие счётчики пишутся в разные части,
+        сводка суммирует их и совпадает с таблицей задач.
+        """
+
+        self.assertEqual(len(rebuild_counters()), 4)
+        with mock.patch(
+            'tasks.counters.random.randrange', side_effect=cycle(range(4))
+        ):
+            self.client_user_1.post(
+                self.task_list_url, self.user_1_task_data, format='json'
+            )
+            self.client_user_1.post(
+                reverse('task-bulk'),
+                data=[self.user_1_task_data, self.user_1_task_data],
+                format='json',
+            )
+            self.client_user_1.patch(
+                self.task_user_1_detail_url, {'status': 'done'}, format='json'
+            )
+            self.client_user_1.delete(
+                reverse('task-bulk'),
+                data=list(
+                    Task.objects.filter(user=self.user_1, status='new')
+                    .values_list('pk', flat=True)[:2]
+                ),
+                format='json',
+            )
+
+        self.assertGreater(
+            TaskStatusCounter.objects.filter(user=None)
+            .values('shard')
+            .distinct()
+            .count(),
+            1,
+        )
+        self.assertEqual(rebuild_counters(dry_run=True), {})
+        with self.assertNumQueries(1):
+            response = self.client_user_1.get(reverse('task-summary'))
+        self.assertEqual(
+            response.data,
+            {
+                'global': {'new': 1, 'in_progress': 1, 'done': 1, 'total': 3},
+                'user': {'new': 1, 'in_progress': 0, 'done': 1, 'total': 2},
+            },
+        )
+        response = self.client.get(reverse('task-summary'))
+        self.assertEqual(list(response.data), ['global'])
+
+    def test_stale_task_counters(self):
+        """
+        Тест счётчиков при изменении и удалении устаревших объектов задач.
+        Ожидаемый результат: прежний статус берётся из строки в базе,
+        уже удалённая задача повторно не учитывается.
+        """
+
+        rebuild_counters()
+        stale = Task.objects.get(pk=self.task_user_1.pk)
+        self.client_user_1.patch(
+            self.task_user_1_detail_url, {'status': 'done'}, format='json'
+        )
+        serializer = TaskSerializer(
+            stale, data={'status': 'done'}, partial=True
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.assertEqual(rebuild_counters(dry_run=True), {})
+
+        stale = Task.objects.get(pk=self.task_user_1.pk)
+        self.client_user_1.delete(self.task_user_1_detail_url)
+        self.assertEqual(TaskViewSet.delete_tasks([stale]), [])
+        self.assertEqual(rebuild_counters(dry_run=True), {})
+        self.assertEqual(
+            TaskTombstone.objects.filter(task_id=stale.pk).count(), 1
+        )
+
+    def test_archive_done_tasks(self):
+        """
+        Тест архивирования старых выполненных задач.
+        Ожидаемый результат: задачи переносятся в архив пачками
+        и пропадают из списков, с include_archived читаются вместе
+        с задачами в том же порядке, счётчики не меняются.
+        """
+
+        old_tasks = Task.objects.bulk_create(
+            Task(
+                user=self.user_1,
+                title=f'Old Task {index}',
+                description='Old Task Description',
+                status='done',
+            )
+            for index in range(3)
+        )
+        for index, task in enumerate(old_tasks):
+            Task.objects.filter(pk=task.pk).update(
+                created_date=timezone.now() - timedelta(days=365 + index)
+            )
+        rebuild_counters()
+        summary = self.client_user_1.get(reverse('task-summary')).data
+
+        output = StringIO()
+        call_command('archive_tasks', batch_size=2, pause=0, stdout=output)
+        self.assertIn('перенесено: 3', output.getvalue())
+        self.assertEqual(
+            set(ArchivedTask.objects.values_list('pk', flat=True)),
+            {task.pk for task in old_tasks},
+        )
+        self.assertFalse(Task.objects.filter(status='done').exists())
+        self.assertEqual(rebuild_counters(dry_run=True), {})
+        self.assertEqual(
+            self.client_user_1.get(reverse('task-summary')).data, summary
+        )
+
+        response = self.client.get(self.task_list_url)
+        self.assertEqual(
+            [task['id'] for task in response.data['results']],
+            [self.task_user_2.pk, self.task_user_1.pk],
+        )
+        ids = []
+        url = f'{self.task_list_url}?include_archived=true&page_size=2'
+        while url:
+            response = self.client.get(url)
+            ids.extend(task['id'] for task in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(
+            ids,
+            [self.task_user_2.pk, self.task_user_1.pk]
+            + [task.pk for task in old_tasks],
+        )
+        response = self.client_user_1.get(
+            reverse('task-my-tasks'),
+            {'include_archived': 'true', 'status': 'done'},
+        )
+        self.assertEqual(
+            [task['id'] for task in response.data['results']],
+            [task.pk for task in old_tasks],
+        )
+
+        detail_url = reverse('task-detail', kwargs={'pk': old_tasks[0].pk})
+        response = self.client.get(detail_url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(detail_url, {'include_archived': 'true'})
+        self.assertEqual(response.data['title'], 'Old Task 0')
+        response = self.client_user_1.patch(
+            f'{detail_url}?include_archived=true',
+            {'status': 'new'},
+            format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_owner_snapshot(self):
+        """
+        Тест снимка автора в задачах.
+        Ожидаемый результат: список задач читается без соединения
+        с пользователями, снимок обновляется только после смены
+        имени или email, расхождения находит и исправляет
+        check_task_owners, при удалении пользователя снимок очищается.
+        """
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.task_list_url)
+        self.assertEqual(
+            response.data['results'][1]['user']['first_name'], 'Ivan'
+        )
+        self.assertFalse(
+            any('users_customuser' in query['sql'] for query in queries)
+        )
+
+        user = CustomUser.objects.get(pk=self.user_1.pk)
+        with mock.patch.object(owner_propagator, 'enqueue') as enqueue:
+            with self.captureOnCommitCallbacks(execute=True):
+                user.save(update_fields=['last_login'])
+                user.is_active = False
+                user.save()
+                user.is_active = True
+                user.save()
+            enqueue.assert_not_called()
+            user.first_name = 'Ivan Ivanov'
+            with self.captureOnCommitCallbacks(execute=True):
+                user.save()
+            enqueue.assert_called_once_with(user.pk)
+        self.assertEqual(propagate_owner(self.user_1.pk, batch_size=1), 1)
+        response = self.client.get(self.task_list_url)
+        self.assertEqual(
+            response.data['results'][1]['user']['first_name'], 'Ivan Ivanov'
+        )
+
+        Task.objects.filter(pk=self.task_user_1.pk).update(
+            owner_email='old@example.com'
+        )
+        self.assertEqual(find_owner_drift(), {self.user_1.pk: 1})
+        with self.assertRaises(CommandError):
+            call_command('check_task_owners', stdout=StringIO())
+        call_command('check_task_owners', fix=True, stdout=StringIO())
+        self.assertEqual(find_owner_drift(), {})
+
+        CustomUser.objects.get(pk=self.user_2.pk).delete()
+        task = Task.objects.get(pk=self.task_user_2.pk)
+        self.assertEqual((task.owner_first_name, task.owner_email), ('', ''))
+
+    @override_settings(
+        METRICS_ENABLED=True,
+        METRICS_TOKEN='metrics-token',
+        METRICS_SERVER_TIMING=True,
+    )
+    def test_request_metrics(self):
+        """
+        Тест сбора метрик запросов.
+        Ожидаемый результат: заголовок Server-Timing с количеством
+        SQL-запросов и гистограммы списка задач на странице метрик,
+        которая доступна только с токеном метрик. Выгрузка замеряется
+        вместе с запросами при формировании тела.
+        """
+
+        registry.reset()
+        response = self.client_user_1.get(self.task_list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('db;desc="1 queries"', response['Server-Timing'])
+        self.assertIn('total;dur=', response['Server-Timing'])
+        response = self.client_user_1.get(reverse('task-export'))
+        self.assertNotIn('Server-Timing', response)
+
+        async def read_content():
+            return [chunk async for chunk in response.streaming_content]
+
+        self.assertTrue(async_to_sync(read_content)())
+
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get(
+            reverse('metrics'),
+            headers={'Authorization': 'Bearer metrics-token'},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        content = response.content.decode()
+        labels = 'method="GET",view="task-list"'
+        self.assertIn(
+            f'http_request_db_queries_bucket{{{labels},le="1"}} 1', content
+        )
+        self.assertIn(
+            f'http_request_duration_seconds_count{{{labels}}} 1', content
+        )
+        self.assertIn(
+            f'http_request_cache_misses_total{{{labels}}} 1', content
+        )
+        labels = 'method="GET",view="task-export"'
+        self.assertIn(
+            f'http_request_duration_seconds_count{{{labels}}} 1', content
+        )
+        self.assertIn(
+            f'http_request_db_queries_bucket{{{labels},le="0"}} 0', content
+        )
+        # Метрики пула есть только у бэкенда config.db_pool с пулом.
+        if any(alias == 'default' for alias, _, _ in get_pools()):
+            self.assertIn(
+                'db_pool_wait_seconds_count{alias="default"', content
+            )
+
+    def test_connection_pool(self):
+        """
+        Тест пула соединений.
+        Ожидаемый результат: возвращённое соединение выдаётся повторно,
+        при исчерпании пула запрос соединения завершается ошибкой
+        по таймауту, сломанное соединение закрывается.
+        """
+
+        connection = mock.Mock(closed=False)
+        connection.info.transaction_status = 0
+        pool = ConnectionPool(
+            max_size=1, timeout=0.01, health_check_interval=60
+        )
+
+        self.assertIs(pool.getconn(lambda: connection), connection)
+        with self.assertRaises(OperationalError):
+            pool.getconn(mock.Mock)
+        pool.putconn(connection)
+        self.assertEqual(pool.get_stats()['idle'], 1)
+        self.assertIs(pool.getconn(mock.Mock), connection)
+
+        pool.putconn(connection, discard=True)
+        connection.close.assert_called_once()
+        self.assertEqual(pool.get_stats()['size'], 0)
+        self.assertEqual(pool.wait_histogram.count, 2)
+        self.assertEqual(pool.get_stats()['timeouts'], 1)
+
+    def test_connection_pool_health_check_unlocked(self):
+        """
+        Тест проверки простаивающего соединения.
+        Ожидаемый результат: SELECT 1 выполняется без блокировки пула,
+        сломанное соединение закрывается и заменяется новым.
+        """
+
+        pool = ConnectionPool(max_size=1, timeout=1, health_check_interval=0)
+        stats = []
+
+        def execute(sql):
+            thread = threading.Thread(
+                target=lambda: stats.append(pool.get_stats())
+            )
+            thread.start()
+            thread.join(1)
+            raise OperationalError('connection lost')
+
+        stale = mock.MagicMock(closed=False)
+        stale.info.transaction_status = 0
+        stale.cursor.return_value.__enter__.return_value.execute = execute
+        fresh = mock.Mock(closed=False)
+        pool.getconn(lambda: stale)
+        pool.putconn(stale)
+
+        self.assertIs(pool.getconn(lambda: fresh), fresh)
+        self.assertEqual(len(stats), 1)
+        stale.close.assert_called_once()
+        self.assertEqual(pool.get_stats()['size'], 1)
+
+    def test_read_serializer_matches_task_serializer(self):
+        """
+        Тест совпадения быстрого сериализатора списков с TaskSerializer.
+        Ожидаемый результат: одинаковое представление задач, в том числе
+        обновлённых и без автора.
+        """
+
+        self.task_user_2.last_updated_date = timezone.now()
+        self.task_user_2.save()
+        Task.objects.create(user=None, **self.user_1_task_data)
+        queryset = Task.objects.select_related('user')
+
+        rows = TaskReadSerializer.get_rows(queryset)
+
+        self.assertEqual(
+            json.dumps(TaskReadSerializer.many(rows)),
+            json.dumps(TaskSerializer(queryset, many=True).data),
+        )
+
+    async def test_async_read_views(self):
+        """
+        Тест асинхронных списка задач, задачи и списка своих задач.
+        Ожидаемый результат: ответы совпадают с синхронным сериализатором,
+        несуществующая задача возвращает 404.
+        """
+
+        token = await Token.objects.acreate(user=self.user_1)
+        headers = {'Authorization': f'Token {token.key}'}
+
+        response = await self.async_client.get(self.task_list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()['results']), 2)
+
+        response = await self.async_client.get(self.task_user_1_detail_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json(), TaskSerializer(self.task_user_1).data
+        )
+
+        response = await self.async_client.get(
+            reverse('task-detail', kwargs={'pk': 0})
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = await self.async_client.get(
+            reverse('task-my-tasks'), headers=headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [task['id'] for task in response.json()['results']],
+            [self.task_user_1.pk],
+        )
+
+    async def test_export_tasks_ndjson(self):
+        """
+        Тест потоковой выгрузки задач в NDJSON с фильтром по статусу.
+        Ожидаемый результат: по одной строке JSON на каждую подходящую
+        задачу.
+        """
+
+        response = await self.async_client.get(
+            reverse('task-export'), {'status': 'new'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        content = b''.join(
+            [chunk async for chunk in response.streaming_content]
+        )
+        rows = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEqual([row['id'] for row in rows], [self.task_user_1.pk])
+        self.assertEqual(rows[0]['user_email'], self.user_1.email)
+
+    async def test_export_tasks_csv(self):
+        """
+        Тест потоковой выгрузки задач в CSV.
+        Ожидаемый результат: заголовок и по строке на каждую задачу.
+        """
+
+        response = await self.async_client.get(
+            reverse('task-export'), {'export_format': 'csv'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        content = b''.join(
+            [chunk async for chunk in response.streaming_content]
+        )
+        rows = list(csv.reader(content.decode().splitlines()))
+        self.assertEqual(rows[0][0], 'id')
+        self.assertEqual(len(rows), 3)
+
+
+@override_settings(
+    CHANNEL_LAYERS={
+        'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}
+    }
+)
+class NotificationConsumerTestCase(TransactionTestCase):
+
+    def setUp(self):
+        self.owner = CustomUser.objects.create_user(
+            first_name='Ivan', email='ivan@example.com', password='ivan1970'
+        )
+        self.subscriber = CustomUser.objects.create_user(
+            first_name='Petr', email='petr@example.com', password='petr1980'
+        )
+        self.owner_token = Token.objects.create(user=self.owner)
+        self.subscriber_token = Token.objects.create(user=self.subscriber)
+        self.task = Task.objects.create(
+            user=self.owner, title='Test Task', description='Description'
+        )
+        notification_log.client.delete(LOG_KEY.format(user_id=self.owner.pk))
+
+    def get_communicator(self, query='', subprotocols=None):
+        application = TokenAuthMiddleware(URLRouter(websocket_urlpatterns))
+        return WebsocketCommunicator(
+            application,
+            f'api/ws/notification/?{query}',
+            subprotocols=subprotocols,
+        )
+
+    async def send_task_event(self, scope):
+        group_name = (
+            user_group_name(self.owner.pk)
+            if scope == 'user'
+            else task_group_name(self.task.pk)
+        )
+        await get_channel_layer().group_send(
+            group_name,
+            {
+                'type': 'send_notification',
+                'scope': scope,
+                'task_id': self.task.pk,
+                'user_id': self.owner.pk,
+                'message': 'Изменился статус задачи',
+            },
+        )
+
+    async def test_connect_without_token(self):
+        """
+        Тест подключения без токена.
+        Ожидаемый результат: соединение отклоняется.
+        """
+
+        communicator = self.get_communicator()
+        connected, _ = await communicator.connect()
+        self.assertFalse(connected)
+
+    async def test_owner_receives_own_task_notifications(self):
+        """
+        Тест получения уведомлений владельцем задачи по подпротоколу.
+        Ожидаемый результат: уведомление приходит один раз, несмотря на
+        подписку на задачу.
+        """
+
+        communicator = self.get_communicator(
+            query=f'tasks={self.task.pk}',
+            subprotocols=['token', self.owner_token.key],
+        )
+        connected, subprotocol = await communicator.connect()
+        self.assertTrue(connected)
+        self.assertEqual(subprotocol, 'token')
+
+        await self.send_task_event('user')
+        await self.send_task_event('task')
+        response = await communicator.receive_json_from()
+        self.assertEqual(response['task_id'], self.task.pk)
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+    async def test_notifications_only_for_subscribed_tasks(self):
+        """
+        Тест получения уведомлений о чужих задачах.
+        Ожидаемый результат: уведомления приходят только после подписки
+        на задачу.
+        """
+
+        communicator = self.get_communicator(
+            query=f'token={self.subscriber_token.key}'
+        )
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        await self.send_task_event('task')
+        self.assertTrue(await communicator.receive_nothing())
+
+        await communicator.send_json_to(
+            {'action': 'subscribe', 'task_id': self.task.pk}
+        )
+        await communicator.receive_nothing()
+        await self.send_task_event('task')
+        response = await communicator.receive_json_from()
+        self.assertEqual(response['task_id'], self.task.pk)
+        await communicator.disconnect()
+
+    async def send_user_notifications(self, *notifications):
+        await get_channel_layer().group_send(
+            user_group_name(self.owner.pk),
+            {
+                'type': 'send_notifications',
+                'notifications': [
+                    {'task_id': task_id, 'message': message}
+                    for task_id, message in notifications
+                ],
+            },
+        )
+
+    async def connect_owner(self, query=''):
+        communicator = self.get_communicator(
+            query=f'token={self.owner_token.key}&{query}'
+        )
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def test_notifications_coalesced_into_batch(self):
+        """
+        Тест объединения уведомлений в исходящей очереди соединения.
+        Ожидаемый результат: уведомления приходят одним кадром,
+        из нескольких уведомлений об одной задаче остаётся последнее.
+        """
+
+        communicator = await self.connect_owner()
+        stats = outbound_stats.get_stats()
+        await self.send_user_notifications(
+            (self.task.pk, 'new -> in_progress'), (0, 'new -> done')
+        )
+        await self.send_user_notifications(
+            (self.task.pk, 'in_progress -> done')
+        )
+        response = await communicator.receive_json_from()
+        self.assertEqual(
+            response['notifications'],
+            [
+                {'task_id': 0, 'message': 'new -> done'},
+                {'task_id': self.task.pk, 'message': 'in_progress -> done'},
+            ],
+        )
+        self.assertTrue(await communicator.receive_nothing())
+        new_stats = outbound_stats.get_stats()
+        self.assertEqual(new_stats['coalesced'], stats['coalesced'] + 1)
+        self.assertEqual(new_stats['queued'], stats['queued'])
+        await communicator.disconnect()
+
+    @override_settings(NOTIFICATIONS_CONNECTION_QUEUE_SIZE=1)
+    async def test_outbound_queue_overflow(self):
+        """
+        Тест переполнения исходящей очереди соединения.
+        Ожидаемый результат: при NOTIFICATIONS_OVERFLOW=drop лишние
+        уведомления отбрасываются, при disconnect клиент отключается.
+        """
+
+        communicator = await self.connect_owner()
+        stats = outbound_stats.get_stats()
+        await self.send_user_notifications((1, 'first'), (2, 'second'))
+        response = await communicator.receive_json_from()
+        self.assertEqual(response, {'task_id': 1, 'message': 'first'})
+        self.assertEqual(
+            outbound_stats.get_stats()['dropped'], stats['dropped'] + 1
+        )
+        await communicator.disconnect()
+
+        communicator = await self.connect_owner()
+        with override_settings(NOTIFICATIONS_OVERFLOW='disconnect'):
+            await self.send_user_notifications((1, 'first'), (2, 'second'))
+            output = await communicator.receive_output()
+        self.assertEqual(output['type'], 'websocket.close')
+        self.assertEqual(output['code'], 1013)
+        self.assertEqual(
+            outbound_stats.get_stats()['disconnected'],
+            stats['disconnected'] + 1,
+        )
+
+    def connect_slow_owner(self, transport):
+        """
+        Подключает владельца через send в виде daphne:
+        partial(handle_reply, протокол) с транспортом transport.
+        Кадры копятся в буфере транспорта, пока тест его не очистит.
+        """
+
+        async def write_frame(protocol, message):
+            if message['type'] == 'websocket.send':
+                protocol.transport.dataBuffer += message['text'].encode()
+            await protocol.send(message)
+
+        inner = TokenAuthMiddleware(URLRouter(websocket_urlpatterns))
+
+        async def application(scope, receive, send):
+            protocol = SimpleNamespace(transport=transport, send=send)
+            await inner(scope, receive, partial(write_frame, protocol))
+
+        return WebsocketCommunicator(
+            application,
+            f'api/ws/notification/?token={self.owner_token.key}',
+        )
+
+    @override_settings(NOTIFICATIONS_CONNECTION_BUFFER_SIZE=10)
+    async def test_slow_client_not_flushed(self):
+        """
+        Тест клиента, который перестал читать.
+        Ожидаемый результат: пока буфер соединения переполнен, кадры
+        не отправляются и уведомления остаются в очереди, после
+        чтения клиентом отправляются, при disconnect клиент
+        с переполненным буфером отключается с кодом 1013.
+        """
+
+        transport = SimpleNamespace(dataBuffer=b'', offset=0)
+        communicator = self.connect_slow_owner(transport)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        stats = outbound_stats.get_stats()
+        await self.send_user_notifications((1, 'first'))
+        self.assertEqual(
+            await communicator.receive_json_from(),
+            {'task_id': 1, 'message': 'first'},
+        )
+
+        await self.send_user_notifications((2, 'second'))
+        self.assertTrue(await communicator.receive_nothing())
+        self.assertEqual(
+            outbound_stats.get_stats()['queued'], stats['queued'] + 1
+        )
+        transport.dataBuffer = b''
+        self.assertEqual(
+            await communicator.receive_json_from(),
+            {'task_id': 2, 'message': 'second'},
+        )
+        self.assertEqual(outbound_stats.get_stats()['queued'], stats['queued'])
+
+        with override_settings(NOTIFICATIONS_OVERFLOW='disconnect'):
+            await self.send_user_notifications((3, 'third'))
+            output = await communicator.receive_output()
+        self.assertEqual(output['type'], 'websocket.close')
+        self.assertEqual(output['code'], 1013)
+        self.assertEqual(
+            outbound_stats.get_stats()['disconnected'],
+            stats['disconnected'] + 1,
+        )
+
+    async def record_user_notifications(self, *batches):
+        """
+        Записывает пачки уведомлений владельца в журнал.
+        Возвращает события групп и уведомления с id.
+        """
+
+        events = [
+            (
+                user_group_name(self.owner.pk),
+                {
+                    'type': 'send_notifications',
+                    'user_id': self.owner.pk,
+                    'notifications': [
+                        {'task_id': task_id, 'message': message}
+                        for task_id, message in notifications
+                    ],
+                },
+            )
+            for notifications in batches
+        ]
+        await sync_to_async(notification_log.record)(events)
+        return events, [
+            notification
+            for _, event in events
+            for notification in event['notifications']
+        ]
+
+    async def test_missed_notifications_replayed(self):
+        """
+        Тест переподключения с last_seen_id.
+        Ожидаемый результат: приходят только уведомления после
+        last_seen_id, без повторов уже прочитанных из журнала,
+        при неизвестном last_seen_id приходит кадр resync.
+        """
+
+        events, (first, second, third) = await self.record_user_notifications(
+            [(1, 'first')], [(2, 'second'), (3, 'third')]
+        )
+
+        communicator = await self.connect_owner(
+            f'last_seen_id={first["id"]}'
+        )
+        await get_channel_layer().group_send(*events[1])
+        response = await communicator.receive_json_from()
+        self.assertEqual(response['notifications'], [second, third])
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+        communicator = await self.connect_owner('last_seen_id=1-0')
+        self.assertEqual(
+            await communicator.receive_json_from(), {'resync': True}
+        )
+        await communicator.disconnect()
+
+    async def test_notification_stream(self):
+        """
+        Тест потока Server-Sent Events с токеном в параметре запроса.
+        Ожидаемый результат: сначала приходят пропущенные после
+        Last-Event-ID уведомления из журнала, затем новые, каждое
+        уведомление - отдельное событие.
+        """
+
+        _, (first, second) = await self.record_user_notifications(
+            [(1, 'first')], [(2, 'second')]
+        )
+        response = await AsyncClient().get(
+            reverse('notification-stream'),
+            {'token': self.owner_token.key},
+            headers={'Last-Event-ID': first['id']},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        content = response.streaming_content
+        self.assertEqual(await anext(content), b': connected\n\n')
+        event_id, data, *_ = (await anext(content)).decode().split('\n')
+        self.assertEqual(event_id, f'id: {second["id"]}')
+        self.assertEqual(json.loads(data.removeprefix('data: ')), second)
+
+        await self.send_user_notifications((1, 'third'), (2, 'fourth'))
+        self.assertEqual(
+            await anext(content),
+            b'data: {"task_id":1,"message":"third"}\n\n'
+            b'data: {"task_id":2,"message":"fourth"}\n\n',
+        )
+        await content.aclose()
+
+    async def test_notification_long_poll(self):
+        """
+        Тест долгого опроса уведомлений.
+        Ожидаемый результат: пропущенные уведомления возвращаются сразу,
+        новые - как только приходят, без уведомлений ответ пустой после
+        timeout, без токена запрос отклоняется.
+        """
+
+        url = reverse('notification-poll')
+        client = AsyncClient()
+        self.assertEqual(
+            (await client.get(url)).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+        headers = {'Authorization': f'Token {self.owner_token.key}'}
+        _, (first, second) = await self.record_user_notifications(
+            [(1, 'first')], [(2, 'second')]
+        )
+        response = await client.get(
+            url, {'last_seen_id': first['id']}, headers=headers
+        )
+        self.assertEqual(response.json(), {'notifications': [second]})
+        response = await client.get(
+            url, {'last_seen_id': '1-0'}, headers=headers
+        )
+        self.assertEqual(response.json(), {'resync': True})
+        response = await client.get(url, {'timeout': 0}, headers=headers)
+        self.assertEqual(response.json(), {'notifications': []})
+
+        poll = asyncio.create_task(
+            client.get(
+                url,
+                {'tasks': self.task.pk, 'timeout': 5},
+                headers={
+                    'Authorization': f'Token {self.subscriber_token.key}'
+                },
+            )
+        )
+        channel_layer = get_channel_layer()
+        while not channel_layer.groups.get(task_group_name(self.task.pk)):
+            await asyncio.sleep(0.01)
+        await self.send_task_event('task')
+        response = await poll
+        self.assertEqual(
+            response.json(),
+            {
+                'notifications': [
+                    {
+                        'task_id': self.task.pk,
+                        'message': 'Изменился статус задачи',
+                    }
+                ]
+            },
+        )
+
+
+@override_settings(DB_READ_REPLICAS=['replica_1'])
+class ReplicaRoutingTestCase(TransactionTestCase):
+    databases = {'default', 'replica_1'}
+
+    def setUp(self):
+        cache.clear()
+        lag_monitor.reset()
+        self.user = CustomUser.objects.create_user(
+            first_name='Ivan', email='ivan@example.com', password='ivan1970'
+        )
+        self.task = Task.objects.create(
+            user=self.user, title='Test Task', description='Description'
+        )
+        self.detail_url = reverse('task-detail', kwargs={'pk': self.task.pk})
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def count_queries(self, method, *args, **kwargs):
+        """Выполняет запрос и считает SQL-запросы к основной базе и реплике."""
+
+        with CaptureQueriesContext(
+            connections['default']
+        ) as primary, CaptureQueriesContext(
+            connections['replica_1']
+        ) as replica:
+            response = getattr(self.client, method)(*args, **kwargs)
+        return response, len(primary), len(replica)
+
+    def test_safe_requests_read_from_replica(self):
+        """
+        Тест чтения с реплики.
+        Ожидаемый результат: получение задачи читает с реплики,
+        после записи пользователь читает с основной базы.
+        """
+
+        response, primary, replica = self.count_queries(
+            'get', self.detail_url
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+        response, primary, replica = self.count_queries(
+            'patch', self.detail_url, {'status': 'done'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(replica, 0)
+
+        response, primary, replica = self.count_queries(
+            'get', self.detail_url
+        )
+        self.assertEqual(response.data['status'], 'done')
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    @override_settings(DB_REPLICA_MAX_LAG=2, TASKS_CACHE_TIMEOUT=3600)
+    def test_replica_responses_cached_briefly(self):
+        """
+        Тест кэширования ответов, прочитанных с реплики.
+        Ожидаемый результат: список с реплики кэшируется
+        не дольше DB_REPLICA_MAX_LAG, с основной базы - на полный TTL.
+        """
+
+        url = reverse('task-list')
+        with mock.patch.object(
+            async_cache, 'set', wraps=async_cache.set
+        ) as cache_set:
+            _, primary, replica = self.count_queries('get', url)
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+        self.assertEqual(cache_set.call_args.args[2], 2)
+
+        self.client.patch(self.detail_url, {'status': 'done'}, format='json')
+        with mock.patch.object(
+            async_cache, 'set', wraps=async_cache.set
+        ) as cache_set:
+            _, primary, replica = self.count_queries('get', url)
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+        self.assertEqual(cache_set.call_args.args[2], 3600)
+
+    def test_lagging_replica_not_used(self):
+        """
+        Тест отставания реплики.
+        Ожидаемый результат: при отставании больше DB_REPLICA_MAX_LAG
+        чтение идёт с основной базы.
+        """
+
+        with mock.patch.object(
+            lag_monitor, 'measure', return_value=60.0
+        ) as measure:
+            _, primary, replica = self.count_queries('get', self.detail_url)
+            self.count_queries('get', self.detail_url)
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+        measure.assert_called_once_with('replica_1')
+
+    def test_registration_lookup_reads_from_replica(self):
+        """
+        Тест проверки email при регистрации.
+        Ожидаемый результат: занятость email проверяется на реплике,
+        пользователь создаётся на основной базе.
+        """
+
+        data = {
+            'first_name': 'Petr',
+            'email': 'petr@example.com',
+            'password': 'petr1980',
+        }
+        response, primary, replica = self.count_queries(
+            'post', reverse('register'), data
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertGreater(primary, 0)
+        self.assertGreater(replica, 0)
+
+        response, primary, replica = self.count_queries(
+            'post', reverse('register'), data
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual((primary, replica), (0, 1))
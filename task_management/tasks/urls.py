@@ -1,9 +1,15 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import TaskViewSet
+from .views import NotificationViewSet, TaskViewSet, metrics
 
 router = DefaultRouter()
 router.register('tasks', TaskViewSet, basename='task')
+router.register(
+    'notifications', NotificationViewSet, basename='notification'
+)
 
-urlpatterns = [path('', include(router.urls))]
+urlpatterns = [
+    path('', include(router.urls)),
+    path('metrics/', metrics, name='metrics'),
+]
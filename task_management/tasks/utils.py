@@ -1,22 +1,66 @@
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
+from django.db import transaction
 
-from .consumers import GROUP_NAME
+from .consumers import task_group_name, user_group_name
+from .notifications import dispatcher
 
 
-def send_task_status_change_notification(task, new_status):
+def send_tasks_status_change_notification(changes):
     """
-    Отправляет уведомление об изменении статуса задачи через каналы Django.
-    Получает задачу и новый статус в качестве аргументов и отправляет сообщение
-    с информацией об изменении статуса в группу 'GROUP_NAME'.
+    Отправляет уведомления об изменении статуса нескольких задач.
+    Получает список пар (задача с уже изменённым статусом, прежний статус).
+    Уведомления ставятся в очередь фоновой отправки только после фиксации
+    текущей транзакции. Владелец получает одно событие со всеми своими
+    изменениями, подписчики задачи — событие об этой задаче.
     """
 
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
-        GROUP_NAME,
+    notifications = [
         {
-            'type': 'send_notification',
+            'task_id': task.pk,
+            'user_id': task.user_id,
             'message': f'Изменился статус задачи {task.title} '
-            f'с {task.status} на {new_status}',
-        },
-    )
+            f'с {old_status} на {task.status}',
+        }
+        for task, old_status in changes
+    ]
+    if not notifications:
+        return
+
+    def enqueue():
+        by_user = {}
+        for notification in notifications:
+            if notification['user_id'] is not None:
+                by_user.setdefault(notification['user_id'], []).append(
+                    notification
+                )
+        for user_id, user_notifications in by_user.items():
+            if len(user_notifications) == 1:
+                event = {
+                    'type': 'send_notification',
+                    'scope': 'user',
+                    **user_notifications[0],
+                }
+            else:
+                event = {
+                    'type': 'send_notifications',
+                    'user_id': user_id,
+                    'notifications': user_notifications,
+                }
+            dispatcher.enqueue(user_group_name(user_id), event)
+        for notification in notifications:
+            dispatcher.enqueue(
+                task_group_name(notification['task_id']),
+                {'type': 'send_notification', 'scope': 'task', **notification},
+            )
+
+    transaction.on_commit(enqueue)
+
+
+def send_task_status_change_notification(task, old_status):
+    """
+    Отправляет уведомление об изменении статуса задачи через каналы Django.
+    Получает задачу с уже изменённым статусом и предыдущий статус.
+    Уведомление публикуется в группу владельца задачи и в группу
+    подписчиков этой задачи.
+    """
+
+    send_tasks_status_change_notification([(task, old_status)])
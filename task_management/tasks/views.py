@@ -1,28 +1,89 @@
-from django.core.cache import cache
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
+import hmac
+import math
+
+from django.conf import settings
+from django.db import transaction
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseForbidden,
+    StreamingHttpResponse,
+)
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_spectacular.utils import extend_schema_view, extend_schema
-from rest_framework import viewsets
+from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
 
+from config.db_pool.metrics import get_pool_metrics
+from config.db_router import mark_recent_write, use_replica
+from users.authentication import (
+    CachedTokenAuthentication,
+    QueryTokenAuthentication,
+)
+from users.cache import token_user_cache
+from users.hashing import hashing_pool
+from .cache import cache_response, invalidate_task_caches
+from .consumers import outbound_stats
+from .counters import count_deleted_tasks, get_status_summary, lock_tasks
+from .export import EXPORT_FORMATS, stream_export
 from .filters import TaskFilter
-from .models import Task
+from .metrics import registry
+from .mixins import AsyncViewSetMixin
+from .models import ArchivedTask, Task
+from .notifications import dispatcher
+from .owners import owner_propagator
+from .pagination import TaskCursorPagination
 from .permissions import OwnerOrReadOnly
-from .schemas import task_schema
-from .serializers import TaskSerializer
+from .renderers import (
+    EventStreamRenderer,
+    MessagePackRenderer,
+    ORJSONRenderer,
+    render_event,
+)
+from .schemas import (
+    notification_schema,
+    task_bulk_destroy_schema,
+    task_bulk_update_schema,
+    task_schema,
+)
+from .serializers import TaskReadSerializer, TaskSerializer
+from .subscriptions import NotificationSubscription, coalesce, parse_task_ids
+from .sync import (
+    InvalidSyncCursor,
+    decode_sync_cursor,
+    encode_sync_cursor,
+    get_changes,
+    is_cursor_expired,
+    record_deleted,
+)
 
 
 @extend_schema(tags=['Задачи'])
 @extend_schema_view(**task_schema)
-class TaskViewSet(viewsets.ModelViewSet):
+class TaskViewSet(AsyncViewSetMixin, viewsets.ModelViewSet):
     """
     Вьюсет для работы с задачами.
     Создание, чтение, обновление и удаление задач.
     Фильтрация задач по статусу и дате создания.
-    Кэширует список задач до момента их изменения.
+    Списки задач разбиваются на страницы по курсору и сериализуются
+    быстрым TaskReadSerializer.
+    Кэширует списки задач до момента их изменения, списки задач
+    текущего пользователя кэшируются отдельно для каждого пользователя.
+    Массовые создание, обновление и удаление задач через tasks/bulk/.
+    Потоковая выгрузка задач в NDJSON или CSV через tasks/export/.
+    Количество задач по статусам через tasks/summary/ читается
+    из материализованных счётчиков.
+    Изменения своих задач после курсора через tasks/my-tasks/sync/.
+    Списки и получение задачи обрабатываются асинхронно
+    через асинхронный ORM и кэш.
+    Чтения безопасных запросов идут на реплики, если они настроены.
+    Ответы рендерятся в JSON через orjson или в MessagePack.
+    С include_archived=true списки и получение задачи читают
+    также архивные задачи.
     """
 
     queryset = Task.objects.select_related('user')
@@ -30,33 +91,97 @@ class TaskViewSet(viewsets.ModelViewSet):
     permission_classes = (OwnerOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = TaskFilter
+    pagination_class = TaskCursorPagination
     http_method_names = ['get', 'post', 'patch', 'delete']
+    renderer_classes = (
+        ORJSONRenderer,
+        MessagePackRenderer,
+        BrowsableAPIRenderer,
+    )
+    archived_query_param = 'include_archived'
 
-    @method_decorator(cache_page(60 * 60))
-    def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
+    def initial(self, request, *args, **kwargs):
+        """
+        После аутентификации направляет чтения безопасных запросов
+        на реплику, кроме запросов пользователя сразу после его записи.
+        """
 
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS:
+            use_replica(request.user.pk)
 
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+    def include_archived(self):
+        value = self.request.query_params.get(self.archived_query_param, '')
+        return value.lower() in ('1', 'true')
+
+    def get_archived_rows(self, **filters):
+        """
+        Строки архивных задач с теми же фильтрами, что и задачи,
+        или None, если архив не запрошен.
+        """
+
+        if not self.include_archived():
+            return None
+        filterset = TaskFilter(
+            self.request.query_params,
+            queryset=ArchivedTask.objects.filter(**filters),
+            request=self.request,
+        )
+        return TaskReadSerializer.get_rows(filterset.qs)
+
+    async def aget_archived_object(self):
+        try:
+            return await ArchivedTask.objects.select_related('user').aget(
+                pk=self.kwargs['pk']
+            )
+        except (ArchivedTask.DoesNotExist, TypeError, ValueError):
+            raise Http404
+
+    def get_page_response(self, page):
+        """
+        Ответ со страницей задач, при envelope=users - с авторами
+        задач отдельным списком.
+        """
+
+        if self.paginator.use_users_envelope(self.request):
+            tasks, users = TaskReadSerializer.many_with_users(page)
+            return self.paginator.get_paginated_response(tasks, users)
+        return self.get_paginated_response(TaskReadSerializer.many(page))
+
+    @cache_response()
+    async def list(self, request, *args, **kwargs):
+        rows = TaskReadSerializer.get_rows(
+            self.filter_queryset(self.get_queryset())
+        )
+        page = await self.paginator.apaginate_queryset(
+            rows, request, self, archived=self.get_archived_rows()
+        )
+        return self.get_page_response(page)
+
+    async def retrieve(self, request, *args, **kwargs):
+        try:
+            task = await self.aget_object()
+        except Http404:
+            if not self.include_archived():
+                raise
+            task = await self.aget_archived_object()
+        return Response(self.get_serializer(task).data)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
-        cache.clear()
+        invalidate_task_caches(self.request.user.pk)
+        mark_recent_write(self.request.user.pk)
 
     def perform_update(self, serializer):
-        serializer.save()
-        cache.clear()
+        task = serializer.save()
+        invalidate_task_caches(task.user_id)
+        mark_recent_write(self.request.user.pk)
 
     def perform_destroy(self, instance):
-        instance.delete()
-        cache.clear()
+        self.delete_tasks([instance])
+        invalidate_task_caches(instance.user_id)
+        mark_recent_write(self.request.user.pk)
 
-    @method_decorator(cache_page(60 * 60))
     @action(
         detail=False,
         methods=['get'],
@@ -66,8 +191,403 @@ class TaskViewSet(viewsets.ModelViewSet):
         filter_backends=(DjangoFilterBackend,),
         filterset_class=TaskFilter,
     )
-    def current_user_tasks(self, request):
-        filtered_queryset = self.filter_queryset(self.queryset)
-        user_tasks = filtered_queryset.filter(user=request.user)
-        serializer = self.get_serializer(user_tasks, many=True)
+    @cache_response(per_user=True)
+    async def current_user_tasks(self, request):
+        user_tasks = self.filter_queryset(self.get_queryset()).filter(
+            user=request.user
+        )
+        page = await self.paginator.apaginate_queryset(
+            TaskReadSerializer.get_rows(user_tasks),
+            request,
+            self,
+            archived=self.get_archived_rows(user=request.user),
+        )
+        return self.get_page_response(page)
+
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path='summary',
+        url_name='summary',
+        filter_backends=(),
+        pagination_class=None,
+    )
+    def summary(self, request):
+        return Response(get_status_summary(request.user))
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=(IsAuthenticated,),
+        url_path='my-tasks/sync',
+        url_name='my-tasks-sync',
+        filter_backends=(),
+        pagination_class=None,
+    )
+    def sync(self, request):
+        """
+        Изменения задач текущего пользователя после курсора:
+        созданные и изменённые задачи целиком и id удалённых.
+        Если отметки об удалении после курсора уже не хранятся,
+        возвращает {"resync": true}: нужна синхронизация без курсора.
+        """
+
+        try:
+            position = decode_sync_cursor(request.query_params.get('cursor'))
+        except InvalidSyncCursor:
+            raise ValidationError({'cursor': 'Неверный курсор.'})
+        if is_cursor_expired(request.user, position):
+            return Response({'resync': True})
+        changes, has_more = get_changes(
+            request.user,
+            position,
+            settings.TASKS_SYNC_BATCH_SIZE,
+            TaskReadSerializer.get_rows,
+        )
+        created, updated, deleted = [], [], []
+        for change_position, row in changes:
+            if row is None:
+                deleted.append(change_position[1])
+            elif (row['row_created_version'], row['id']) > position:
+                created.append(row)
+            else:
+                updated.append(row)
+        if changes:
+            position = changes[-1][0]
+        return Response(
+            {
+                'cursor': encode_sync_cursor(position),
+                'has_more': has_more,
+                'created': TaskReadSerializer.many(created),
+                'updated': TaskReadSerializer.many(updated),
+                'deleted': deleted,
+            }
+        )
+
+    @staticmethod
+    def delete_tasks(tasks):
+        """
+        Удаляет задачи, учитывает их в счётчиках и сохраняет отметки
+        об удалении. Строки блокируются перед удалением, поэтому
+        задачи, уже удалённые параллельным запросом, не учитываются
+        повторно. Возвращает удалённые задачи.
+        """
+
+        with transaction.atomic():
+            tasks = lock_tasks(tasks)
+            Task.objects.filter(pk__in=[task.pk for task in tasks]).delete()
+            record_deleted(tasks)
+            count_deleted_tasks(tasks)
+        return tasks
+
+    def get_bulk_tasks(self, ids):
+        """
+        Возвращает задачи по списку id в том же порядке одним запросом
+        и проверяет права пользователя на каждую из них.
+        """
+
+        if not isinstance(ids, list) or not all(
+            isinstance(pk, int) and not isinstance(pk, bool) for pk in ids
+        ):
+            raise ValidationError('Ожидается список идентификаторов задач.')
+        if not ids or len(ids) > settings.TASKS_BULK_MAX_SIZE:
+            raise ValidationError(
+                'Количество задач должно быть от 1 до '
+                f'{settings.TASKS_BULK_MAX_SIZE}.'
+            )
+        if len(set(ids)) != len(ids):
+            raise ValidationError('Идентификаторы задач повторяются.')
+
+        tasks = self.get_queryset().in_bulk(ids)
+        missing = [pk for pk in ids if pk not in tasks]
+        if missing:
+            raise NotFound(f'Задачи не найдены: {missing}.')
+        for task in tasks.values():
+            self.check_object_permissions(self.request, task)
+        return [tasks[pk] for pk in ids]
+
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='bulk',
+        url_name='bulk',
+        filter_backends=(),
+        pagination_class=None,
+    )
+    def bulk_create(self, request):
+        serializer = self.get_serializer(
+            data=request.data,
+            many=True,
+            allow_empty=False,
+            max_length=settings.TASKS_BULK_MAX_SIZE,
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save(user=request.user)
+        invalidate_task_caches(request.user.pk)
+        mark_recent_write(request.user.pk)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @extend_schema(**task_bulk_update_schema)
+    @bulk_create.mapping.patch
+    def bulk_update(self, request):
+        if not isinstance(request.data, list):
+            raise ValidationError('Ожидается список задач.')
+        tasks = self.get_bulk_tasks(
+            [
+                item.get('id') if isinstance(item, dict) else None
+                for item in request.data
+            ]
+        )
+        serializer = self.get_serializer(
+            tasks, data=request.data, many=True, partial=True
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        invalidate_task_caches(request.user.pk)
+        mark_recent_write(request.user.pk)
         return Response(serializer.data)
+
+    @extend_schema(**task_bulk_destroy_schema)
+    @bulk_create.mapping.delete
+    def bulk_destroy(self, request):
+        self.delete_tasks(self.get_bulk_tasks(request.data))
+        invalidate_task_caches(request.user.pk)
+        mark_recent_write(request.user.pk)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path='export',
+        url_name='export',
+        pagination_class=None,
+    )
+    def export(self, request):
+        export_format = request.query_params.get('export_format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            formats = ', '.join(EXPORT_FORMATS)
+            raise ValidationError(
+                {'export_format': f'Поддерживаемые форматы: {formats}.'}
+            )
+        content_type, render, render_header = EXPORT_FORMATS[export_format]
+        queryset = self.filter_queryset(self.get_queryset())
+        response = StreamingHttpResponse(
+            stream_export(
+                queryset,
+                render,
+                render_header,
+                settings.TASKS_EXPORT_CHUNK_SIZE,
+            ),
+            content_type=content_type,
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="tasks.{export_format}"'
+        )
+        return response
+
+
+def render_notifications(notifications):
+    return ''.join(
+        render_event(notification, event_id=notification.get('id'))
+        for notification in notifications
+    )
+
+
+@extend_schema(tags=['Уведомления'])
+@extend_schema_view(**notification_schema)
+class NotificationViewSet(AsyncViewSetMixin, viewsets.ViewSet):
+    """
+    Уведомления о задачах по HTTP для клиентов без веб-сокетов.
+    Поток Server-Sent Events через notifications/stream/ и долгий
+    опрос через notifications/poll/ получают те же уведомления,
+    что и NotificationConsumer, из слоя каналов.
+    Обработчики асинхронные: открытое соединение ждёт уведомления
+    в событийном цикле и не занимает поток.
+    """
+
+    authentication_classes = (
+        CachedTokenAuthentication,
+        QueryTokenAuthentication,
+    )
+    permission_classes = (IsAuthenticated,)
+    renderer_classes = (ORJSONRenderer,)
+
+    @staticmethod
+    def get_task_ids(request):
+        return parse_task_ids(request.query_params.getlist('tasks'))
+
+    @action(
+        detail=False,
+        methods=['get'],
+        renderer_classes=(ORJSONRenderer, EventStreamRenderer),
+    )
+    async def stream(self, request):
+        last_seen_id = request.headers.get('Last-Event-ID')
+        if not last_seen_id:
+            last_seen_id = request.query_params.get('last_seen_id')
+        response = StreamingHttpResponse(
+            self.stream_events(
+                request.user, self.get_task_ids(request), last_seen_id
+            ),
+            content_type=EventStreamRenderer.media_type,
+        )
+        response['Cache-Control'] = 'no-cache'
+        # Отключает буферизацию ответа в nginx.
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    @staticmethod
+    async def stream_events(user, task_ids, last_seen_id):
+        async with NotificationSubscription(user, task_ids) as subscription:
+            # Первый комментарий отправляет заголовки ответа сразу
+            # после подписки.
+            yield ': connected\n\n'
+            if last_seen_id:
+                missed = await subscription.replay(last_seen_id)
+                if missed is None:
+                    yield render_event({'resync': True})
+                elif missed:
+                    yield render_notifications(coalesce(missed))
+            while True:
+                notifications = await subscription.receive(
+                    settings.NOTIFICATIONS_KEEPALIVE_INTERVAL
+                )
+                if notifications:
+                    yield render_notifications(notifications)
+                else:
+                    yield ': keepalive\n\n'
+
+    @action(detail=False, methods=['get'])
+    async def poll(self, request):
+        timeout = self.get_poll_timeout(request)
+        last_seen_id = request.query_params.get('last_seen_id')
+        async with NotificationSubscription(
+            request.user, self.get_task_ids(request)
+        ) as subscription:
+            if last_seen_id:
+                missed = await subscription.replay(last_seen_id)
+                if missed is None:
+                    return Response({'resync': True})
+                if missed:
+                    return Response({'notifications': coalesce(missed)})
+            notifications = await subscription.receive(timeout)
+        return Response({'notifications': notifications})
+
+    @staticmethod
+    def get_poll_timeout(request):
+        timeout = request.query_params.get('timeout')
+        if timeout is None:
+            return settings.NOTIFICATIONS_POLL_TIMEOUT
+        try:
+            timeout = float(timeout)
+        except ValueError:
+            timeout = math.nan
+        if not math.isfinite(timeout):
+            raise ValidationError({'timeout': 'Ожидается число секунд.'})
+        return min(max(timeout, 0), settings.NOTIFICATIONS_POLL_TIMEOUT)
+
+
+def has_metrics_access(request):
+    """
+    Метрики доступны сотрудникам, вошедшим в админку, и сборщику
+    с токеном METRICS_TOKEN в заголовке Authorization: Bearer.
+    """
+
+    if request.user.is_staff:
+        return True
+    if not settings.METRICS_TOKEN:
+        return False
+    return hmac.compare_digest(
+        request.headers.get('Authorization', '').encode(),
+        f'Bearer {settings.METRICS_TOKEN}'.encode(),
+    )
+
+
+def metrics(request):
+    """
+    Метрики запросов процесса в текстовом формате Prometheus,
+    а также счётчики кэша токенов, пула хеширования паролей,
+    очередей уведомлений и снимков авторов задач
+    и состояние пулов соединений с базой.
+    """
+
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    if not has_metrics_access(request):
+        return HttpResponseForbidden()
+    token_stats = token_user_cache.get_stats()
+    hashing_stats = hashing_pool.get_stats()
+    outbound = outbound_stats.get_stats()
+    extra = [
+        (
+            'auth_token_cache_local_hits_total',
+            'Попадания в локальный кэш токенов.',
+            'counter',
+            [((), token_stats['local_hits'])],
+        ),
+        (
+            'auth_token_cache_redis_hits_total',
+            'Попадания в кэш токенов Redis.',
+            'counter',
+            [((), token_stats['redis_hits'])],
+        ),
+        (
+            'auth_token_cache_misses_total',
+            'Промахи кэша токенов.',
+            'counter',
+            [((), token_stats['misses'])],
+        ),
+        (
+            'auth_password_hashing_pending',
+            'Регистрации, ожидающие или выполняющие хеширование пароля.',
+            'gauge',
+            [((), hashing_stats['pending'])],
+        ),
+        (
+            'auth_password_hashing_rejected_total',
+            'Регистрации, отклонённые из-за переполнения пула хеширования.',
+            'counter',
+            [((), hashing_stats['rejected'])],
+        ),
+        (
+            'notifications_queue_size',
+            'Уведомления в очереди отправки.',
+            'gauge',
+            [((), dispatcher.queue.qsize())],
+        ),
+        (
+            'tasks_owner_propagation_queue_size',
+            'Пользователи, ожидающие обновления снимка автора в задачах.',
+            'gauge',
+            [((), owner_propagator.queue.qsize())],
+        ),
+        (
+            'notifications_outbound_queued',
+            'Уведомления в исходящих очередях веб-сокет соединений.',
+            'gauge',
+            [((), outbound['queued'])],
+        ),
+        (
+            'notifications_outbound_coalesced_total',
+            'Уведомления, заменённые более новыми о той же задаче.',
+            'counter',
+            [((), outbound['coalesced'])],
+        ),
+        (
+            'notifications_outbound_dropped_total',
+            'Уведомления, отброшенные при переполнении очереди соединения.',
+            'counter',
+            [((), outbound['dropped'])],
+        ),
+        (
+            'notifications_outbound_disconnects_total',
+            'Клиенты, отключённые из-за переполнения очереди соединения.',
+            'counter',
+            [((), outbound['disconnected'])],
+        ),
+    ]
+    extra.extend(get_pool_metrics())
+    return HttpResponse(
+        registry.render(extra),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -4,3 +4,15 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
+
+    def ready(self):
+        from django.contrib.auth.password_validation import (
+            get_default_password_validators,
+        )
+
+        from . import signals  # noqa: F401
+
+        # Валидаторы паролей со списком распространённых паролей
+        # загружаются один раз при запуске, а не во время
+        # первой регистрации.
+        get_default_password_validators()
@@ -0,0 +1,93 @@
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from drf_spectacular.extensions import OpenApiAuthenticationExtension
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from .cache import token_user_cache
+
+TOKEN_QUERY_PARAM = 'token'
+TOKEN_SUBPROTOCOL = 'token'
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Аутентификация по токену DRF с кэшированием пользователя.
+    Пользователь ищется в локальном LRU и Redis, база данных
+    запрашивается только при промахе.
+    Кэш инвалидируется сигналами при удалении или замене токена
+    и при изменении пользователя.
+    """
+
+    def authenticate_credentials(self, key):
+        user = token_user_cache.get(key)
+        if user is not None:
+            return user, Token(key=key, user=user)
+        user, token = super().authenticate_credentials(key)
+        token_user_cache.set(key, user)
+        return user, token
+
+
+class QueryTokenAuthentication(CachedTokenAuthentication):
+    """
+    Аутентификация по токену в параметре запроса token для клиентов,
+    которые не могут передать заголовок, например EventSource.
+    """
+
+    def authenticate(self, request):
+        key = request.query_params.get(TOKEN_QUERY_PARAM)
+        if not key:
+            return None
+        return self.authenticate_credentials(key)
+
+
+class QueryTokenScheme(OpenApiAuthenticationExtension):
+    """Описание QueryTokenAuthentication в схеме OpenAPI."""
+
+    target_class = QueryTokenAuthentication
+    name = 'queryTokenAuth'
+
+    def get_security_definition(self, auto_schema):
+        return {'type': 'apiKey', 'in': 'query', 'name': TOKEN_QUERY_PARAM}
+
+
+@database_sync_to_async
+def get_user_by_token(key):
+    """Возвращает активного пользователя по токену или анонима."""
+
+    try:
+        user, _ = CachedTokenAuthentication().authenticate_credentials(key)
+    except AuthenticationFailed:
+        return AnonymousUser()
+    return user
+
+
+class TokenAuthMiddleware(BaseMiddleware):
+    """
+    Аутентифицирует веб-сокет соединения по токену DRF.
+    Токен передаётся в параметре запроса token или подпротоколами
+    Sec-WebSocket-Protocol: token, <токен>.
+    Пользователь записывается в scope['user'].
+    """
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        key = self.get_token(scope)
+        scope['user'] = (
+            await get_user_by_token(key) if key else AnonymousUser()
+        )
+        return await self.inner(scope, receive, send)
+
+    @staticmethod
+    def get_token(scope):
+        query = parse_qs(scope.get('query_string', b'').decode())
+        if TOKEN_QUERY_PARAM in query:
+            return query[TOKEN_QUERY_PARAM][0]
+        subprotocols = scope.get('subprotocols') or []
+        if len(subprotocols) > 1 and subprotocols[0] == TOKEN_SUBPROTOCOL:
+            return subprotocols[1]
+        return None
@@ -0,0 +1,142 @@
+import threading
+import time
+from collections import OrderedDict
+from hashlib import sha256
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from tasks.metrics import increment, timer
+from .models import CustomUser
+
+TOKEN_USER_KEY = 'auth:token:{digest}'
+# Поля пользователя, которые хранятся в кэше, включая флаги
+# is_staff и is_superuser для проверок прав без запроса к базе.
+# Пароль в общий Redis не попадает, остальные поля загружаются
+# из базы при первом обращении к ним.
+TOKEN_USER_FIELDS = (
+    'id',
+    'email',
+    'first_name',
+    'last_name',
+    'is_active',
+    'is_staff',
+    'is_superuser',
+)
+
+
+class TokenUserCache:
+    """
+    Кэш пользователей по ключу токена.
+    Первый уровень - локальный LRU процесса с коротким TTL,
+    второй - общий кэш Redis.
+    Локальный TTL ограничивает время, за которое другие процессы
+    узнают об инвалидации токена.
+    Хранит не объект пользователя, а снимок полей TOKEN_USER_FIELDS.
+    Считает попадания в каждый уровень и промахи.
+    """
+
+    def __init__(self, maxsize, timeout, local_timeout):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.local_timeout = local_timeout
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def get_cache_key(key):
+        # Ключ токена - секрет, поэтому в Redis хранится только его хэш.
+        return TOKEN_USER_KEY.format(digest=sha256(key.encode()).hexdigest())
+
+    @staticmethod
+    def to_snapshot(user):
+        return {field: getattr(user, field) for field in TOKEN_USER_FIELDS}
+
+    @staticmethod
+    def from_snapshot(snapshot):
+        """
+        Собирает пользователя из снимка как загруженного через only():
+        остальные поля отложены, save() их не перезаписывает.
+        from_db ожидает значения в порядке полей модели.
+        """
+
+        fields = [
+            field.attname
+            for field in CustomUser._meta.concrete_fields
+            if field.attname in snapshot
+        ]
+        return CustomUser.from_db(
+            DEFAULT_DB_ALIAS, fields, [snapshot[field] for field in fields]
+        )
+
+    def get(self, key):
+        """Возвращает пользователя по ключу токена или None."""
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None and entry[1] > now:
+                self._local.move_to_end(key)
+                self.local_hits += 1
+                increment('cache_hits')
+                return self.from_snapshot(entry[0])
+
+        with timer('cache'):
+            snapshot = cache.get(self.get_cache_key(key))
+        with self._lock:
+            if snapshot is None:
+                self._local.pop(key, None)
+                self.misses += 1
+                increment('cache_misses')
+                return None
+            self.redis_hits += 1
+            self._set_local(key, snapshot, now)
+        increment('cache_hits')
+        return self.from_snapshot(snapshot)
+
+    def set(self, key, user):
+        snapshot = self.to_snapshot(user)
+        with timer('cache'):
+            cache.set(self.get_cache_key(key), snapshot, self.timeout)
+        with self._lock:
+            self._set_local(key, snapshot, time.monotonic())
+
+    def _set_local(self, key, snapshot, now):
+        self._local[key] = (snapshot, now + self.local_timeout)
+        self._local.move_to_end(key)
+        while len(self._local) > self.maxsize:
+            self._local.popitem(last=False)
+
+    def invalidate(self, *keys):
+        """Удаляет пользователей по ключам токенов из обоих уровней."""
+
+        if not keys:
+            return
+        cache.delete_many([self.get_cache_key(key) for key in keys])
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'local_hits': self.local_hits,
+                'redis_hits': self.redis_hits,
+                'misses': self.misses,
+                'local_size': len(self._local),
+            }
+
+
+token_user_cache = TokenUserCache(
+    maxsize=settings.AUTH_TOKEN_CACHE_SIZE,
+    timeout=settings.AUTH_TOKEN_CACHE_TIMEOUT,
+    local_timeout=settings.AUTH_TOKEN_LOCAL_CACHE_TIMEOUT,
+)
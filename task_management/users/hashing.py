@@ -0,0 +1,70 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class PasswordHashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Слишком много регистраций, повторите запрос позже.'
+    default_code = 'password_hashing_busy'
+    # Обработчик исключений DRF передаёт wait в заголовке Retry-After.
+    wait = 1
+
+
+class PasswordHashingPool:
+    """
+    Ограниченный пул потоков для проверки и хеширования паролей.
+    PBKDF2 в hashlib отпускает GIL, поэтому потоки хешируют параллельно,
+    а событийный цикл и потоки запросов не заняты на время хеширования.
+    Кроме выполняемых задач, ждать могут не больше queue_size задач,
+    следующие отклоняются с PasswordHashingBusy.
+    При workers=0 пул отключён: run() хеширует сразу в вызывающем
+    событийном цикле, так замеряется выигрыш от пула.
+    """
+
+    def __init__(self, workers, queue_size):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.rejected = 0
+
+    def submit(self, fn, *args):
+        with self._lock:
+            if self.pending >= self.workers + self.queue_size:
+                self.rejected += 1
+                raise PasswordHashingBusy
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    self.workers, thread_name_prefix='password-hashing'
+                )
+            self.pending += 1
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future):
+        with self._lock:
+            self.pending -= 1
+
+    async def run(self, fn, *args):
+        """Выполняет fn(*args) в пуле и ожидает результат асинхронно."""
+
+        if not self.workers:
+            return fn(*args)
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def get_stats(self):
+        with self._lock:
+            return {'pending': self.pending, 'rejected': self.rejected}
+
+
+hashing_pool = PasswordHashingPool(
+    workers=settings.AUTH_PASSWORD_HASHING_WORKERS,
+    queue_size=settings.AUTH_PASSWORD_HASHING_QUEUE_SIZE,
+)
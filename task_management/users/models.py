@@ -1,16 +1,39 @@
+from asgiref.sync import sync_to_async
 from django.contrib.auth.base_user import BaseUserManager
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.password_validation import validate_password
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
+from .hashing import hashing_pool
+
+
+def set_validated_password(user, password):
+    """Проверяет пароль валидаторами и сохраняет его хеш в user."""
+
+    validate_password(password, user)
+    user.set_password(password)
+
 
 class CustomUserManager(BaseUserManager):
     def create_user(self, email, password, **extra_fields):
         email = self.normalize_email(email)
         user = self.model(email=email, **extra_fields)
-        validate_password(password, user)
-        user.set_password(password)
+        set_validated_password(user, password)
+        return self._save_new_user(user)
+
+    async def acreate_user(self, email, password, **extra_fields):
+        """
+        Асинхронный create_user: проверка и хеширование пароля
+        выполняются в ограниченном пуле hashing_pool.
+        """
+
+        email = self.normalize_email(email)
+        user = self.model(email=email, **extra_fields)
+        await hashing_pool.run(set_validated_password, user, password)
+        return await sync_to_async(self._save_new_user)(user)
+
+    def _save_new_user(self, user):
         user.full_clean()
         user.save(using=self._db)
         return user
@@ -24,3 +24,17 @@ class UserSerializer(serializers.ModelSerializer):
         except django_exceptions.ValidationError as error:
             raise rest_framework_exceptions.ValidationError(error.messages)
         return user
+
+    async def asave(self):
+        """
+        Асинхронное создание пользователя, не занимающее поток
+        на время хеширования пароля.
+        """
+
+        try:
+            self.instance = await CustomUser.objects.acreate_user(
+                **self.validated_data
+            )
+        except django_exceptions.ValidationError as error:
+            raise rest_framework_exceptions.ValidationError(error.messages)
+        return self.instance
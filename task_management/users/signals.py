@@ -0,0 +1,46 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .cache import token_user_cache
+from .models import CustomUser
+
+
+def invalidate_tokens(*keys):
+    """
+    Сбрасывает кэш токенов сразу и ещё раз после фиксации транзакции:
+    промах кэша до фиксации читает из базы старые данные
+    и снова кэширует их.
+    """
+
+    if not keys:
+        return
+    token_user_cache.invalidate(*keys)
+    transaction.on_commit(partial(token_user_cache.invalidate, *keys))
+
+
+@receiver((post_save, post_delete), sender=Token)
+def invalidate_token_cache(sender, instance, **kwargs):
+    """Сбрасывает кэш токена при его замене или удалении."""
+
+    invalidate_tokens(instance.key)
+
+
+@receiver((post_save, post_delete), sender=CustomUser)
+def invalidate_user_tokens_cache(sender, instance, created=False, **kwargs):
+    """
+    Сбрасывает кэш токенов пользователя при его изменении или удалении,
+    в том числе при смене is_active.
+    Изменения через QuerySet.update() сигналов не вызывают.
+    """
+
+    if created:
+        return
+    invalidate_tokens(
+        *Token.objects.filter(user_id=instance.pk).values_list(
+            'key', flat=True
+        )
+    )
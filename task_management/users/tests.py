@@ -1,8 +1,20 @@
+from unittest import mock
+
+from django.contrib.auth.password_validation import (
+    CommonPasswordValidator as DjangoCommonPasswordValidator,
+)
+from django.core.cache import cache
 from django.urls import reverse
 from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.test import APITestCase
 
+from .authentication import CachedTokenAuthentication
+from .cache import token_user_cache
+from .hashing import hashing_pool
 from .models import CustomUser
+from .validators import CommonPasswordValidator
 
 
 class UserTestCase(APITestCase):
@@ -52,3 +64,114 @@ class UserTestCase(APITestCase):
             response.data['email'][0],
             'user with this email address already exists.',
         )
+
+    def test_user_registration_common_password(self):
+        """
+        Тест регистрации с распространённым паролем.
+        Ожидаемый результат: возвращается код 400 BAD REQUEST,
+        компактный список паролей совпадает со списком Django.
+        """
+
+        response = self.client.post(
+            reverse('register'),
+            data={**self.user_data, 'password': 'Password123'},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('This password is too common.', response.data)
+
+        validator = CommonPasswordValidator()
+        passwords = DjangoCommonPasswordValidator().passwords
+        self.assertEqual(len(validator.digests), len(passwords))
+        for password in ('qwerty', 'iloveyou', 'ivan1970', 'Ivan-1970!'):
+            with self.subTest(password=password):
+                self.assertEqual(
+                    validator.is_common(password),
+                    password.lower() in passwords,
+                )
+
+    def test_user_registration_hashing_pool_busy(self):
+        """
+        Тест регистрации при переполненном пуле хеширования паролей.
+        Ожидаемый результат: возвращается код 503 SERVICE UNAVAILABLE
+        с заголовком Retry-After, пользователь не создаётся.
+        С отключённым пулом пароль хешируется без очереди.
+        """
+
+        with mock.patch.object(
+            hashing_pool,
+            'pending',
+            hashing_pool.workers + hashing_pool.queue_size,
+        ):
+            response = self.client.post(
+                reverse('register'), data=self.user_data
+            )
+        self.assertEqual(
+            response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertFalse(CustomUser.objects.exists())
+
+        with mock.patch.object(hashing_pool, 'workers', 0):
+            response = self.client.post(
+                reverse('register'), data=self.user_data
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_token_authentication_cached(self):
+        """
+        Тест кэширования аутентификации по токену.
+        Ожидаемый результат: повторная аутентификация не обращается
+        к базе данных, деактивация пользователя и удаление токена
+        сбрасывают кэш, в том числе после фиксации транзакции.
+        """
+
+        cache.clear()
+        token_user_cache.clear_local()
+        user = CustomUser.objects.create_user(**self.user_data)
+        token = Token.objects.create(user=user)
+        authentication = CachedTokenAuthentication()
+        stats = token_user_cache.get_stats()
+
+        with self.assertNumQueries(1):
+            authentication.authenticate_credentials(token.key)
+        with self.assertNumQueries(0):
+            cached_user, _ = authentication.authenticate_credentials(
+                token.key
+            )
+        self.assertEqual(cached_user, user)
+        self.assertEqual(cached_user.first_name, user.first_name)
+        with self.assertNumQueries(0):
+            self.assertFalse(cached_user.is_staff)
+            self.assertFalse(cached_user.is_superuser)
+        self.assertIn('password', cached_user.get_deferred_fields())
+        self.assertNotIn(
+            'password', cache.get(token_user_cache.get_cache_key(token.key))
+        )
+        new_stats = token_user_cache.get_stats()
+        self.assertEqual(new_stats['misses'], stats['misses'] + 1)
+        self.assertEqual(new_stats['local_hits'], stats['local_hits'] + 1)
+
+        token_user_cache.clear_local()
+        with self.assertNumQueries(0):
+            authentication.authenticate_credentials(token.key)
+        self.assertEqual(
+            token_user_cache.get_stats()['redis_hits'],
+            stats['redis_hits'] + 1,
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user.is_active = False
+            user.save()
+            # Промах кэша в другом процессе до фиксации транзакции
+            # кэширует пользователя ещё активным.
+            token_user_cache.set(token.key, cached_user)
+        with self.assertRaises(AuthenticationFailed):
+            authentication.authenticate_credentials(token.key)
+
+        user.is_active = True
+        user.save()
+        key = token.key
+        authentication.authenticate_credentials(key)
+        token.delete()
+        with self.assertRaises(AuthenticationFailed):
+            authentication.authenticate_credentials(key)
@@ -1,25 +1,37 @@
+from asgiref.sync import sync_to_async
 from drf_spectacular.utils import extend_schema_view, extend_schema
 from rest_framework import generics, status
 from rest_framework.response import Response
 
+from config.db_router import replica_reads
+from tasks.mixins import AsyncViewSetMixin
 from .models import CustomUser
 from .schemas import user_registration_schema
 from .serializers import UserSerializer
 
 
-class UserRegistrationView(generics.CreateAPIView):
+class UserRegistrationView(AsyncViewSetMixin, generics.CreateAPIView):
     """
     Вью для регистрации пользователей.
     Создание нового пользователя.
     Возвращает данные пользователя после успешной регистрации.
+    Пароль проверяется и хешируется в ограниченном пуле потоков,
+    при его переполнении возвращается 503 с Retry-After.
     """
 
     queryset = CustomUser.objects.all()
     serializer_class = UserSerializer
 
+    @staticmethod
+    def validate_registration(serializer):
+        # Проверка занятости email читает с реплики, окончательная
+        # проверка при создании пользователя идёт на основной базе.
+        with replica_reads():
+            serializer.is_valid(raise_exception=True)
+
     @extend_schema(**user_registration_schema)
-    def post(self, request, *args, **kwargs):
+    async def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+        await sync_to_async(self.validate_registration)(serializer)
+        await serializer.asave()
         return Response(serializer.data, status=status.HTTP_201_CREATED)